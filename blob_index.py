@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+BLOB_INDEX_DB = "drive_blobs.sqlite3"
+
+class BlobIndex:
+    # SHA-256 del contenido -> id del primer archivo subido a Drive con ese
+    # contenido. Un adjunto repetido se copia en Drive (files.copy) sin volver
+    # a transferir los bytes.
+    def __init__(self, path=BLOB_INDEX_DB):
+        self.path = path
+        self._execute("PRAGMA journal_mode=WAL")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "sha256 TEXT PRIMARY KEY, file_id TEXT NOT NULL, name TEXT, size INTEGER, uploaded_at REAL)"
+        )
+
+    def _execute(self, sql, params=()):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def lookup(self, sha256):
+        row = self._execute("SELECT file_id FROM blobs WHERE sha256 = ?", (sha256,))
+        return row[0] if row else None
+
+    def record(self, sha256, file_id, name, size):
+        self._execute(
+            "INSERT INTO blobs (sha256, file_id, name, size, uploaded_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(sha256) DO UPDATE SET file_id = excluded.file_id, name = excluded.name, "
+            "size = excluded.size, uploaded_at = excluded.uploaded_at",
+            (sha256, file_id, name, size, time.time())
+        )
+
+    def forget(self, sha256, file_id=None):
+        # Con file_id solo se borra si sigue apuntando a ese archivo (otro hilo
+        # pudo haber registrado una copia nueva mientras tanto).
+        if file_id is None:
+            self._execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        else:
+            self._execute("DELETE FROM blobs WHERE sha256 = ? AND file_id = ?", (sha256, file_id))
+
+BLOB_INDEX = BlobIndex()
@@ -0,0 +1,125 @@
+import numpy as np
+from collections import namedtuple
+
+WEIGHT_UNITS = ("KG", "Ton", "Lbs")
+LENGTH_UNITS = ("CM", "M", "MM", "Inches")
+PACKAGING_TYPES = ("Pallet", "Box", "Bag")
+
+# Factores a KG y a CM, en el mismo orden que las unidades.
+WEIGHT_FACTORS = np.array([1.0, 1000.0, 0.453592])
+LENGTH_FACTORS = np.array([1.0, 100.0, 0.1, 2.54])
+
+# Divisor volumétrico en cm³/kg por modo: peso volumétrico = cm³ / divisor.
+# Aéreo 6000 (IATA, ~166.67 kg por CBM), marítimo LCL 1000 (1 CBM = 1 tonelada)
+# y terrestre 3000.
+VOLUMETRIC_DIVISORS = {
+    "Air": 6000.0,
+    "Maritime": 1000.0,
+    "Ground": 3000.0,
+}
+CM3_PER_CBM = 1000000.0
+
+# Una fila por línea de empaque. Las unidades se guardan como índices en
+# WEIGHT_UNITS / LENGTH_UNITS para convertir con una sola indexación.
+# `volume` y `kilovolume` son los valores manuales del formulario, usados
+# cuando la línea no tiene dimensiones.
+PACKAGE_DTYPE = np.dtype([
+    ("packaging", np.int8),
+    ("quantity", np.int32),
+    ("weight", np.float64),
+    ("weight_unit", np.int8),
+    ("length", np.float64),
+    ("width", np.float64),
+    ("height", np.float64),
+    ("length_unit", np.int8),
+    ("volume", np.float64),
+    ("kilovolume", np.float64),
+])
+
+PackageMeasures = namedtuple(
+    "PackageMeasures",
+    ["unit_weight_kg", "gross_weight_kg", "cbm", "volumetric_weight_kg", "chargeable_weight_kg"]
+)
+CargoTotals = namedtuple(
+    "CargoTotals",
+    ["quantity", "gross_weight_kg", "cbm", "volumetric_weight_kg", "chargeable_weight_kg"]
+)
+
+def _unit_codes(values, units, field):
+    lookup = {unit: code for code, unit in enumerate(units)}
+    codes = np.fromiter((lookup.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+    invalid = np.flatnonzero(codes < 0)
+    if invalid.size:
+        bad = sorted({str(values[i]) for i in invalid.tolist()})
+        raise ValueError(f"Unknown {field}: {', '.join(bad)} (rows {', '.join(str(i + 1) for i in invalid[:10].tolist())})")
+    return codes
+
+def _float_column(packages, field):
+    return np.fromiter((float(package.get(field) or 0.0) for package in packages), dtype=np.float64, count=len(packages))
+
+def packages_to_array(packages):
+    # `packages` es la lista de dicts de st.session_state.packages.
+    array = np.zeros(len(packages), dtype=PACKAGE_DTYPE)
+    if not packages:
+        return array
+
+    array["packaging"] = _unit_codes([package.get("type_packaging", "Pallet") for package in packages], PACKAGING_TYPES, "packaging type")
+    array["quantity"] = np.fromiter((int(package.get("quantity") or 0) for package in packages), dtype=np.int32, count=len(packages))
+    array["weight"] = _float_column(packages, "weight_lcl")
+    array["weight_unit"] = _unit_codes([package.get("weight_unit", "KG") for package in packages], WEIGHT_UNITS, "weight unit")
+    array["length"] = _float_column(packages, "length")
+    array["width"] = _float_column(packages, "width")
+    array["height"] = _float_column(packages, "height")
+    array["length_unit"] = _unit_codes([package.get("length_unit", "CM") for package in packages], LENGTH_UNITS, "length unit")
+    array["volume"] = _float_column(packages, "volume")
+    array["kilovolume"] = _float_column(packages, "kilovolume")
+    return array
+
+def measure_packages(array, transport_type=None, divisors=VOLUMETRIC_DIVISORS):
+    divisor = divisors.get(transport_type, divisors["Maritime"])
+    quantity = array["quantity"].astype(np.float64)
+
+    unit_weight_kg = array["weight"] * WEIGHT_FACTORS[array["weight_unit"]]
+    gross_weight_kg = unit_weight_kg * quantity
+
+    length_factor = LENGTH_FACTORS[array["length_unit"]]
+    unit_cm3 = (array["length"] * length_factor) * (array["width"] * length_factor) * (array["height"] * length_factor)
+    has_dimensions = (array["length"] > 0) & (array["width"] > 0) & (array["height"] > 0)
+
+    # Sin dimensiones se usa el CBM (o, en aéreo, los KVM) escrito a mano.
+    cbm = np.where(has_dimensions, unit_cm3 * quantity / CM3_PER_CBM, array["volume"])
+    volumetric_weight_kg = cbm * (CM3_PER_CBM / divisor)
+    if transport_type == "Air":
+        volumetric_weight_kg = np.where(has_dimensions, volumetric_weight_kg, array["kilovolume"])
+
+    return PackageMeasures(
+        unit_weight_kg=unit_weight_kg,
+        gross_weight_kg=gross_weight_kg,
+        cbm=cbm,
+        volumetric_weight_kg=volumetric_weight_kg,
+        chargeable_weight_kg=np.maximum(gross_weight_kg, volumetric_weight_kg),
+    )
+
+def cargo_totals(array, measures):
+    gross = float(measures.gross_weight_kg.sum())
+    volumetric = float(measures.volumetric_weight_kg.sum())
+    # El peso cobrable del embarque es el mayor entre los totales, no la suma por línea.
+    return CargoTotals(
+        quantity=int(array["quantity"].sum()),
+        gross_weight_kg=gross,
+        cbm=float(measures.cbm.sum()),
+        volumetric_weight_kg=volumetric,
+        chargeable_weight_kg=max(gross, volumetric),
+    )
+
+def apply_measures(packages, measures, transport_type=None):
+    # Devuelve los valores calculados a los dicts con las claves que usa el resto de la app.
+    total_weight = measures.gross_weight_kg.tolist()
+    volume = measures.cbm.tolist()
+    kilovolume = measures.volumetric_weight_kg.tolist()
+    for i, package in enumerate(packages):
+        package["total_weight"] = total_weight[i]
+        package["volume"] = volume[i]
+        if transport_type == "Air":
+            package["kilovolume"] = kilovolume[i]
+    return packages
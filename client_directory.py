@@ -0,0 +1,167 @@
+import csv
+import difflib
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+
+from location_search import normalize, trigrams
+
+# Sufijos societarios que no distinguen a un cliente de otro
+# ("360 Logistics Group Ltd" ~ "360 LOGISTICS GROUP LIMITED"). Solo se usan para
+# el aviso de posible duplicado: nunca para unir dos filas de la hoja.
+LEGAL_SUFFIXES = frozenset([
+    "limited", "ltd", "ltda", "inc", "incorporated", "llc", "corp", "corporation", "company",
+    "sa", "cv", "sas", "srl", "sociedad", "anonima", "gmbh", "bv", "plc",
+])
+
+# Similitud mínima (SequenceMatcher sobre la clave) para avisar de un posible duplicado.
+SIMILARITY_THRESHOLD = 0.85
+# Candidatos por trigramas que se comparan con SequenceMatcher.
+FUZZY_CANDIDATES = 20
+
+ClientMatch = namedtuple("ClientMatch", ["name", "score"])
+
+def client_key(name):
+    # "S.A.S." -> "sas" antes de quitar los sufijos.
+    tokens = normalize(str(name).replace(".", "")).split()
+    end = len(tokens)
+    while end > 1 and tokens[end - 1] in LEGAL_SUFFIXES:
+        end -= 1
+    return " ".join(tokens[:end])
+
+class _ClientIndex:
+    # Índice de solo lectura sobre una lista de nombres. Cada sync arma uno nuevo
+    # y lo reemplaza de una vez: quien consulta nunca ve uno a medio construir.
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.by_name = {}
+        self.keys = []
+        self.by_key = {}
+        self.postings = {}
+        for client_id, name in enumerate(self.names):
+            self.by_name.setdefault(normalize(name), client_id)
+            key = client_key(name)
+            self.keys.append(key)
+            if not key:
+                continue
+            self.by_key.setdefault(key, []).append(client_id)
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(client_id)
+
+class ClientDirectory:
+    # Directorio de clientes compartido por todas las sesiones del proceso.
+    # `fetch_rows(after)` devuelve los valores de la columna A a partir de la fila
+    # `after + 1`; la fila 1 es el encabezado. Cada `sync` solo pide las filas
+    # nuevas (cola de la hoja) y cada `full_sync_interval` se relee todo para
+    # ver filas editadas o borradas a mano. Cada fila de la hoja es una opción.
+    def __init__(self, fetch_rows, sync_interval=60, full_sync_interval=3600):
+        self.fetch_rows = fetch_rows
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self._lock = threading.RLock()
+        self._rows = []
+        # Nombres agregados con `add` cuya fila la hoja todavía no devolvió.
+        self._added = Counter()
+        self._index = _ClientIndex(())
+        self.row_count = 1
+        self.synced_at = 0.0
+        self.full_synced_at = 0.0
+
+    @property
+    def names(self):
+        return self._index.names
+
+    def sync(self, force=False):
+        if not force and time.time() - self.synced_at < self.sync_interval:
+            return self.names
+        with self._lock:
+            now = time.time()
+            if not force and now - self.synced_at < self.sync_interval:
+                return self.names
+            if now - self.full_synced_at > self.full_sync_interval:
+                rows = self.fetch_rows(1)
+                self._rows, self._added, self.row_count = [], Counter(), 1
+                self.full_synced_at = now
+            else:
+                rows = self.fetch_rows(self.row_count)
+            self.row_count += len(rows)
+            for name in rows:
+                name = str(name).strip()
+                if not name:
+                    continue
+                # La fila que agregó `add` en este proceso ya está en la lista.
+                if self._added[name]:
+                    self._added[name] -= 1
+                    continue
+                self._rows.append(name)
+            # `names` se reemplaza recién al terminar el sync: las sesiones nunca ven la lista vacía.
+            self._index = _ClientIndex(self._rows)
+            self.synced_at = now
+        return self.names
+
+    def add(self, name):
+        # Visible al instante en todas las sesiones; la fila de la hoja se lee en
+        # el próximo sync sin duplicarla.
+        name = str(name).strip()
+        with self._lock:
+            if not name or self.lookup(name):
+                return False
+            self._rows.append(name)
+            self._added[name] += 1
+            self._index = _ClientIndex(self._rows)
+        return True
+
+    def lookup(self, name):
+        # Mismo nombre sin distinguir mayúsculas, tildes ni puntuación: "Grupo A"
+        # y "Grupo S" o "X LLC" y "X SAS" son clientes distintos.
+        index = self._index
+        client_id = index.by_name.get(normalize(name))
+        return index.names[client_id] if client_id is not None else None
+
+    def similar(self, name, limit=3, threshold=SIMILARITY_THRESHOLD):
+        # Posibles duplicados para avisar antes de crear un cliente nuevo.
+        index = self._index
+        key = client_key(name)
+        if not key:
+            return []
+        if key in index.by_key:
+            return [ClientMatch(index.names[client_id], 1.0) for client_id in index.by_key[key][:limit]]
+
+        hits = Counter()
+        for gram in trigrams(key):
+            hits.update(index.postings.get(gram, ()))
+        matcher = difflib.SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(key)
+        matches = []
+        for client_id, _ in hits.most_common(FUZZY_CANDIDATES):
+            matcher.set_seq1(index.keys[client_id])
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            score = matcher.ratio()
+            if score >= threshold:
+                matches.append(ClientMatch(index.names[client_id], score))
+        matches.sort(key=lambda match: -match.score)
+        return matches[:limit]
+
+def load_csv_names(path):
+    with open(path, encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f) if row]
+
+def benchmark(path="customers.csv", queries=("360 Logistics Group Ltd", "A&S Aluminium Supply", "Nuevo Cliente XYZ"), repeat=2000):
+    rows = load_csv_names(path)
+    directory = ClientDirectory(lambda after: rows[after:])
+    started = time.perf_counter()
+    directory.sync(force=True)
+    print(f"index {len(directory.names)} clients: {(time.perf_counter() - started) * 1000:.2f} ms")
+    for query in queries:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            matches = directory.similar(query)
+        elapsed_us = (time.perf_counter() - started) / repeat * 1e6
+        found = ", ".join(f"{match.name} ({match.score:.2f})" for match in matches) or "-"
+        print(f"{query!r}: {elapsed_us:.1f} µs -> {found}")
+
+if __name__ == "__main__":
+    # Benchmark: python client_directory.py [customers.csv]
+    benchmark(*sys.argv[1:2])
@@ -0,0 +1,251 @@
+import streamlit as st
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+SHEETS_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+
+# El token se renueva en segundo plano cuando le quedan menos de estos segundos,
+# así ninguna petición de un usuario espera el intercambio con oauth2.
+TOKEN_REFRESH_MARGIN = 600
+TOKEN_CHECK_INTERVAL = 60
+HTTP_TIMEOUT = 120
+# Conexiones ociosas que se conservan (keep-alive) por cliente.
+POOL_SIZE = 32
+# Con esta variable todos los clientes apuntan a un backend local (google_emulator.py)
+# con credenciales anónimas, p. ej. GOOGLE_EMULATOR_URL=http://127.0.0.1:8765/
+EMULATOR_URL_ENV = "GOOGLE_EMULATOR_URL"
+# Hosts fijos de gspread que se redirigen al backend configurado.
+GSPREAD_HOSTS = {"sheets": "https://sheets.googleapis.com/", "drive": "https://www.googleapis.com/"}
+
+class PooledHttp:
+    # Misma interfaz `request` que httplib2.Http, pero cada llamada toma una
+    # conexión autorizada libre del pool y la devuelve al terminar. httplib2 no es
+    # thread-safe y Streamlit ejecuta cada rerun en un hilo nuevo: un transporte
+    # por hilo no se reutilizaría nunca; este pool sí, desde cualquier hilo.
+    def __init__(self, factory, max_idle=POOL_SIZE):
+        self._factory = factory
+        self._idle = []
+        self._lock = threading.Lock()
+        self.max_idle = max_idle
+        self.created = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                # LIFO: la conexión usada más recientemente sigue abierta.
+                return self._idle.pop()
+            self.created += 1
+        return self._factory()
+
+    def _release(self, http):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(http)
+                return
+        http.close()
+
+    def request(self, *args, **kwargs):
+        http = self._acquire()
+        try:
+            response = http.request(*args, **kwargs)
+        except Exception:
+            # Una conexión que falló no vuelve al pool.
+            http.close()
+            raise
+        self._release(http)
+        return response
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+class CachedResource:
+    # googleapiclient arma de nuevo cada colección (métodos y docstrings de los
+    # esquemas) en cada `spreadsheets()` / `values()` / `files()`: ~25 ms de CPU
+    # por llamada. Los Resource no guardan estado, así que cada colección se
+    # construye una vez y se comparte entre hilos.
+    def __init__(self, resource):
+        from googleapiclient.discovery import fix_method_name
+        self._resource = resource
+        self._collections = {fix_method_name(name) for name in resource._resourceDesc.get("resources", {})}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, name):
+        collection = self._cache.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._cache.get(name)
+                if collection is None:
+                    collection = CachedResource(getattr(self._resource, name)())
+                    self._cache[name] = collection
+        return collection
+
+    def __getattr__(self, name):
+        if name in self._collections:
+            return lambda: self._collection(name)
+        return getattr(self._resource, name)
+
+def anonymous_credentials(secret, scopes):
+    from google.auth.credentials import AnonymousCredentials
+    return AnonymousCredentials()
+
+def _endpoint_adapter(rewrites):
+    # Adaptador de requests que reescribe las URLs fijas de gspread hacia otro servidor.
+    from requests.adapters import HTTPAdapter
+
+    class EndpointAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            for source, target in rewrites.items():
+                if request.url.startswith(source):
+                    request.url = target + request.url[len(source):]
+                    break
+            return super().send(request, **kwargs)
+
+    return EndpointAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+
+class GoogleClients:
+    # Registro de clientes de Google del proceso, compartido por app.py, utils.py
+    # y los workers. Nada se importa ni se construye hasta el primer uso: la
+    # página de inicio no paga gspread, googleapiclient ni la autenticación.
+    # Los documentos de discovery son los estáticos del paquete y se parsean una vez.
+    # `endpoints` ({"sheets": url, "drive": url}) apunta los servicios a otro servidor.
+    def __init__(self, secrets=st.secrets, endpoints=None, credentials_factory=None):
+        self._secrets = secrets
+        self.endpoints = endpoints or {}
+        self._credentials_factory = credentials_factory
+        self._lock = threading.RLock()
+        self._clients = {}
+        self._refresher = None
+
+    def _get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = factory()
+                    self._clients[name] = client
+        return client
+
+    @classmethod
+    def from_environment(cls):
+        registry = cls()
+        if os.environ.get(EMULATOR_URL_ENV):
+            registry.use_endpoint(os.environ[EMULATOR_URL_ENV])
+        return registry
+
+    def use_endpoint(self, url, credentials_factory=anonymous_credentials):
+        # Cambia el backend de Sheets y Drive (emulador local); los clientes ya
+        # construidos se descartan y se vuelven a crear al próximo uso.
+        with self._lock:
+            self.endpoints = {"sheets": url, "drive": url}
+            self._credentials_factory = credentials_factory
+            self._clients = {}
+
+    def _credentials(self, secret, scopes):
+        if self._credentials_factory:
+            return self._credentials_factory(secret, scopes)
+        from google.oauth2.service_account import Credentials
+        credentials = Credentials.from_service_account_info(self._secrets[secret], scopes=scopes)
+        self._start_refresher()
+        return credentials
+
+    @property
+    def sheets_credentials(self):
+        return self._get("sheets_credentials", lambda: self._credentials("google_sheets_credentials", SHEETS_SCOPES))
+
+    @property
+    def drive_credentials(self):
+        return self._get("drive_credentials", lambda: self._credentials("google_drive_credentials", DRIVE_SCOPES))
+
+    def discovery_document(self, api, version):
+        from googleapiclient.discovery_cache import get_static_doc
+        return self._get(f"discovery:{api}:{version}", lambda: json.loads(get_static_doc(api, version)))
+
+    def build(self, api, version, credentials=None, http=None):
+        from googleapiclient.discovery import build_from_document
+        document = self.discovery_document(api, version)
+        endpoint = self.endpoints.get(api)
+        if endpoint:
+            # rootUrl (y no api_endpoint) para que también las rutas de subida
+            # (/upload/...) y el servicePath queden en el otro servidor.
+            document = dict(document, rootUrl=endpoint)
+        return build_from_document(document, credentials=credentials, http=http)
+
+    def authorized_http(self, credentials, timeout=HTTP_TIMEOUT):
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = httplib2.Http(timeout=timeout)
+        # Las subidas resumables de Drive responden 308 sin Location: no es una redirección.
+        http.redirect_codes = http.redirect_codes - {308}
+        return AuthorizedHttp(credentials, http=http)
+
+    def pooled_http(self, credentials):
+        return PooledHttp(lambda: self.authorized_http(credentials))
+
+    # Un solo servicio por API, seguro entre hilos gracias al PooledHttp.
+    @property
+    def sheets(self):
+        return self._get("sheets", lambda: CachedResource(
+            self.build("sheets", "v4", http=self.pooled_http(self.sheets_credentials))
+        ))
+
+    @property
+    def drive(self):
+        return self._get("drive", lambda: CachedResource(
+            self.build("drive", "v3", http=self.pooled_http(self.drive_credentials))
+        ))
+
+    @property
+    def gspread(self):
+        # gspread usa una AuthorizedSession de requests; el pool de urllib3 es
+        # thread-safe, solo se agranda para que los hilos no descarten conexiones.
+        def authorize():
+            import gspread
+            client = gspread.authorize(self.sheets_credentials)
+            rewrites = {GSPREAD_HOSTS[api]: url for api, url in self.endpoints.items() if api in GSPREAD_HOSTS}
+            adapter = _endpoint_adapter(rewrites)
+            client.http_client.session.mount("https://", adapter)
+            client.http_client.session.mount("http://", adapter)
+            return client
+        return self._get("gspread", authorize)
+
+    #------------------------ TOKEN REFRESH --------------------------
+    def refresh_tokens(self, margin=TOKEN_REFRESH_MARGIN):
+        from google.auth.transport.requests import Request
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for name in ("sheets_credentials", "drive_credentials"):
+            credentials = self._clients.get(name)
+            if credentials is None:
+                continue
+            if credentials.token is None or credentials.expiry is None or (credentials.expiry - now).total_seconds() < margin:
+                credentials.refresh(Request())
+
+    def _refresh_forever(self, interval):
+        while True:
+            try:
+                self.refresh_tokens()
+            except Exception:
+                pass
+            time.sleep(interval)
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_forever, args=(TOKEN_CHECK_INTERVAL,),
+                    name="google-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+GOOGLE_CLIENTS = GoogleClients.from_environment()
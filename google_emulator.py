@@ -0,0 +1,500 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Emulador local del subconjunto de Sheets v4 y Drive v3 que usa la app, para
+# medir y probar sin credenciales ni red. Se usa apuntando los clientes a su URL:
+#   python google_emulator.py --port 8765 --latency 0.08 --throttle-rate 0.05
+#   GOOGLE_EMULATOR_URL=http://127.0.0.1:8765/ streamlit run app.py
+# o en el mismo proceso con start_emulator() + GOOGLE_CLIENTS.use_endpoint(url).
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+
+ERROR_STATUS = {
+    400: "INVALID_ARGUMENT",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+}
+
+class EmulatorError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class Faults:
+    # Latencia por petición (base + jitter uniforme), errores 503 al azar, 429 al
+    # azar y un límite de peticiones por minuto por API (como la cuota de Sheets
+    # de 60 lecturas/escrituras por minuto por usuario).
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, rate_limit=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = {}
+
+    def delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+    def inject(self, api):
+        now = time.monotonic()
+        with self._lock:
+            if self.rate_limit:
+                recent = self._recent.setdefault(api, deque())
+                while recent and now - recent[0] > 60:
+                    recent.popleft()
+                if len(recent) >= self.rate_limit:
+                    return 429
+                recent.append(now)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+#------------------------ RANGOS A1 --------------------------
+_CELL_RANGE = re.compile(r"^([A-Za-z]*)(\d*)(?::([A-Za-z]*)(\d*))?$")
+
+def column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+def parse_range(range_name):
+    # "'Tab'!A2:C", "Tab!A:A", "Tab" -> (título, fila0, fila1, col0, col1), 0-based
+    # e inclusivos; None = sin límite.
+    if "!" in range_name:
+        title, cells = range_name.rsplit("!", 1)
+    else:
+        title, cells = range_name, ""
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    match = _CELL_RANGE.match(cells)
+    if not match:
+        raise EmulatorError(400, f"Unable to parse range: {range_name}")
+    start_col, start_row, end_col, end_row = match.groups()
+    single = ":" not in cells and cells != ""
+    if single:
+        end_col, end_row = start_col, start_row
+    return (
+        title,
+        int(start_row) - 1 if start_row else 0,
+        int(end_row) - 1 if end_row else None,
+        column_index(start_col) if start_col else 0,
+        column_index(end_col) if end_col else None,
+    )
+
+def _trim(rows):
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] in ("", None):
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+def _cell_value(cell):
+    value = cell.get("userEnteredValue", {})
+    for key in ("stringValue", "numberValue", "boolValue", "formulaValue"):
+        if key in value:
+            return value[key]
+    return ""
+
+#------------------------ ESTADO --------------------------
+class EmulatorState:
+    # Hojas y archivos en memoria. `autocreate` crea al vuelo las hojas de cálculo
+    # y carpetas raíz que se pidan por id, así la app funciona con cualquier secreto.
+    def __init__(self, autocreate=True):
+        self.autocreate = autocreate
+        self.lock = threading.RLock()
+        self.spreadsheets = {}
+        self.files = {}
+        self.contents = {}
+        self.uploads = {}
+        self._next_sheet_id = 1
+
+    # Sheets
+    def spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            if not self.autocreate:
+                raise EmulatorError(404, "Requested entity was not found.")
+            spreadsheet = self.spreadsheets[spreadsheet_id] = {"title": spreadsheet_id, "sheets": []}
+        return spreadsheet
+
+    def add_sheet(self, spreadsheet_id, title, rows=None):
+        with self.lock:
+            spreadsheet = self.spreadsheet(spreadsheet_id)
+            if any(sheet["title"] == title for sheet in spreadsheet["sheets"]):
+                raise EmulatorError(400, f'A sheet with the name "{title}" already exists.')
+            sheet = {"title": title, "sheetId": self._next_sheet_id, "rows": [list(row) for row in rows or []]}
+            self._next_sheet_id += 1
+            spreadsheet["sheets"].append(sheet)
+            return sheet
+
+    def sheet(self, spreadsheet_id, title=None, sheet_id=None):
+        for sheet in self.spreadsheet(spreadsheet_id)["sheets"]:
+            if sheet["title"] == title or (sheet_id is not None and sheet["sheetId"] == sheet_id):
+                return sheet
+        raise EmulatorError(400, f"Unable to parse range: {title if title is not None else sheet_id}")
+
+    def metadata(self, spreadsheet_id):
+        with self.lock:
+            spreadsheet = self.spreadsheet(spreadsheet_id)
+            return {
+                "spreadsheetId": spreadsheet_id,
+                "properties": {"title": spreadsheet["title"]},
+                "sheets": [{"properties": self.sheet_properties(spreadsheet_id, sheet)} for sheet in spreadsheet["sheets"]],
+            }
+
+    def sheet_properties(self, spreadsheet_id, sheet):
+        # gspread lee gridProperties tanto del metadata como de la respuesta de addSheet.
+        return {
+            "sheetId": sheet["sheetId"], "title": sheet["title"], "sheetType": "GRID",
+            "index": self.spreadsheet(spreadsheet_id)["sheets"].index(sheet),
+            "gridProperties": {
+                "rowCount": max(DEFAULT_ROW_COUNT, len(sheet["rows"])),
+                "columnCount": max([DEFAULT_COLUMN_COUNT] + [len(row) for row in sheet["rows"]]),
+            },
+        }
+
+    def get_values(self, spreadsheet_id, range_name, major_dimension="ROWS"):
+        with self.lock:
+            title, row0, row1, col0, col1 = parse_range(range_name)
+            rows = self.sheet(spreadsheet_id, title)["rows"]
+            selected = [
+                row[col0:None if col1 is None else col1 + 1]
+                for row in rows[row0:None if row1 is None else row1 + 1]
+            ]
+        values = _trim(selected)
+        if major_dimension == "COLUMNS" and values:
+            width = max(len(row) for row in values)
+            values = _trim([[row[i] if i < len(row) else "" for row in values] for i in range(width)])
+        result = {"range": range_name, "majorDimension": major_dimension}
+        if values:
+            result["values"] = values
+        return result
+
+    def append_values(self, spreadsheet_id, range_name, values):
+        with self.lock:
+            title = parse_range(range_name)[0]
+            sheet = self.sheet(spreadsheet_id, title)
+            start = len(_trim(sheet["rows"])) + 1
+            sheet["rows"] = _trim(sheet["rows"]) + [list(row) for row in values]
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updates": {
+                "spreadsheetId": spreadsheet_id,
+                "updatedRange": f"'{title}'!A{start}:A{start + len(values) - 1}",
+                "updatedRows": len(values),
+            },
+        }
+
+    def batch_update(self, spreadsheet_id, requests):
+        # Como la API real: se valida todo antes de aplicar nada.
+        with self.lock:
+            spreadsheet = self.spreadsheet(spreadsheet_id)
+            titles = {sheet["title"] for sheet in spreadsheet["sheets"]}
+            ids = {sheet["sheetId"] for sheet in spreadsheet["sheets"]}
+            for request in requests:
+                if "addSheet" in request:
+                    title = request["addSheet"]["properties"]["title"]
+                    if title in titles:
+                        raise EmulatorError(400, f'A sheet with the name "{title}" already exists.')
+                    titles.add(title)
+                elif "appendCells" in request:
+                    if request["appendCells"]["sheetId"] not in ids:
+                        raise EmulatorError(400, f"No grid with id: {request['appendCells']['sheetId']}")
+                else:
+                    raise EmulatorError(400, f"Unsupported request: {', '.join(request)}")
+
+            replies = []
+            for request in requests:
+                if "addSheet" in request:
+                    sheet = self.add_sheet(spreadsheet_id, request["addSheet"]["properties"]["title"])
+                    ids.add(sheet["sheetId"])
+                    replies.append({"addSheet": {"properties": self.sheet_properties(spreadsheet_id, sheet)}})
+                else:
+                    sheet = self.sheet(spreadsheet_id, sheet_id=request["appendCells"]["sheetId"])
+                    rows = [[_cell_value(cell) for cell in row.get("values", [])] for row in request["appendCells"]["rows"]]
+                    sheet["rows"] = _trim(sheet["rows"]) + rows
+                    replies.append({})
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    # Drive
+    def add_file(self, name, parents=(), mime_type=FOLDER_MIME_TYPE, content=b"", file_id=None):
+        with self.lock:
+            file_id = file_id or uuid.uuid4().hex[:28]
+            self.files[file_id] = {
+                "id": file_id, "name": name, "mimeType": mime_type, "parents": list(parents),
+                "trashed": False, "size": str(len(content)),
+            }
+            self.contents[file_id] = content
+            return dict(self.files[file_id])
+
+    def get_file(self, file_id):
+        with self.lock:
+            if file_id not in self.files:
+                if not self.autocreate:
+                    raise EmulatorError(404, f"File not found: {file_id}.")
+                self.add_file(file_id, file_id=file_id)
+            return dict(self.files[file_id])
+
+    def copy_file(self, file_id, metadata):
+        with self.lock:
+            if file_id not in self.files:
+                raise EmulatorError(404, f"File not found: {file_id}.")
+            source = self.files[file_id]
+            return self.add_file(
+                metadata.get("name", source["name"]), metadata.get("parents", source["parents"]),
+                source["mimeType"], self.contents.get(file_id, b"")
+            )
+
+    def list_files(self, query, page_size=100, page_token=None):
+        filters = _parse_query(query or "")
+        with self.lock:
+            matches = [dict(file) for file in self.files.values() if all(check(file) for check in filters)]
+        start = int(page_token or 0)
+        page = matches[start:start + page_size]
+        result = {"files": page}
+        if start + page_size < len(matches):
+            result["nextPageToken"] = str(start + page_size)
+        return result
+
+_QUERY_CLAUSES = [
+    (re.compile(r"^name\s*=\s*'((?:[^'\\]|\\.)*)'$"), lambda value: lambda file: file["name"] == value.replace("\\'", "'")),
+    (re.compile(r"^mimeType\s*=\s*'([^']*)'$"), lambda value: lambda file: file["mimeType"] == value),
+    (re.compile(r"^'([^']*)'\s+in\s+parents$"), lambda value: lambda file: value in file["parents"]),
+    (re.compile(r"^trashed\s*=\s*(true|false)$"), lambda value: lambda file: file["trashed"] == (value == "true")),
+]
+
+def _parse_query(query):
+    filters = []
+    for clause in filter(None, (part.strip() for part in re.split(r"\s+and\s+", query))):
+        for pattern, build in _QUERY_CLAUSES:
+            match = pattern.match(clause)
+            if match:
+                filters.append(build(match.group(1)))
+                break
+        else:
+            raise EmulatorError(400, f"Invalid Value: unsupported query clause {clause!r}")
+    return filters
+
+#------------------------ HTTP --------------------------
+class _EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        emulator = self.server.emulator
+        url = urlparse(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+        body = self._body()
+        api = "drive" if path.startswith(("/drive/", "/upload/drive/")) else "sheets"
+
+        time.sleep(emulator.faults.delay())
+        injected = emulator.faults.inject(api)
+        emulator.record(api, method, path, injected)
+        if injected:
+            message = "Quota exceeded (emulated)." if injected == 429 else "The service is currently unavailable (emulated)."
+            return self._send(injected, {"error": {"code": injected, "message": message, "status": ERROR_STATUS[injected]}})
+
+        try:
+            status, payload, headers = emulator.route(method, path, query, self.headers, body)
+        except EmulatorError as e:
+            status, payload, headers = e.code, {"error": {"code": e.code, "message": e.message, "status": ERROR_STATUS.get(e.code, "UNKNOWN")}}, None
+        except Exception as e:
+            status, payload, headers = 500, {"error": {"code": 500, "message": str(e), "status": "INTERNAL"}}, None
+        self._send(status, payload, headers)
+
+class GoogleEmulator:
+    def __init__(self, state=None, faults=None, host="127.0.0.1", port=0):
+        self.state = state or EmulatorState()
+        self.faults = faults or Faults()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _EmulatorHandler)
+        self.server.daemon_threads = True
+        self.server.emulator = self
+        self.url = f"http://{host}:{self.server.server_address[1]}/"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="google-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self):
+        with self._stats_lock:
+            return Counter(self.stats)
+
+    def record(self, api, method, path, injected):
+        # Los ids y rangos se reemplazan para agrupar por operación (values/{range}:append).
+        endpoint = re.sub(r"(spreadsheets|files|values)/[^/:]+", r"\1/{id}", path)
+        endpoint = endpoint.replace("values/{id}", "values/{range}")
+        with self._stats_lock:
+            self.stats[f"{api} {method} {endpoint}"] += 1
+            if injected:
+                self.stats[f"injected {injected}"] += 1
+
+    def route(self, method, path, query, headers, body):
+        param = lambda name, default=None: query.get(name, [default])[0]
+
+        # Drive: subidas
+        if path == "/upload/drive/v3/files" and method == "POST":
+            upload_type = param("uploadType")
+            if upload_type == "multipart":
+                metadata, content = _split_multipart(headers.get("Content-Type", ""), body)
+                return 200, self._create_file(metadata, content), None
+            if upload_type == "resumable" and param("upload_id") is None:
+                upload_id = uuid.uuid4().hex
+                with self.state.lock:
+                    self.state.uploads[upload_id] = {"metadata": json.loads(body or b"{}"), "content": bytearray()}
+                location = f"{self.url.rstrip('/')}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+                return 200, None, {"Location": location}
+        if path == "/upload/drive/v3/files" and method == "PUT":
+            return self._resumable_chunk(param("upload_id"), headers, body)
+
+        # Drive: metadatos
+        if path == "/drive/v3/files":
+            if method == "GET":
+                return 200, self.state.list_files(param("q"), int(param("pageSize", 100)), param("pageToken")), None
+            if method == "POST":
+                return 200, self._create_file(json.loads(body or b"{}"), b""), None
+        match = re.match(r"^/drive/v3/files/([^/]+)(/copy)?$", path)
+        if match:
+            file_id = unquote(match.group(1))
+            if match.group(2) and method == "POST":
+                return 200, self.state.copy_file(file_id, json.loads(body or b"{}")), None
+            if method == "GET":
+                return 200, self.state.get_file(file_id), None
+
+        # Sheets
+        match = re.match(r"^/v4/spreadsheets/([^/:]+)(.*)$", path)
+        if match:
+            spreadsheet_id, rest = unquote(match.group(1)), match.group(2)
+            if rest == "" and method == "GET":
+                return 200, self.state.metadata(spreadsheet_id), None
+            if rest == ":batchUpdate" and method == "POST":
+                return 200, self.state.batch_update(spreadsheet_id, json.loads(body)["requests"]), None
+            if rest == "/values:batchGet" and method == "GET":
+                dimension = param("majorDimension", "ROWS")
+                return 200, {
+                    "spreadsheetId": spreadsheet_id,
+                    "valueRanges": [self.state.get_values(spreadsheet_id, name, dimension) for name in query.get("ranges", [])],
+                }, None
+            values = re.match(r"^/values/(.+?)(:append)?$", rest)
+            if values:
+                range_name = unquote(values.group(1))
+                if values.group(2) and method == "POST":
+                    return 200, self.state.append_values(spreadsheet_id, range_name, json.loads(body).get("values", [])), None
+                if method == "GET":
+                    return 200, self.state.get_values(spreadsheet_id, range_name, param("majorDimension", "ROWS")), None
+
+        raise EmulatorError(404, f"Not emulated: {method} {path}")
+
+    def _create_file(self, metadata, content):
+        return self.state.add_file(
+            metadata.get("name", "Untitled"), metadata.get("parents", []),
+            metadata.get("mimeType", "application/octet-stream"), bytes(content)
+        )
+
+    def _resumable_chunk(self, upload_id, headers, body):
+        with self.state.lock:
+            upload = self.state.uploads.get(upload_id)
+            if upload is None:
+                raise EmulatorError(404, "Upload session not found.")
+            upload["content"].extend(body)
+            received = len(upload["content"])
+        total = (headers.get("Content-Range") or "").rsplit("/", 1)[-1]
+        if total != "*" and total.isdigit() and received >= int(total):
+            with self.state.lock:
+                self.state.uploads.pop(upload_id, None)
+            return 200, self._create_file(upload["metadata"], upload["content"]), None
+        # 308 "Resume Incomplete": el cliente sigue con el siguiente bloque.
+        return 308, None, {"Range": f"bytes=0-{received - 1}"}
+
+def _split_multipart(content_type, body):
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    parts = list(message.iter_parts())
+    metadata = json.loads(parts[0].get_payload(decode=True) or b"{}")
+    content = parts[1].get_payload(decode=True) if len(parts) > 1 else b""
+    return metadata, content
+
+def start_emulator(faults=None, state=None, port=0):
+    return GoogleEmulator(state=state, faults=faults, port=port).start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emulador local de Google Sheets/Drive para la app de cotizaciones.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por petición")
+    parser.add_argument("--jitter", type=float, default=0.0, help="segundos extra al azar (uniforme)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fracción de respuestas 429")
+    parser.add_argument("--rate-limit", type=int, default=None, help="peticiones por minuto por API antes de 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.rate_limit, args.seed)
+    emulator = GoogleEmulator(faults=faults, host=args.host, port=args.port).start()
+    print(f"Google emulator on {emulator.url} (GOOGLE_EMULATOR_URL={emulator.url})")
+    try:
+        while True:
+            time.sleep(60)
+            print(", ".join(f"{key}: {count}" for key, count in sorted(emulator.snapshot().items())))
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -0,0 +1,591 @@
+import argparse
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from streamlit.runtime.pages_manager import PagesManager
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.testing.v1.util import patch_config_options
+
+from google_emulator import Faults, start_emulator
+
+# Prueba de carga de la app completa: N comerciales simulados recorren
+# select_sales_rep → client_name → add_services → client_data →
+# requested_services → finalizar, cada uno en su propia sesión de Streamlit
+# (AppTest), todos en este proceso y contra google_emulator.py. Así se mide lo
+# que comparten las sesiones de un servidor real: cachés, GIL, pools de
+# conexiones, cola de envío y backend de Google.
+#
+# python load_test.py --users 1,4,8,16 --quotes 3 --latency 0.05
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = os.path.join(REPO_DIR, "app.py")
+# Archivos de datos que la app lee desde el directorio de trabajo.
+DATA_EXTENSIONS = (".csv", ".png", ".xlsx", ".json")
+
+LOAD_TEST_SECRETS = {
+    "general": {
+        "sheet_id": "load-test-quotes",
+        "drive_id": "load-test-drive",
+        "time_sheet_id": "load-test-time",
+        "parent_folder": "load-test-parent",
+    },
+    "google_sheets_credentials": {},
+    "google_drive_credentials": {},
+}
+
+SALES_REPS = [
+    "Pedro Luis Bruges", "Andrés Consuegra", "Ivan Zuluaga", "Sharon Zuñiga", "Johnny Farah",
+    "Felipe Hoyos", "Jorge Sánchez", "Irina Paternina", "Stephanie Bruges", "Pricing",
+]
+# Rutas marítimas habituales (países del catálogo de puertos).
+ORIGIN_COUNTRIES = ["China", "Spain", "Germany", "Netherlands", "United States", "Mexico", "Brazil"]
+DESTINATION_COUNTRIES = ["Colombia", "Panama", "United States", "Mexico"]
+INCOTERMS = ["FOB", "CIF", "CFR"]
+CONTAINERS = ["20' Dry Standard", "40' Dry Standard", "40' Dry High Cube"]
+COMMODITIES = ["Auto parts", "Textiles", "Coffee machines", "Ceramic tiles", "Electronics", "Furniture"]
+# Adjuntos por cotización (KB): facturas y packing lists, a veces un archivo
+# mayor que el límite multipart para pasar por la subida resumable.
+ATTACHMENT_SIZES_KB = [180, 350, 900, 2400]
+LARGE_ATTACHMENT_KB = 6 * 1024
+
+RUN_TIMEOUT = 60
+SUBMISSION_TIMEOUT = 300
+MEMORY_SAMPLE_INTERVAL = 0.05
+# Un nivel de concurrencia que no mejora el throughput al menos esto respecto
+# al anterior se considera saturado.
+SATURATION_GAIN = 1.10
+
+class LoadTestError(Exception):
+    pass
+
+#------------------------ SESIONES --------------------------
+# Un solo ScriptCache para todas las sesiones, como el Runtime de un servidor:
+# app.py se compila una vez. LocalScriptRunner crea uno por rerun, lo que suma
+# la compilación a cada rerun y, con varios hilos compilando a la vez, dispara
+# "AST constructor recursion depth mismatch" en CPython 3.11.
+SCRIPT_CACHE = ScriptCache()
+
+class SessionScriptRunner(LocalScriptRunner):
+    # LocalScriptRunner usa siempre "test session id": cada comercial necesita
+    # su propio id para tener su carpeta temp_uploads/<session_id>/.
+    def __init__(self, session_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_id = session_id
+        self._script_cache = SCRIPT_CACHE
+
+class SessionAppTest(AppTest):
+    # AppTest._run reemplaza en cada rerun el Runtime y st.secrets globales y
+    # los restaura al terminar: con varias sesiones en paralelo una deja a la
+    # otra sin runtime. Aquí el runtime, los secretos y la configuración se
+    # instalan una vez para todo el proceso (install_runtime), como en un servidor.
+    def __init__(self, session_id, script_path=APP_SCRIPT, default_timeout=RUN_TIMEOUT):
+        super().__init__(script_path, default_timeout=default_timeout)
+        self.session_id = session_id
+
+    def _run(self, widget_state=None, timeout=None):
+        runner = SessionScriptRunner(
+            self.session_id,
+            self._script_path,
+            self.session_state,
+            PagesManager(self._script_path, setup_watcher=False),
+            args=self.args,
+            kwargs=self.kwargs,
+        )
+        self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+        self._tree._runner = self
+        return self
+
+def install_runtime(secrets):
+    import streamlit as st
+    from unittest.mock import MagicMock
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.secrets import Secrets
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+    st.secrets = Secrets()
+    st.secrets._secrets = secrets
+
+def prepare_workdir(workdir):
+    # La app escribe sus SQLite, temp_uploads y pending_uploads en el directorio
+    # actual: la prueba corre en uno aparte para no tocar el log de envíos real.
+    os.makedirs(workdir, exist_ok=True)
+    for name in os.listdir(REPO_DIR):
+        source = os.path.join(REPO_DIR, name)
+        target = os.path.join(workdir, name)
+        if os.path.isfile(source) and name.endswith(DATA_EXTENSIONS) and not os.path.exists(target):
+            os.symlink(source, target)
+    os.chdir(workdir)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+#------------------------ MÉTRICAS --------------------------
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = []
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self.timings[kind].append(seconds)
+
+    def error(self, message):
+        with self._lock:
+            self.errors.append(message)
+
+    def summary(self, kind):
+        values = self.timings.get(kind, [])
+        return {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # ru_maxrss es el pico (KB en Linux, bytes en macOS).
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+class MemorySampler:
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="load-test-memory", daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+#------------------------ ESCENARIO --------------------------
+class Scenario:
+    # Cotización de flete marítimo con rutas reales del catálogo de puertos,
+    # paquetes (LCL) o contenedores (FCL) y adjuntos.
+    def __init__(self, ports_index, client_names, new_client_rate=0.2, lcl_rate=0.6, max_routes=2, max_packages=3):
+        self.ports_index = ports_index
+        self.client_names = client_names
+        self.new_client_rate = new_client_rate
+        self.lcl_rate = lcl_rate
+        self.max_routes = max_routes
+        self.max_packages = max_packages
+
+    def _port(self, rng, countries):
+        country = rng.choice([c for c in countries if c in self.ports_index.location_options])
+        return country, rng.choice(self.ports_index.location_options[country][1:])
+
+    def quote(self, rng, tag, number):
+        routes = []
+        for _ in range(rng.randint(1, self.max_routes)):
+            origin_country, origin_port = self._port(rng, ORIGIN_COUNTRIES)
+            destination_country, destination_port = self._port(rng, DESTINATION_COUNTRIES)
+            routes.append((origin_country, origin_port, destination_country, destination_port))
+
+        modality = "LCL" if rng.random() < self.lcl_rate else "FCL"
+        packages = [
+            {
+                "quantity": rng.randint(1, 20),
+                "weight_lcl": round(rng.uniform(50, 900), 2),
+                "length": round(rng.uniform(60, 240), 1),
+                "width": round(rng.uniform(60, 120), 1),
+                "height": round(rng.uniform(40, 180), 1),
+            }
+            for _ in range(rng.randint(1, self.max_packages))
+        ] if modality == "LCL" else []
+
+        attachments = [rng.choice(ATTACHMENT_SIZES_KB) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.1:
+            attachments.append(LARGE_ATTACHMENT_KB)
+
+        new_client = rng.random() < self.new_client_rate or not self.client_names
+        return {
+            "sales_rep": rng.choice(SALES_REPS),
+            "client": f"Load Test Client {tag}-{number}" if new_client else rng.choice(self.client_names),
+            "new_client": new_client,
+            "reference": f"LT-{tag}-{number}",
+            "modality": modality,
+            "incoterm": rng.choice(INCOTERMS),
+            "routes": routes,
+            "commodity": rng.choice(COMMODITIES),
+            "hs_code": f"{rng.randint(1000, 9999)}.{rng.randint(10, 99)}",
+            "containers": rng.sample(CONTAINERS, rng.randint(1, 2)) if modality == "FCL" else [],
+            "pickup_city": rng.choice(["Shanghai", "Valencia", "Hamburg", "Houston", "Manzanillo"]),
+            "packages": packages,
+            "attachments_kb": attachments,
+            "final_comments": rng.choice(["", "Urgent", "Client needs the quote today", "Include insurance options"]),
+        }
+
+#------------------------ COMERCIAL SIMULADO --------------------------
+class SimulatedRep:
+    def __init__(self, rep_id, scenario, metrics, seed=None, think_time=0.0):
+        self.rep_id = rep_id
+        # Único entre niveles: los clientes nuevos y las referencias no se repiten.
+        self.tag = f"{rep_id}-{os.urandom(4).hex()}"
+        self.session_id = f"load-test-{self.tag}"
+        self.app = SessionAppTest(self.session_id)
+        self.scenario = scenario
+        self.metrics = metrics
+        self.rng = random.Random(seed)
+        self.think_time = think_time
+        self.request_ids = []
+
+    # Cada interacción es un rerun, como en el navegador. AppTest reejecuta el
+    # script completo también para los widgets de un st.fragment, así que la
+    # latencia medida es una cota superior para esas secciones.
+    def _rerun(self, element=None, kind="rerun"):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+        started = time.perf_counter()
+        (element or self.app).run()
+        self.metrics.record(kind, time.perf_counter() - started)
+        if self.app.exception:
+            raise LoadTestError(f"{self.session_id} page {self.page}: {self.app.exception[0].value}")
+
+    def _state(self, key, default=None):
+        return self.app.session_state[key] if key in self.app.session_state else default
+
+    @property
+    def page(self):
+        return self._state("page")
+
+    def _button(self, label):
+        for button in self.app.button:
+            if button.label == label:
+                return button.click()
+        raise LoadTestError(f"{self.session_id} page {self.page}: no '{label}' button")
+
+    def _expect_page(self, page):
+        if self.page != page:
+            messages = [element.value for element in list(self.app.error) + list(self.app.warning)]
+            raise LoadTestError(f"{self.session_id}: expected page {page}, on {self.page} {messages[:3]}")
+
+    def _select(self, key, value):
+        self._rerun(self.app.selectbox(key=key).select(value))
+
+    def _type(self, key, value):
+        widget = self.app.text_area(key=key) if key in ("final_comments",) else self.app.text_input(key=key)
+        self._rerun(widget.input(value))
+
+    def _number(self, key, value):
+        self._rerun(self.app.number_input(key=key).set_value(value))
+
+    def choose_client(self, quote):
+        if not quote["new_client"]:
+            self._select("client_input", quote["client"])
+        else:
+            self._select("client_input", "+ Add New")
+            self._type("new_client_name", quote["client"])
+            # Otro comercial puede agregar un cliente parecido entre una
+            # interacción y otra: entonces la app pide confirmar y se guarda de nuevo.
+            for _ in range(3):
+                confirm = [checkbox for checkbox in self.app.checkbox if checkbox.key == "confirm_new_client"]
+                if confirm and not confirm[0].value:
+                    self._rerun(confirm[0].check())
+                self._rerun(self._button("Save Client"))
+                if self._state("new_client_saved"):
+                    break
+        self._type("reference", quote["reference"])
+        self._rerun(self._button("Next"))
+        self._expect_page("add_services")
+
+    def fill_routes(self, routes):
+        for i, (origin_country, origin_port, destination_country, destination_port) in enumerate(routes):
+            if i:
+                self._rerun(self._button("➕ Add another route"))
+            self._select(f"country_origin_{i}", origin_country)
+            self._select(f"port_origin_{i}", origin_port)
+            self._select(f"country_destination_{i}", destination_country)
+            self._select(f"port_destination_{i}", destination_port)
+
+    def fill_packages(self, packages):
+        for i, package in enumerate(packages):
+            self._rerun(self._button("Add Package"))
+            for field in ("quantity", "weight_lcl", "length", "width", "height"):
+                self._number(f"{field}_{i}", package[field])
+
+    def attach_files(self, sizes_kb):
+        # AppTest no simula st.file_uploader: los adjuntos se dejan donde los
+        # guarda save_file_locally y se cuenta el rerun del upload.
+        from utils import session_upload_dir
+        upload_dir = session_upload_dir(self.session_id)
+        os.makedirs(upload_dir, exist_ok=True)
+        for i, size_kb in enumerate(sizes_kb):
+            with open(os.path.join(upload_dir, f"attachment_{i + 1}_{size_kb}kb.pdf"), "wb") as f:
+                f.write(self.rng.randbytes(size_kb * 1024))
+        self._rerun()
+
+    def run_quote(self, number):
+        quote = self.scenario.quote(self.rng, self.tag, number)
+        started = time.perf_counter()
+
+        if self.page is None:
+            self._rerun()
+        self._expect_page("select_sales_rep")
+        self._select("commercial", quote["sales_rep"])
+        self._rerun(self._button("Next"))
+        self._expect_page("client_name")
+
+        self.choose_client(quote)
+
+        self._select("service", "International Freight")
+        self._rerun(self._button("Next"))
+        self._expect_page("client_data")
+
+        self._select("modality_op", quote["modality"])
+        self._select("incoterm", quote["incoterm"])
+        self.fill_routes(quote["routes"])
+        self._type("commodity", quote["commodity"])
+        self._type("hs_code", quote["hs_code"])
+        if quote["modality"] == "LCL":
+            self.fill_packages(quote["packages"])
+        else:
+            self._rerun(self.app.multiselect(key="type_container").set_value(quote["containers"]))
+            self._type("pickup_city", quote["pickup_city"])
+        if quote["final_comments"]:
+            self._type("final_comments", quote["final_comments"])
+        self.attach_files(quote["attachments_kb"])
+        self._rerun(self.app.button(key="add_service").click())
+        self._expect_page("requested_services")
+
+        self._rerun(self._button("Finalize Quotation"), kind="finalize")
+        finalized_at = time.time()
+        self._expect_page("select_sales_rep")
+        pending = self._state("pending_requests", [])
+        if not pending:
+            raise LoadTestError(f"{self.session_id}: finalize did not queue a submission")
+        self.metrics.record("quote", time.perf_counter() - started)
+        self.request_ids.append(pending[-1])
+        return pending[-1], finalized_at
+
+    def run(self, quotes, submissions):
+        for number in range(quotes):
+            try:
+                request_id, finalized_at = self.run_quote(number)
+            except Exception as e:
+                self.metrics.error(f"{type(e).__name__}: {e}")
+                # La sesión queda en un estado desconocido: se empieza otra.
+                self.app = SessionAppTest(self.session_id)
+                continue
+            submissions.append((request_id, finalized_at))
+
+#------------------------ NIVELES --------------------------
+def wait_for_submissions(submissions, metrics, timeout=SUBMISSION_TIMEOUT):
+    from submission import get_submission_queue, JOB_DONE, JOB_FAILED
+    queue = get_submission_queue()
+    deadline = time.time() + timeout
+    pending = dict(submissions)
+    last_finished = 0.0
+    while pending and time.time() < deadline:
+        for request_id, finalized_at in list(pending.items()):
+            job = queue.status(request_id) or {}
+            if job.get("status") == JOB_DONE:
+                metrics.record("submission", job["finished_at"] - finalized_at)
+                last_finished = max(last_finished, job["finished_at"])
+                del pending[request_id]
+            elif job.get("status") == JOB_FAILED:
+                metrics.error(f"submission {request_id} failed: {job.get('error')}")
+                del pending[request_id]
+        time.sleep(0.02)
+    for request_id in pending:
+        metrics.error(f"submission {request_id} not finished after {timeout} s")
+    return last_finished
+
+def backend_calls(before, after):
+    calls = Counter()
+    for key, count in after.items():
+        api = key.split(" ", 1)[0]
+        if api in ("sheets", "drive"):
+            calls[api] += count - before.get(key, 0)
+    return calls
+
+def run_level(users, quotes, scenario, emulator, seed=None, think_time=0.0):
+    metrics = Metrics()
+    submissions = []
+    stats_before = emulator.snapshot()
+    gc.collect()
+    baseline = rss_bytes()
+    reps = [SimulatedRep(i, scenario, metrics, seed=None if seed is None else seed * 1000 + i, think_time=think_time)
+            for i in range(users)]
+    barrier = threading.Barrier(users)
+
+    def session(rep):
+        barrier.wait()
+        rep.run(quotes, submissions)
+
+    with MemorySampler() as memory:
+        started = time.time()
+        threads = [threading.Thread(target=session, args=(rep,), name=f"load-test-rep-{rep.rep_id}") for rep in reps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ui_finished = time.time()
+        drained = wait_for_submissions(submissions, metrics)
+
+    finished = len(metrics.timings.get("submission", []))
+    calls = backend_calls(stats_before, emulator.snapshot())
+    return {
+        "users": users,
+        "quotes": len(submissions),
+        "saved": finished,
+        "errors": metrics.errors,
+        "rerun": metrics.summary("rerun"),
+        "finalize": metrics.summary("finalize"),
+        "submission": metrics.summary("submission"),
+        "quote": metrics.summary("quote"),
+        "ui_seconds": ui_finished - started,
+        "total_seconds": max(drained, ui_finished) - started,
+        "throughput_per_min": finished / max(max(drained, ui_finished) - started, 1e-9) * 60,
+        "memory_per_session_mb": max(0, memory.peak - baseline) / users / 2**20,
+        "peak_rss_mb": memory.peak / 2**20,
+        "sheets_calls_per_quote": calls["sheets"] / max(finished, 1),
+        "drive_calls_per_quote": calls["drive"] / max(finished, 1),
+    }
+
+def throughput_ceiling(results):
+    # El techo es el mejor throughput medido; el primer nivel que no mejora
+    # SATURATION_GAIN respecto al anterior marca la saturación.
+    best = max(results, key=lambda result: result["throughput_per_min"])
+    saturated_at = None
+    for previous, current in zip(results, results[1:]):
+        if current["throughput_per_min"] < previous["throughput_per_min"] * SATURATION_GAIN:
+            saturated_at = current["users"]
+            break
+    return best, saturated_at
+
+#------------------------ ENTORNO --------------------------
+def seed_clients(emulator, names):
+    emulator.state.add_sheet(LOAD_TEST_SECRETS["general"]["time_sheet_id"], "clientes", rows=[["Client"]] + [[name] for name in names])
+
+def load_client_names(path="customers.csv", limit=None):
+    from client_directory import load_csv_names
+    names = [name.strip() for name in load_csv_names(path) if name.strip()]
+    return names[:limit] if limit else names
+
+def setup(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="quotation-load-test-")
+    prepare_workdir(workdir)
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.rate_limit, args.seed)
+    emulator = start_emulator(faults=faults)
+    install_runtime(LOAD_TEST_SECRETS)
+
+    from google_clients import GOOGLE_CLIENTS
+    from reference_data import load_ports_index
+    from utils import timing_logger, load_clients
+    GOOGLE_CLIENTS.use_endpoint(emulator.url)
+    # Un log por fragmento en cada rerun taparía el reporte (Streamlit restablece
+    # el nivel de sus loggers, así que se desactiva).
+    timing_logger.disabled = True
+
+    seed_clients(emulator, load_client_names())
+    # Los nombres tal como los muestra el selectbox (el directorio descarta duplicados).
+    scenario = Scenario(load_ports_index(), load_clients(), new_client_rate=args.new_client_rate, lcl_rate=args.lcl_rate)
+    return workdir, emulator, scenario
+
+def print_level(result):
+    rerun, finalize, submission = result["rerun"], result["finalize"], result["submission"]
+    print(
+        f"{result['users']:>5} users | quotes {result['quotes']:4} saved {result['saved']:4} errors {len(result['errors']):3} | "
+        f"rerun p50/p95/p99 {rerun['p50_ms']:6.0f}/{rerun['p95_ms']:6.0f}/{rerun['p99_ms']:6.0f} ms ({rerun['count']}) | "
+        f"finalize p50/p95/p99 {finalize['p50_ms']:5.0f}/{finalize['p95_ms']:5.0f}/{finalize['p99_ms']:5.0f} ms | "
+        f"saved in p50/p95 {submission['p50_ms'] / 1000:5.2f}/{submission['p95_ms'] / 1000:5.2f} s | "
+        f"{result['throughput_per_min']:6.1f} quotes/min | {result['memory_per_session_mb']:6.1f} MB/session "
+        f"(peak RSS {result['peak_rss_mb']:.0f} MB) | per quote: sheets {result['sheets_calls_per_quote']:.1f}, "
+        f"drive {result['drive_calls_per_quote']:.1f} calls"
+    )
+    for error in result["errors"][:3]:
+        print(f"        {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga multiusuario de la app de cotizaciones.")
+    parser.add_argument("--users", default="1,2,4,8", help="niveles de concurrencia, p. ej. 1,4,8,16")
+    parser.add_argument("--quotes", type=int, default=2, help="cotizaciones por comercial en cada nivel")
+    parser.add_argument("--think", type=float, default=0.0, help="segundos de pausa media entre interacciones")
+    parser.add_argument("--new-client-rate", type=float, default=0.2)
+    parser.add_argument("--lcl-rate", type=float, default=0.6)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia del backend de Google por petición")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--keep", action="store_true", help="no borrar el directorio de trabajo")
+    args = parser.parse_args(argv)
+    levels = [int(users) for users in args.users.split(",")]
+
+    repo_cwd = os.getcwd()
+    workdir, emulator, scenario = setup(args)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            # Calentamiento: importaciones, snapshots de catálogos y clientes de Google.
+            warmup = run_level(1, 1, scenario, emulator, seed=args.seed)
+            if warmup["errors"]:
+                print("warm-up failed:")
+                print_level(warmup)
+                return 1
+
+            print(f"{args.quotes} quotes per user, backend latency {args.latency * 1000:.0f} ms, think time {args.think:.1f} s")
+            results = []
+            for users in levels:
+                result = run_level(users, args.quotes, scenario, emulator, seed=args.seed, think_time=args.think)
+                results.append(result)
+                print_level(result)
+
+        best, saturated_at = throughput_ceiling(results)
+        saturation = f", saturated at {saturated_at} users" if saturated_at else ", not saturated in the tested range"
+        print(f"throughput ceiling: {best['throughput_per_min']:.1f} quotes/min at {best['users']} users{saturation}")
+        # Sostenido, el envío no puede superar el cupo de Sheets del proceso (resilience.py).
+        from resilience import SHEETS_POLICY
+        sheets_per_quote = max(result["sheets_calls_per_quote"] for result in results)
+        if sheets_per_quote:
+            budget = SHEETS_POLICY.budget.capacity
+            print(f"Sheets budget: {budget:.0f} requests/min / {sheets_per_quote:.1f} calls per quote = "
+                  f"{budget / sheets_per_quote:.1f} quotes/min sustained")
+        print("backend calls: " + ", ".join(f"{key}: {count}" for key, count in sorted(emulator.snapshot().items())))
+    finally:
+        emulator.stop()
+        os.chdir(repo_cwd)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import streamlit as st
+import numpy as np
+import re
+import unicodedata
+from collections import namedtuple
+
+from reference_data import PORTS_FILE, CITIES_FILE, load_catalog
+
+# Índice de trigramas sobre nombre, código (UN/LOCODE) y país de cada ubicación.
+# `postings` guarda, para cada trigrama, los ids de las entradas que lo contienen.
+SearchIndex = namedtuple("SearchIndex", ["names", "codes", "countries", "keys", "gram_counts", "postings"])
+SearchMatch = namedtuple("SearchMatch", ["name", "code", "country", "score"])
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+def trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def build_search_index(catalog, name_column, country_column, code_column=None):
+    names = catalog.columns[name_column]
+    countries = catalog.columns[country_column]
+    codes = catalog.columns[code_column] if code_column else None
+
+    valid = names.codes >= 0
+    code_codes = codes.codes[valid] if codes is not None else np.full(int(valid.sum()), -1)
+    entries = np.unique(
+        np.stack([names.codes[valid], countries.codes[valid], code_codes]).astype(np.int64), axis=1
+    ).T.tolist()
+
+    entry_names, entry_codes, entry_countries, entry_keys, gram_counts = [], [], [], [], []
+    gram_ids, pair_grams, pair_entries = {}, [], []
+    for entry_id, (name_code, country_code, code) in enumerate(entries):
+        name = names.categories[name_code]
+        country = countries.categories[country_code] if country_code >= 0 else ""
+        code = codes.categories[code] if code >= 0 else ""
+        key = normalize(name)
+
+        entry_names.append(name)
+        entry_codes.append(code)
+        entry_countries.append(country)
+        entry_keys.append(key)
+
+        grams = trigrams(f"{key} {normalize(code)} {normalize(country)}")
+        gram_counts.append(len(grams))
+        for gram in grams:
+            pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+            pair_entries.append(entry_id)
+
+    pair_grams = np.asarray(pair_grams, dtype=np.int32)
+    pair_entries = np.asarray(pair_entries, dtype=np.int32)
+    order = np.argsort(pair_grams, kind="stable")
+    splits = np.searchsorted(pair_grams[order], np.arange(1, len(gram_ids)))
+    posting_lists = np.split(pair_entries[order], splits)
+
+    return SearchIndex(
+        names=tuple(entry_names),
+        codes=tuple(entry_codes),
+        countries=tuple(entry_countries),
+        keys=tuple(entry_keys),
+        gram_counts=np.asarray(gram_counts, dtype=np.float32),
+        postings={gram: posting_lists[gram_id] for gram, gram_id in gram_ids.items()},
+    )
+
+def search(index, query, limit=10):
+    query = normalize(query)
+    if not query:
+        return []
+
+    query_grams = [gram for gram in trigrams(query) if gram in index.postings]
+    if not query_grams:
+        return []
+
+    hits = np.bincount(
+        np.concatenate([index.postings[gram] for gram in query_grams]),
+        minlength=len(index.names)
+    ).astype(np.float32)
+    # Cobertura de la consulta + un poco de similitud inversa para preferir
+    # entradas cortas ("Cartagena" antes que "Cartagena de Indias Anchorage").
+    scores = hits / len(trigrams(query)) + 0.25 * hits / np.maximum(index.gram_counts, 1)
+
+    candidates = np.flatnonzero(hits)
+    pool = min(len(candidates), max(limit * 5, 50))
+    candidates = candidates[np.argpartition(-scores[candidates], pool - 1)[:pool]]
+
+    compact_query = query.replace(" ", "")
+    matches = []
+    for entry in candidates.tolist():
+        score = float(scores[entry])
+        if index.keys[entry] == query:
+            score += 1.0
+        elif index.keys[entry].startswith(query):
+            score += 0.5
+        if index.codes[entry] and index.codes[entry].lower() == compact_query:
+            score += 1.0
+        matches.append(SearchMatch(index.names[entry], index.codes[entry], index.countries[entry], score))
+
+    matches.sort(key=lambda match: (-match.score, match.name))
+    return matches[:limit]
+
+def format_match(match):
+    code = f" ({match.code})" if match.code else ""
+    return f"{match.name}{code} — {match.country}"
+
+@st.cache_resource
+def load_ports_search_index():
+    return build_search_index(load_catalog(PORTS_FILE), "port name", "country", "port code")
+
+@st.cache_resource
+def load_cities_search_index():
+    return build_search_index(load_catalog(CITIES_FILE), "City", "Country")
@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+import csv
+import io
+import os
+import re
+from collections import namedtuple
+
+from cargo_measurements import PACKAGE_DTYPE, PACKAGING_TYPES, WEIGHT_UNITS, LENGTH_UNITS, measure_packages, cargo_totals
+
+PACKING_LIST_CHUNK_ROWS = 5000
+MAX_REPORTED_ERRORS = 200
+
+# `volume` (CBM) es opcional: solo se usa en líneas sin dimensiones.
+PACKAGE_COLUMNS = ["type_packaging", "quantity", "weight_lcl", "weight_unit", "length", "width", "height", "length_unit", "volume"]
+
+# Encabezados aceptados (normalizados: minúsculas, sin signos ni texto entre paréntesis).
+COLUMN_ALIASES = {
+    "type_packaging": ["type packaging", "packaging", "packaging type", "package type", "type", "package", "tipo", "embalaje", "tipo de empaque"],
+    "quantity": ["quantity", "qty", "pcs", "pieces", "packages", "units", "cantidad", "bultos"],
+    "weight_lcl": ["weight lcl", "weight", "unit weight", "weight per unit", "gross weight", "gw", "peso", "peso unitario"],
+    "weight_unit": ["weight unit", "weight uom", "unidad peso", "unidad de peso"],
+    "length": ["length", "long", "l", "largo"],
+    "width": ["width", "w", "ancho"],
+    "height": ["height", "h", "alto"],
+    "length_unit": ["length unit", "dimension unit", "dimensions unit", "dim unit", "uom", "unidad medida", "unidad de medida"],
+    "volume": ["volume", "cbm", "m3", "volumen"],
+}
+REQUIRED_COLUMNS = ("quantity", "weight_lcl")
+
+PACKAGING_ALIASES = {
+    "pallet": "Pallet", "pallets": "Pallet", "plt": "Pallet", "plts": "Pallet", "estiba": "Pallet", "estibas": "Pallet",
+    "box": "Box", "boxes": "Box", "carton": "Box", "cartons": "Box", "ctn": "Box", "ctns": "Box", "caja": "Box", "cajas": "Box",
+    "bag": "Bag", "bags": "Bag", "sack": "Bag", "sacks": "Bag", "saco": "Bag", "sacos": "Bag", "bolsa": "Bag",
+}
+WEIGHT_UNIT_ALIASES = {
+    "kg": "KG", "kgs": "KG", "kilo": "KG", "kilos": "KG",
+    "ton": "Ton", "tons": "Ton", "t": "Ton", "tonelada": "Ton", "toneladas": "Ton",
+    "lb": "Lbs", "lbs": "Lbs", "libra": "Lbs", "libras": "Lbs",
+}
+LENGTH_UNIT_ALIASES = {
+    "cm": "CM", "cms": "CM", "m": "M", "mts": "M", "mt": "M", "mm": "MM",
+    "in": "Inches", "inch": "Inches", "inches": "Inches", "pulgadas": "Inches",
+}
+
+PackingListImport = namedtuple("PackingListImport", ["array", "errors", "rows"])
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_HEADER_UNIT = re.compile(r"\(([^)]*)\)|\[([^\]]*)\]")
+
+def _normalize(text):
+    return _NON_ALNUM.sub(" ", str(text).lower()).strip()
+
+def _lookup(aliases, canonical):
+    lookup = {_normalize(value): value for value in canonical}
+    lookup.update(aliases)
+    return lookup
+
+PACKAGING_LOOKUP = _lookup(PACKAGING_ALIASES, PACKAGING_TYPES)
+WEIGHT_UNIT_LOOKUP = _lookup(WEIGHT_UNIT_ALIASES, WEIGHT_UNITS)
+LENGTH_UNIT_LOOKUP = _lookup(LENGTH_UNIT_ALIASES, LENGTH_UNITS)
+
+def map_columns(columns):
+    # Devuelve {campo: columna del archivo} y las unidades escritas en el
+    # encabezado, p. ej. "Weight (lbs)" o "Length [in]".
+    header_aliases = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping, header_units = {}, {}
+    for column in columns:
+        unit = _HEADER_UNIT.search(str(column))
+        field = header_aliases.get(_normalize(_HEADER_UNIT.sub(" ", str(column))))
+        if not field or field in mapping:
+            continue
+        mapping[field] = column
+        if unit:
+            header_units[field] = _normalize(unit.group(1) or unit.group(2))
+
+    missing = [field for field in REQUIRED_COLUMNS if field not in mapping]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}. Found: {', '.join(map(str, columns))}")
+    return mapping, header_units
+
+def _sniff_delimiter(sample):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+def read_chunks(file, name=None, chunk_rows=PACKING_LIST_CHUNK_ROWS):
+    # Lee el archivo por bloques de filas; nunca arma el packing list completo en un DataFrame.
+    name = (name or getattr(file, "name", "")).lower()
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+    if name.endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX packing lists require the openpyxl package; upload a CSV instead.")
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            header = [str(value) if value is not None else "" for value in header]
+            batch = []
+            for row in rows:
+                if any(value not in (None, "") for value in row):
+                    batch.append(row[:len(header)])
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            workbook.close()
+        return
+
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        sample = text.read(64 * 1024)
+        text.seek(0)
+        with pd.read_csv(
+            text, sep=_sniff_delimiter(sample), chunksize=chunk_rows, dtype=str,
+            skip_blank_lines=True, skipinitialspace=True
+        ) as reader:
+            yield from reader
+    finally:
+        # Soltar el wrapper sin cerrar el archivo subido (se vuelve a leer en otro rerun).
+        if text is not file:
+            text.detach()
+
+def _codes(values, lookup, canonical, default):
+    # Se normalizan solo los valores distintos (pocos) y se expanden con los códigos de factorize.
+    positions, uniques = pd.factorize(values.fillna("").astype(str))
+    names = [_normalize(value) or _normalize(default) for value in uniques]
+    unique_codes = np.array([canonical.index(lookup[name]) if name in lookup else -1 for name in names] + [-1], dtype=np.int16)
+    return unique_codes[positions]
+
+def _numbers(frame, field):
+    if field not in frame:
+        return np.zeros(len(frame)), np.zeros(len(frame), dtype=bool)
+    raw = frame[field]
+    values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+
+    # Solo las celdas que no parsearon pasan por la limpieza de texto ("3,5", " 12 ").
+    retry = np.flatnonzero(np.isnan(values) & raw.notna().to_numpy())
+    invalid = np.zeros(len(values), dtype=bool)
+    if retry.size:
+        text = raw.iloc[retry].astype(str).str.strip()
+        blank = (text == "").to_numpy()
+        cleaned = pd.to_numeric(text.str.replace(",", ".", regex=False), errors="coerce").to_numpy(dtype=np.float64)
+        values[retry] = cleaned
+        invalid[retry] = np.isnan(cleaned) & ~blank
+
+    # Vacías cuentan como 0.
+    return np.where(np.isnan(values), 0.0, values), invalid
+
+def parse_frame(frame, default_weight_unit="KG", default_length_unit="CM", first_row=1):
+    # `frame` usa las columnas de PACKAGE_COLUMNS (las del packing list ya
+    # renombradas o las del editor). Valida en bloque y devuelve todas las filas
+    # como PACKAGE_DTYPE, la máscara de filas válidas y un DataFrame de errores
+    # (fila, mensaje). Las filas inválidas pueden tener códigos -1: no se miden.
+    size = len(frame)
+    empty = pd.Series([""] * size, index=frame.index, dtype=object)
+    packaging = _codes(frame.get("type_packaging", empty), PACKAGING_LOOKUP, PACKAGING_TYPES, "Pallet")
+    weight_unit = _codes(frame.get("weight_unit", empty), WEIGHT_UNIT_LOOKUP, WEIGHT_UNITS, default_weight_unit)
+    length_unit = _codes(frame.get("length_unit", empty), LENGTH_UNIT_LOOKUP, LENGTH_UNITS, default_length_unit)
+
+    quantity, bad_quantity = _numbers(frame, "quantity")
+    weight, bad_weight = _numbers(frame, "weight_lcl")
+    length, bad_length = _numbers(frame, "length")
+    width, bad_width = _numbers(frame, "width")
+    height, bad_height = _numbers(frame, "height")
+    volume, bad_volume = _numbers(frame, "volume")
+    kilovolume, bad_kilovolume = _numbers(frame, "kilovolume")
+
+    checks = [
+        (packaging < 0, "unknown packaging type"),
+        (weight_unit < 0, "unknown weight unit"),
+        (length_unit < 0, "unknown length unit"),
+        (bad_quantity | (quantity <= 0) | (quantity != np.floor(quantity)), "quantity must be a whole number greater than 0"),
+        (bad_weight | (weight < 0), "weight must be a number ≥ 0"),
+        (bad_length | bad_width | bad_height | (length < 0) | (width < 0) | (height < 0), "dimensions must be numbers ≥ 0"),
+        (bad_volume | (volume < 0), "volume must be a number ≥ 0"),
+        (bad_kilovolume | (kilovolume < 0), "kilovolume must be a number ≥ 0"),
+    ]
+    invalid = np.zeros(size, dtype=bool)
+    error_rows, error_messages = [], []
+    for mask, message in checks:
+        rows = np.flatnonzero(mask)
+        invalid |= mask
+        error_rows.append(rows + first_row)
+        error_messages.append(np.full(len(rows), message, dtype=object))
+
+    array = np.zeros(size, dtype=PACKAGE_DTYPE)
+    array["packaging"] = packaging
+    array["quantity"] = np.where(bad_quantity, 0, quantity)
+    array["weight"] = weight
+    array["weight_unit"] = weight_unit
+    array["length"] = length
+    array["width"] = width
+    array["height"] = height
+    array["length_unit"] = length_unit
+    array["volume"] = volume
+    array["kilovolume"] = kilovolume
+
+    errors = pd.DataFrame({"row": np.concatenate(error_rows), "error": np.concatenate(error_messages)})
+    return array, ~invalid, errors.sort_values("row", kind="stable").reset_index(drop=True)
+
+def frame_to_array(frame, default_weight_unit="KG", default_length_unit="CM", first_row=1):
+    # Solo las filas válidas (el import descarta las demás y las reporta).
+    array, valid, errors = parse_frame(frame, default_weight_unit, default_length_unit, first_row)
+    return array[valid], errors
+
+def import_packing_list(file, default_weight_unit="KG", default_length_unit="CM", name=None, chunk_rows=PACKING_LIST_CHUNK_ROWS):
+    arrays, errors = [], []
+    mapping = header_units = None
+    rows = 0
+    for chunk in read_chunks(file, name=name, chunk_rows=chunk_rows):
+        if mapping is None:
+            mapping, header_units = map_columns(chunk.columns)
+        frame = chunk[list(mapping.values())].rename(columns={column: field for field, column in mapping.items()})
+
+        weight_default = WEIGHT_UNIT_LOOKUP.get(header_units.get("weight_lcl", ""), default_weight_unit)
+        length_default = LENGTH_UNIT_LOOKUP.get(
+            header_units.get("length") or header_units.get("width") or header_units.get("height", ""), default_length_unit
+        )
+        # Fila 1 = encabezado, así que los números coinciden con los de la hoja.
+        array, chunk_errors = frame_to_array(frame, weight_default, length_default, first_row=rows + 2)
+        arrays.append(array)
+        if len(chunk_errors) and sum(len(e) for e in errors) < MAX_REPORTED_ERRORS:
+            errors.append(chunk_errors)
+        rows += len(chunk)
+
+    if mapping is None:
+        raise ValueError("The packing list is empty.")
+
+    array = np.concatenate(arrays) if arrays else np.zeros(0, dtype=PACKAGE_DTYPE)
+    errors = pd.concat(errors, ignore_index=True).head(MAX_REPORTED_ERRORS) if errors else pd.DataFrame(columns=["row", "error"])
+    return PackingListImport(array=array, errors=errors, rows=rows)
+
+def array_to_frame(array):
+    return pd.DataFrame({
+        "type_packaging": np.asarray(PACKAGING_TYPES, dtype=object)[array["packaging"]],
+        "quantity": array["quantity"].astype(np.int64),
+        "weight_lcl": array["weight"],
+        "weight_unit": np.asarray(WEIGHT_UNITS, dtype=object)[array["weight_unit"]],
+        "length": array["length"],
+        "width": array["width"],
+        "height": array["height"],
+        "length_unit": np.asarray(LENGTH_UNITS, dtype=object)[array["length_unit"]],
+        "volume": array["volume"],
+    })
+
+def grid_to_packages(frame, transport_type=None):
+    # Arma la lista de dicts de st.session_state.packages de una vez. Las filas
+    # incompletas se conservan tal como están (con sus errores) y solo quedan
+    # fuera de las medidas y los totales.
+    array, valid, errors = parse_frame(frame)
+    measures = measure_packages(array[valid], transport_type)
+
+    packages = packages_to_frame(frame, transport_type).reset_index(drop=True)
+    if "kilovolume" not in packages:
+        packages["kilovolume"] = 0.0
+    packages["total_weight"] = 0.0
+    packages.loc[valid, "volume"] = measures.cbm
+    packages.loc[valid, "total_weight"] = measures.gross_weight_kg
+    if transport_type == "Air":
+        packages.loc[valid, "kilovolume"] = measures.volumetric_weight_kg
+    return packages.to_dict("records"), cargo_totals(array[valid], measures), errors
+
+def packages_to_frame(packages, transport_type=None):
+    # En aéreo la tabla incluye los KVM manuales de las líneas sin dimensiones.
+    columns = PACKAGE_COLUMNS + ["kilovolume"] if transport_type == "Air" else PACKAGE_COLUMNS
+    frame = pd.DataFrame(packages, columns=columns)
+    frame["quantity"] = pd.to_numeric(frame["quantity"], errors="coerce").fillna(0).astype(np.int64)
+    for column in ("weight_lcl", "length", "width", "height", "volume", "kilovolume"):
+        if column not in frame:
+            continue
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").fillna(0.0).astype(np.float64)
+    frame["type_packaging"] = frame["type_packaging"].fillna("Pallet")
+    frame["weight_unit"] = frame["weight_unit"].fillna("KG")
+    frame["length_unit"] = frame["length_unit"].fillna("CM")
+    return frame
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Prueba manual: python packing_list.py archivo.csv|archivo.xlsx [Air|Maritime]
+    path = sys.argv[1]
+    started = time.perf_counter()
+    with open(path, "rb") as file:
+        result = import_packing_list(file, name=os.path.basename(path))
+    seconds = time.perf_counter() - started
+    totals = cargo_totals(result.array, measure_packages(result.array, sys.argv[2] if len(sys.argv) > 2 else None))
+    print(f"{result.rows} rows, {len(result.array)} valid, {len(result.errors)} errors in {seconds * 1000:.1f} ms")
+    print(totals)
+    print(result.errors.head(20).to_string(index=False))
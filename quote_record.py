@@ -0,0 +1,222 @@
+from cargo_measurements import packages_to_array, measure_packages, cargo_totals
+
+all_quotes_columns =[
+    "request_id", "time", "commercial", "service", "client", "client_reference", "incoterm", "commodity", "hs_code", "transport_type", "modality", "routes_info", "ground_routes", "country_origin", "country_destination", "pickup_address", "zip_code_origin", "delivery_address", "zip_code_destination", "addresses",
+    "type_container", "info_flatrack", "container_characteristics", "imo", "ground_service", "reefer_details", "additional_costs", "cargo_value", "weight", "positioning", "pickup_city", "lcl_fcl_mode",
+    "info_pallets_str", "lcl_description", "stackable", "final_comments",
+]
+
+CONTAINER_CHARACTERISTICS = [
+    ("reinforced", "Reinforced"),
+    ("food_grade", "Food Grade"),
+    ("isotank", "Isotank"),
+    ("flexitank", "Flexitank"),
+]
+REEFER_CONTAINERS = ["Reefer 20'", "Reefer 40'"]
+REEFER_GROUND_SERVICES = ["Mula Refrigerada", "Drayage Reefer 20 STD", "Drayage Reefer 40 STD"]
+ADDITIONAL_COSTS = [
+    ("destination_cost", "Destination Cost Required"),
+    ("customs_origin", "Customs at Origin Required"),
+    ("insurance_required", "Insurance Required"),
+]
+
+# Campos que se resumen aparte; el resto de los detalles se copian tal cual.
+SUMMARIZED_FIELDS = frozenset([
+    "reinforced", "food_grade", "isotank", "flexitank", "imo_cargo", "imo_type", "un_code", "routes", "packages",
+    "dimensions_flatrack", "customs_origin", "destination_cost", "type_container", "ground_routes"
+])
+# Campos que juntan los valores de todos los servicios (sin repetir, ordenados).
+MERGED_FIELDS = ("service", "container_characteristics", "imo", "routes_info", "info_pallets_str", "info_flatrack", "type_container")
+
+def _text(value):
+    return (value or "").strip()
+
+def format_route(number, route):
+    return f"Route {number}: {route['country_origin']} ({route['port_origin']}) → {route['country_destination']} ({route['port_destination']})"
+
+def format_package(package, transport_type):
+    weight_unit = package.get("weight_unit", "KG")
+    length_unit = package.get("length_unit", "CM")
+    if transport_type == "Air":
+        volume_value, volume_label = package.get("kilovolume", 0), "KVM"
+    else:
+        volume_value, volume_label = package.get("volume", 0), "CBM"
+    return (
+        f"{package['quantity']} {package['type_packaging']}, "
+        f"Unit Weight: {package['weight_lcl']:.2f} {weight_unit}, Total Weight: {package['total_weight']:.2f} KG,"
+        f"Volume: {volume_value:.2f} {volume_label}, "
+        f"Dimensions: {package['length']:.2f} {length_unit} x {package['width']:.2f} {length_unit} x {package['height']:.2f} {length_unit}"
+    )
+
+def format_flatrack(flatrack):
+    length_unit = flatrack.get("length_unit", "CM")
+    return (
+        f"Weight: {flatrack['weight']:.2f} {flatrack.get('weight_unit', 'KG')}, "
+        f"Dimensions: {flatrack['length']:.2f} {length_unit} x "
+        f"{flatrack['width']:.2f} {length_unit} x {flatrack['height']:.2f} {length_unit}"
+    )
+
+class QuoteRecordBuilder:
+    # Convierte la lista de servicios del borrador en una fila plana con las
+    # columnas de `all_quotes_columns` (todas como texto). No usa pandas ni Streamlit.
+    def __init__(self, columns=all_quotes_columns):
+        self.columns = list(columns)
+
+    def build(self, services, request_id, time, commercial, client, client_reference):
+        record = {
+            "time": time,
+            "request_id": request_id,
+            "commercial": commercial,
+            "client": client,
+            "client_reference": client_reference,
+            "country_origin": "",
+            "country_destination": "",
+            "pickup_address": "",
+            "delivery_address": "",
+            "zip_code_origin": "",
+            "zip_code_destination": "",
+            "ground_routes": "",
+            "addresses": "",
+        }
+        merged = {field: set() for field in MERGED_FIELDS}
+        other_details = {}
+
+        for service in services:
+            details = service["details"]
+            service_name = service.get("service", "").strip().lower()
+            merged["service"].add(service["service"])
+            self._add_container(details, merged)
+            self._add_routes(details, record, merged)
+            self._add_packages(details, merged)
+            self._add_flatrack(details, merged)
+
+            if service_name == "international freight":
+                for field in ("pickup_address", "delivery_address", "zip_code_origin", "zip_code_destination"):
+                    record[field] = details.get(field, "N/A")
+
+            if service_name == "ground transportation":
+                self._add_ground_routes(details, record)
+            else:
+                record["ground_routes"] = ""
+                record["addresses"] = ""
+
+            record["reefer_details"] = self._reefer_details(details)
+            additional_costs = [label for field, label in ADDITIONAL_COSTS if details.get(field, False)]
+            record["additional_costs"] = "\n".join(additional_costs) if additional_costs else "No additional costs"
+
+            for key, value in details.items():
+                if key in SUMMARIZED_FIELDS:
+                    continue
+                if value is None or value == "" or (isinstance(value, (int, float)) and value == 0):
+                    continue
+                if isinstance(value, bool):
+                    value = "Sí"
+                other_details.setdefault(key, set()).add(str(value))
+
+        for field, values in merged.items():
+            record[field] = "\n".join(sorted(values)) if values else ""
+        for key, values in other_details.items():
+            record[key] = "\n".join(sorted(values))
+
+        return {column: record.get(column, "") for column in self.columns}
+
+    def build_row(self, services, **header):
+        record = self.build(services, **header)
+        return [record[column] for column in self.columns]
+
+    def _add_container(self, details, merged):
+        if "type_container" in details:
+            if isinstance(details["type_container"], list):
+                merged["type_container"].update(details["type_container"])
+            else:
+                merged["type_container"].add(details["type_container"])
+
+        characteristics = [label for field, label in CONTAINER_CHARACTERISTICS if details.get(field, False)]
+        if characteristics:
+            merged["container_characteristics"].add("\n".join(characteristics))
+
+        if details.get("imo_cargo", False):
+            merged["imo"].add(f"Sí, IMO Type: {details.get('imo_type', 'N/A')}, UN Code: {details.get('un_code', 'N/A')}")
+        else:
+            merged["imo"].add("No")
+
+    def _add_routes(self, details, record, merged):
+        if "routes" not in details:
+            return
+        routes = details["routes"]
+        if len(routes) == 1:
+            record["country_origin"] = routes[0]["country_origin"]
+            record["country_destination"] = routes[0]["country_destination"]
+        merged["routes_info"].update(format_route(number, route) for number, route in enumerate(routes, start=1))
+
+    def _add_packages(self, details, merged):
+        if "packages" not in details:
+            return
+        packages = details.get("packages", [])
+        transport_type = details.get("transport_type", "")
+
+        lines = {format_package(package, transport_type) for package in packages}
+        if lines:
+            merged["info_pallets_str"].add("\n".join(sorted(lines)))
+        array = packages_to_array(packages)
+        totals = cargo_totals(array, measure_packages(array, transport_type))
+        merged["info_pallets_str"].add(f"Total weight of all packages: {totals.gross_weight_kg:.2f} KG")
+
+    def _add_flatrack(self, details, merged):
+        if "dimensions_flatrack" not in details:
+            return
+        flatracks = details.get("dimensions_flatrack", [])
+        if any(any(v > 0 for v in flatrack.values() if isinstance(v, (int, float))) for flatrack in flatracks):
+            merged["info_flatrack"].add("\n".join(format_flatrack(flatrack) for flatrack in flatracks))
+        else:
+            merged["info_flatrack"].add("")
+
+    def _add_ground_routes(self, details, record):
+        ground_routes = details.get("ground_routes", [])
+        if not ground_routes:
+            record["ground_routes"] = ""
+            record["addresses"] = ""
+            record["country_origin"] = ""
+            record["country_destination"] = ""
+            return
+
+        record["country_origin"] = _text(ground_routes[0].get("country_origin"))
+        record["country_destination"] = _text(ground_routes[0].get("country_destination"))
+
+        routes, addresses = [], []
+        for number, route in enumerate(ground_routes, start=1):
+            country_origin = _text(route.get("country_origin"))
+            city_origin = _text(route.get("city_origin"))
+            country_destination = _text(route.get("country_destination"))
+            city_destination = _text(route.get("city_destination"))
+            if city_origin and country_origin and city_destination and country_destination:
+                routes.append(f"Route {number}: {city_origin} ({country_origin}) → {city_destination} ({country_destination})")
+
+            pickup_address = _text(route.get("pickup_address"))
+            zip_code_origin = _text(route.get("zip_code_origin"))
+            delivery_address = _text(route.get("delivery_address"))
+            zip_code_destination = _text(route.get("zip_code_destination"))
+            if pickup_address and zip_code_origin and delivery_address and zip_code_destination:
+                addresses.append(f"Address {number}: {pickup_address} ({zip_code_origin}) → {delivery_address} ({zip_code_destination})")
+
+        record["ground_routes"] = "\n".join(routes)
+        record["addresses"] = "\n".join(addresses)
+
+    def _reefer_details(self, details):
+        container_type = details.get("type_container", [])
+        is_reefer_container = any(ct in REEFER_CONTAINERS for ct in container_type)
+        if not is_reefer_container and details.get("ground_service", "") not in REEFER_GROUND_SERVICES:
+            return "No reefer details"
+
+        reefer_details = []
+        if details.get("drayage_reefer", False):
+            reefer_details.append("Drayage Reefer Required")
+        if details.get("pickup_thermo_king", False):
+            reefer_details.append("Thermo King Pickup Required")
+        if details.get("reefer_cont_type"):
+            reefer_details.append(f"Reefer Container Type: {details['reefer_cont_type']}")
+        if details.get("temperature_control", False):
+            reefer_details.append("Temperature Control Required")
+        if details.get("temperature"):
+            reefer_details.append(f"Temperature Range: {details['temperature']}°C")
+        return "\n".join(reefer_details) if reefer_details else "No reefer details"
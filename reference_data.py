@@ -0,0 +1,196 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import hashlib
+import os
+import sys
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+PORTS_FILE = "output_port_world.csv"
+CITIES_FILE = "cities_world.csv"
+SNAPSHOT_DIR = ".snapshots"
+
+# Catálogo compartido por todas las sesiones: cada columna queda codificada como
+# categórica (códigos enteros de solo lectura + tupla de categorías).
+CategoricalColumn = namedtuple("CategoricalColumn", ["codes", "categories"])
+Catalog = namedtuple("Catalog", ["columns", "rows"])
+
+# Las opciones incluyen el "" inicial de los selectbox, así que las posiciones
+# se pueden pasar directamente como `index=`.
+LocationIndex = namedtuple(
+    "LocationIndex",
+    ["country_options", "country_positions", "location_options", "location_positions"]
+)
+
+EMPTY_OPTIONS = ("",)
+EMPTY_POSITIONS = MappingProxyType({})
+EMPTY_LOCATION_INDEX = LocationIndex(EMPTY_OPTIONS, EMPTY_POSITIONS, EMPTY_POSITIONS, EMPTY_POSITIONS)
+
+def _encode_column(values):
+    # Categorías ordenadas: ordenar por código equivale a ordenar alfabéticamente.
+    codes, categories = pd.factorize(values.astype("string"), sort=True, use_na_sentinel=True)
+    dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+    codes = codes.astype(dtype)
+    codes.flags.writeable = False
+    return CategoricalColumn(codes=codes, categories=tuple(categories.tolist()))
+
+def build_catalog(data):
+    columns = {column: _encode_column(data[column]) for column in data.columns}
+    return Catalog(columns=MappingProxyType(columns), rows=len(data))
+
+#------------------------ SNAPSHOTS --------------------------
+# Cada CSV se convierte en un archivo Arrow IPC con columnas dictionary-encoded
+# (códigos + categorías). El nombre incluye el hash del CSV, así que un CSV
+# modificado genera un snapshot nuevo y los viejos se eliminan.
+def file_hash(file):
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def snapshot_path(file, source_hash, snapshot_dir=SNAPSHOT_DIR):
+    name = os.path.splitext(os.path.basename(file))[0]
+    return os.path.join(snapshot_dir, f"{name}.{source_hash[:16]}.arrow")
+
+# Un .tmp más viejo que esto quedó de una construcción interrumpida; uno más
+# nuevo puede ser de otro worker que está escribiendo el mismo snapshot.
+STALE_TEMP_AGE = 600
+
+def _remove_stale_snapshots(path):
+    snapshot_dir = os.path.dirname(path)
+    prefix = os.path.basename(path).rsplit(".", 2)[0] + "."
+    now = time.time()
+    for file_name in os.listdir(snapshot_dir):
+        stale = os.path.join(snapshot_dir, file_name)
+        if not file_name.startswith(prefix):
+            continue
+        try:
+            if file_name.endswith(".arrow") and stale != path:
+                os.remove(stale)
+            elif file_name.endswith(".tmp") and now - os.path.getmtime(stale) > STALE_TEMP_AGE:
+                os.remove(stale)
+        except OSError:
+            pass
+
+def build_snapshot(file, source_hash=None, snapshot_dir=SNAPSHOT_DIR):
+    source_hash = source_hash or file_hash(file)
+    path = snapshot_path(file, source_hash, snapshot_dir)
+    catalog = build_catalog(pd.read_csv(file))
+
+    arrays = [
+        pa.DictionaryArray.from_arrays(
+            pa.array(column.codes, mask=column.codes < 0),
+            pa.array(column.categories, type=pa.string()),
+        )
+        for column in catalog.columns.values()
+    ]
+    table = pa.Table.from_arrays(arrays, names=list(catalog.columns))
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # Escritura atómica: varios workers pueden intentar construir el mismo snapshot.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _remove_stale_snapshots(path)
+    return path
+
+def read_snapshot(path):
+    # El mapa de memoria queda abierto mientras viva el catálogo; los procesos
+    # que abren el mismo snapshot comparten las páginas del archivo.
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    columns = {}
+    for name, chunked in zip(table.column_names, table.columns):
+        column = chunked.combine_chunks() if chunked.num_chunks != 1 else chunked.chunk(0)
+        indices = column.indices
+        if indices.null_count:
+            indices = indices.fill_null(-1)
+        codes = indices.to_numpy(zero_copy_only=False)
+        codes.flags.writeable = False
+        columns[name] = CategoricalColumn(codes=codes, categories=tuple(column.dictionary.to_pylist()))
+    return Catalog(columns=MappingProxyType(columns), rows=table.num_rows)
+
+@st.cache_resource
+def load_catalog(file):
+    source_hash = file_hash(file)
+    path = snapshot_path(file, source_hash)
+    if not os.path.exists(path):
+        try:
+            build_snapshot(file, source_hash)
+        except OSError:
+            # Sin permisos de escritura: se usa el CSV directamente.
+            return build_catalog(pd.read_csv(file))
+    return read_snapshot(path)
+
+def _positions(options):
+    return MappingProxyType({value: position for position, value in enumerate(options) if value})
+
+def build_location_index(catalog, country_column, name_column):
+    countries = catalog.columns[country_column]
+    names = catalog.columns[name_column]
+
+    # Países en orden de aparición en el CSV, como el selectbox original.
+    country_codes = countries.codes[countries.codes >= 0]
+    present, first_rows = np.unique(country_codes, return_index=True)
+    country_options = EMPTY_OPTIONS + tuple(countries.categories[code] for code in present[np.argsort(first_rows)])
+
+    valid = (countries.codes >= 0) & (names.codes >= 0)
+    size = len(names.categories)
+    keys = np.unique(countries.codes[valid].astype(np.int64) * size + names.codes[valid])
+    group_codes, location_codes = np.divmod(keys, size)
+    starts = np.flatnonzero(np.r_[True, np.diff(group_codes) != 0]) if keys.size else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)]
+
+    location_options = {}
+    location_positions = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        country = countries.categories[group_codes[start]]
+        options = EMPTY_OPTIONS + tuple(names.categories[code] for code in location_codes[start:end].tolist())
+        location_options[country] = options
+        location_positions[country] = _positions(options)
+
+    return LocationIndex(
+        country_options=country_options,
+        country_positions=_positions(country_options),
+        location_options=MappingProxyType(location_options),
+        location_positions=MappingProxyType(location_positions),
+    )
+
+@st.cache_resource
+def load_location_index(file, country_column, name_column):
+    return build_location_index(load_catalog(file), country_column, name_column)
+
+def load_ports_index():
+    return load_location_index(PORTS_FILE, "country", "port name")
+
+def load_cities_index():
+    return load_location_index(CITIES_FILE, "Country", "City")
+
+def country_position(index, country):
+    return index.country_positions.get(country, 0)
+
+def locations_for(index, country):
+    if not country:
+        return EMPTY_OPTIONS, EMPTY_POSITIONS
+    return (
+        index.location_options.get(country, EMPTY_OPTIONS),
+        index.location_positions.get(country, EMPTY_POSITIONS),
+    )
+
+if __name__ == "__main__":
+    # Paso de build: python reference_data.py [archivo.csv ...]
+    for file in sys.argv[1:] or [PORTS_FILE, CITIES_FILE]:
+        if os.path.exists(file):
+            print(f"{file} -> {build_snapshot(file)}")
+        else:
+            print(f"{file} no existe, se omite.")
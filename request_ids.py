@@ -0,0 +1,79 @@
+import streamlit as st
+import sqlite3
+import threading
+import time
+
+from utils import load_existing_ids_from_sheets
+
+REQUEST_IDS_DB = "request_ids.sqlite3"
+RECONCILE_INTERVAL = 600
+REQUEST_ID_PREFIX = "Q"
+
+def max_request_number(existing_ids):
+    numbers = [
+        int(request_id[1:]) for request_id in existing_ids
+        if request_id.startswith(REQUEST_ID_PREFIX) and request_id[1:].isdigit()
+    ]
+    return max(numbers, default=0)
+
+def format_request_id(number):
+    return f"{REQUEST_ID_PREFIX}{number:04d}"
+
+class RequestIdAllocator:
+    # Contador en SQLite: el upsert ... RETURNING toma el lock de escritura de la
+    # base, así que dos sesiones (o dos procesos) nunca reciben el mismo número.
+    def __init__(self, path=REQUEST_IDS_DB, name="quote"):
+        self.path = path
+        self.name = name
+        self._execute("PRAGMA journal_mode=WAL")
+        self._execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _execute(self, sql, params=()):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def is_seeded(self):
+        return self._execute("SELECT 1 FROM counters WHERE name = ?", (self.name,)) is not None
+
+    def seed(self, value):
+        # Nunca retrocede: solo avanza si el valor externo es mayor.
+        self._execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+            (self.name, value)
+        )
+
+    def allocate(self):
+        row = self._execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+            (self.name,)
+        )
+        return format_request_id(row[0])
+
+def reconcile_with_sheets(allocator):
+    allocator.seed(max_request_number(load_existing_ids_from_sheets()))
+
+def _reconcile_forever(allocator, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reconcile_with_sheets(allocator)
+        except Exception:
+            pass
+
+@st.cache_resource
+def get_request_id_allocator():
+    allocator = RequestIdAllocator()
+    if not allocator.is_seeded():
+        reconcile_with_sheets(allocator)
+
+    # La hoja sigue siendo la fuente de verdad si otra instancia asigna IDs.
+    threading.Thread(
+        target=_reconcile_forever, args=(allocator, RECONCILE_INTERVAL),
+        name="request-id-reconcile", daemon=True
+    ).start()
+    return allocator
@@ -0,0 +1,231 @@
+import random
+import socket
+import sys
+import threading
+import time
+from googleapiclient.errors import HttpError
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    pass
+
+class QuotaExceededError(Exception):
+    pass
+
+class UnconfirmedWriteError(Exception):
+    # Una escritura falló sin saber si el servidor la aplicó (timeout, 5xx,
+    # conexión cortada). No se repite a ciegas: quien la llamó debe comprobar.
+    pass
+
+def _loaded(module, name):
+    # gspread y httplib2 se importan al construir los clientes (google_clients);
+    # si todavía no están cargados, el error no puede venir de ellos.
+    module = sys.modules.get(module)
+    return getattr(module, name) if module else None
+
+def _status(error):
+    if isinstance(error, HttpError):
+        return error.resp.status
+    api_error = _loaded("gspread.exceptions", "APIError")
+    if api_error and isinstance(error, api_error):
+        return error.response.status_code
+    return None
+
+def _causes(error):
+    # El error y los que lo provocaron: `raise ... from`, el error de urllib3 que
+    # requests recibe como argumento y el `reason` de MaxRetryError.
+    pending, seen = [error], set()
+    while pending:
+        error = pending.pop()
+        if not isinstance(error, BaseException) or id(error) in seen:
+            continue
+        seen.add(id(error))
+        yield error
+        pending.extend([error.__cause__, error.__context__, getattr(error, "reason", None)])
+        pending.extend(error.args)
+
+def _not_sent_errors():
+    # Errores de conexión que ocurren antes de enviar la petición.
+    errors = [ConnectionRefusedError, socket.gaierror]
+    for module, name in [
+        ("httplib2", "ServerNotFoundError"),
+        ("requests.exceptions", "ConnectTimeout"),
+        ("urllib3.exceptions", "NewConnectionError"),
+        ("urllib3.exceptions", "ConnectTimeoutError"),
+    ]:
+        error = _loaded(module, name)
+        if error:
+            errors.append(error)
+    return tuple(errors)
+
+def safe_to_resend(error):
+    # Una escritura solo se repite si el servidor seguro no la aplicó: la
+    # rechazó por cuota (429) o la conexión falló antes de enviarla.
+    status = _status(error)
+    if status is not None:
+        return status == 429
+    not_sent = _not_sent_errors()
+    return any(isinstance(cause, not_sent) for cause in _causes(error))
+
+def is_unconfirmed_write(error):
+    return any(isinstance(cause, UnconfirmedWriteError) for cause in _causes(error))
+
+def is_retryable(error):
+    status = _status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    httplib2_error = _loaded("httplib2", "HttpLib2Error")
+    if httplib2_error and isinstance(error, httplib2_error):
+        return True
+    return isinstance(error, (OSError, TimeoutError))
+
+def is_interactive():
+    # El hilo del script de una sesión (un usuario esperando la página). El worker
+    # de envíos y el de recuperación no tienen ScriptRunContext.
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30):
+    # "Full jitter": espera aleatoria entre 0 y base * 2^intento, con tope.
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def with_backoff(operation, max_attempts=5, base_delay=0.5, max_delay=30, retryable=is_retryable):
+    for attempt in range(max_attempts):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+class CircuitBreaker:
+    # closed -> open tras `failure_threshold` fallos seguidos; después de
+    # `reset_timeout` segundos deja pasar una llamada de prueba (half-open).
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+class QuotaBudget:
+    # Token bucket: `per_minute` peticiones por minuto compartidas por todas las sesiones.
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1, timeout=10):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return True
+                wait = (cost - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class ResiliencePolicy:
+    def __init__(self, name, max_attempts=5, base_delay=0.5, max_delay=30,
+                 failure_threshold=5, reset_timeout=60, requests_per_minute=60):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = QuotaBudget(requests_per_minute)
+
+    @property
+    def degraded(self):
+        return self.breaker.is_open
+
+    def call(self, operation, cost=1, retryable=is_retryable, fallback=None, write=False):
+        # `fallback` es el modo degradado: se usa si el circuito está abierto o
+        # se agotan los intentos. Sin fallback se propaga el error.
+        # `write` marca una escritura no idempotente (fila, carpeta, archivo):
+        # solo se repite si safe_to_resend(); con cualquier otro error transitorio
+        # se lanza UnconfirmedWriteError, sin fallback, para que el paso del envío
+        # la retome con replay=True y compruebe si se aplicó.
+        # Sin cupo, una sesión no espera: pasa directo al fallback (o
+        # QuotaExceededError) para degradar en vez de congelar la página; solo los
+        # workers en segundo plano esperan hasta `max_delay` a que se libere.
+        interactive = is_interactive()
+        for attempt in range(self.max_attempts):
+            if not self.breaker.allow():
+                if fallback is not None:
+                    return fallback()
+                raise CircuitOpenError(f"{self.name}: circuit open, service temporarily unavailable")
+
+            # Quedarse sin cupo propio no es un fallo del servicio: no abre el circuito.
+            if not self.budget.acquire(cost, timeout=0 if interactive else self.max_delay):
+                self.breaker.release()
+                if interactive or attempt == self.max_attempts - 1:
+                    if fallback is not None:
+                        return fallback()
+                    raise QuotaExceededError(f"{self.name}: request budget exhausted")
+                continue
+
+            try:
+                result = operation()
+            except Exception as e:
+                if not retryable(e):
+                    # Un 404/400 significa que el servicio respondió: cuenta como sano.
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if write and not safe_to_resend(e):
+                    raise UnconfirmedWriteError(f"{self.name}: write may have been applied: {e}") from e
+                if attempt == self.max_attempts - 1:
+                    if fallback is not None:
+                        return fallback()
+                    raise
+                time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+                continue
+
+            self.breaker.record_success()
+            return result
+
+# Políticas compartidas por proceso. Cuotas por defecto de Google: Sheets 60
+# peticiones/minuto por usuario; Drive es mucho más holgado.
+SHEETS_POLICY = ResiliencePolicy("Google Sheets", requests_per_minute=60)
+DRIVE_POLICY = ResiliencePolicy("Google Drive", requests_per_minute=600)
@@ -0,0 +1,311 @@
+import streamlit as st
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils import (
+    PARENT_FOLDER_ID, sheet_id, time_sheet_id,
+    validate_shared_drive_folder, create_folder, log_time, save_quote_row,
+    upload_all_files_to_google_drive, client_directory, load_existing_ids_from_sheets, session_upload_dir,
+    submission_logger
+)
+from google_clients import GOOGLE_CLIENTS
+from resilience import SHEETS_POLICY, UnconfirmedWriteError, is_unconfirmed_write, with_backoff
+from submission_log import SUBMISSION_LOG, QUOTE_DONE, QUOTE_FAILED, STEP_DONE, MAX_REPLAYS
+
+PENDING_UPLOADS_DIR = "pending_uploads"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Los trabajos terminados se conservan un tiempo para que la UI pueda consultarlos.
+FINISHED_JOB_TTL = 3600
+# Mientras un worker tiene una cotización, otros procesos no la retoman.
+LEASE_SECONDS = 900
+RECOVERY_INTERVAL = 300
+
+#------------------------ STEPS --------------------------
+# Cada paso recibe el dict `quote` armado en la UI y puede completarlo
+# (folder_id, folder_link) para los pasos siguientes. `replay` indica que hubo
+# un intento anterior que pudo haberse aplicado: el paso debe comprobarlo antes
+# de repetir el efecto. Un paso solo se repite en el momento si una escritura
+# quedó sin confirmar (UnconfirmedWriteError); cualquier otro fallo deja la
+# cotización fallida y el worker de recuperación la retoma más tarde.
+def create_quote_folder(quote, replay=False):
+    if not validate_shared_drive_folder(PARENT_FOLDER_ID):
+        raise RuntimeError("Parent folder not found or inaccessible.")
+
+    # create_folder reutiliza la carpeta si ya existe una con ese nombre.
+    folder_id = create_folder(quote["request_id"], PARENT_FOLDER_ID)
+    if not folder_id:
+        raise RuntimeError(f"Failed to create folder for {quote['request_id']}.")
+
+    quote["folder_id"] = folder_id
+    quote["folder_link"] = f"https://drive.google.com/drive/folders/{folder_id}"
+
+def log_quote_time(quote, replay=False):
+    if replay and quote["request_id"] in load_existing_ids_from_sheets():
+        return
+    if not log_time(quote["start_time"], quote["end_time"], quote["duration"], quote["request_id"]):
+        raise RuntimeError("Google Sheets unavailable, duration time was not logged.")
+
+def save_new_client(quote, replay=False):
+    if not quote.get("new_client"):
+        return
+    directory = client_directory()
+    if replay and directory.sync(force=True) and directory.lookup(quote["client"]):
+        return
+    SHEETS_POLICY.call(
+        lambda: GOOGLE_CLIENTS.gspread.open_by_key(time_sheet_id).worksheet("clientes").append_row([quote["client"]]),
+        cost=3, write=True
+    )
+    # Las demás sesiones lo ven sin vaciar la caché; el próximo sync lee la fila nueva.
+    directory.add(quote["client"])
+
+def save_quote_record(quote, replay=False):
+    record = dict(quote["record"])
+    record["request_id"] = f'=HYPERLINK("{quote["folder_link"]}"; "{quote["request_id"]}")'
+    save_quote_row(record, quote["request_id"], sheet_id, replay=replay)
+
+def upload_quote_files(quote, replay=False):
+    upload_dir = quote.get("upload_dir")
+    if not upload_dir or not os.path.exists(upload_dir):
+        return
+
+    # Los archivos que ya están en la carpeta (por nombre) no se vuelven a subir.
+    quote["upload_report"] = upload_all_files_to_google_drive(quote["folder_id"], GOOGLE_CLIENTS.drive, source_dir=upload_dir)
+
+    # upload_all_files_to_google_drive borra cada archivo subido; lo que quede falló.
+    remaining = [name for _, _, files in os.walk(upload_dir) for name in files]
+    if remaining:
+        errors = {error["name"]: error["error"] for error in quote["upload_report"]["errors"]}
+        details = [f"{name} ({errors[name]})" if name in errors else name for name in remaining]
+        if any(error.get("unconfirmed") for error in quote["upload_report"]["errors"]):
+            # Al repetir el paso se listan los archivos de la carpeta y no se suben de nuevo.
+            raise UnconfirmedWriteError(f"Files not uploaded: {', '.join(details)}")
+        raise RuntimeError(f"Files not uploaded: {', '.join(details)}")
+    shutil.rmtree(upload_dir, ignore_errors=True)
+
+# (nombre, función, campos de `quote` que el paso produce y se guardan en el log)
+SUBMISSION_STEPS = [
+    ("folder", create_quote_folder, ("folder_id", "folder_link")),
+    ("time_log", log_quote_time, ()),
+    ("client", save_new_client, ()),
+    ("sheets", save_quote_record, ()),
+    ("files", upload_quote_files, ("upload_report",)),
+]
+
+def encode_quote(quote):
+    payload = dict(quote)
+    for field in ("start_time", "end_time"):
+        if isinstance(payload.get(field), datetime):
+            payload[field] = payload[field].isoformat()
+    return payload
+
+def decode_quote(payload):
+    quote = dict(payload)
+    for field in ("start_time", "end_time"):
+        if isinstance(quote.get(field), str):
+            quote[field] = datetime.fromisoformat(quote[field])
+    return quote
+
+def stage_attachments(request_id, temp_dir=None):
+    # Los adjuntos se mueven fuera de la carpeta de la sesión para que
+    # clear_temp_directory() no los borre mientras el trabajo sigue en cola.
+    upload_dir = os.path.join(PENDING_UPLOADS_DIR, request_id)
+    os.makedirs(upload_dir, exist_ok=True)
+    for root, _, files in os.walk(temp_dir or session_upload_dir()):
+        for file_name in files:
+            shutil.move(os.path.join(root, file_name), os.path.join(upload_dir, file_name))
+    return upload_dir
+
+#------------------------ QUEUE --------------------------
+class SubmissionQueue:
+    def __init__(self, max_workers=4, max_attempts=3, log=SUBMISSION_LOG):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quote-submission")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_attempts = max_attempts
+        self.log = log
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def submit(self, quote):
+        # El payload queda en el log antes de cualquier efecto externo: si el
+        # proceso se cae, el worker de recuperación lo retoma.
+        return self._enqueue(quote["request_id"], quote)
+
+    def _enqueue(self, request_id, quote=None):
+        # El registro en el log y el alta del trabajo van bajo el mismo lock:
+        # recover() nunca ve una cotización nueva sin su trabajo en cola.
+        with self._lock:
+            job = self._jobs.get(request_id)
+            if job and job["status"] in (JOB_QUEUED, JOB_RUNNING):
+                return None
+            if quote is None:
+                self.log.mark_replay(request_id)
+            else:
+                self.log.record_quote(request_id, encode_quote(quote))
+            self._prune()
+            self._jobs[request_id] = {
+                "request_id": request_id,
+                "status": JOB_QUEUED,
+                "step": None,
+                "error": None,
+                "folder_link": None,
+                "upload_report": None,
+                "finished_at": None,
+            }
+        self._executor.submit(self._run, request_id)
+        return request_id
+
+    def status(self, request_id):
+        with self._lock:
+            job = self._jobs.get(request_id)
+            return dict(job) if job else None
+
+    def _update(self, request_id, **fields):
+        with self._lock:
+            # El trabajo pudo haberse quitado (_forget) mientras el worker corría.
+            if request_id in self._jobs:
+                self._jobs[request_id].update(fields)
+
+    def _forget(self, request_id):
+        # Otro worker tiene la cotización: el trabajo se quita y, si ese worker
+        # no la termina, recover() la vuelve a encolar cuando venza su lease.
+        with self._lock:
+            self._jobs.pop(request_id, None)
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            request_id for request_id, job in self._jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > FINISHED_JOB_TTL
+        ]
+        for request_id in expired:
+            del self._jobs[request_id]
+
+    def _finish(self, request_id, status, error=None):
+        replays = self.log.finish_quote(request_id, status, error)
+        # Terminada, o fallida sin más reintentos: recover() ya no la retoma y
+        # los adjuntos en pending_uploads no se vuelven a usar.
+        if status == QUOTE_DONE or (replays is not None and replays >= MAX_REPLAYS):
+            shutil.rmtree(os.path.join(PENDING_UPLOADS_DIR, request_id), ignore_errors=True)
+
+    def _run_step(self, request_id, name, step, outputs, quote):
+        entry = self.log.begin_step(request_id, name)
+        if entry.status == STEP_DONE:
+            quote.update(entry.data)
+            return
+        step(quote, replay=entry.attempts > 1)
+        self.log.complete_step(request_id, name, {field: quote.get(field) for field in outputs})
+
+    def _run(self, request_id):
+        claimed = False
+        try:
+            claimed = self.log.claim(request_id, self.owner, LEASE_SECONDS)
+            if not claimed:
+                self._forget(request_id)
+                return
+            quote = decode_quote(self.log.load_quote(request_id))
+
+            for name, step, outputs in SUBMISSION_STEPS:
+                self._update(request_id, status=JOB_RUNNING, step=name)
+                if not self.log.renew(request_id, self.owner, LEASE_SECONDS):
+                    self._forget(request_id)
+                    return
+                try:
+                    # Cada intento pasa por begin_step: el segundo ya corre con replay=True.
+                    with_backoff(
+                        lambda: self._run_step(request_id, name, step, outputs, quote),
+                        max_attempts=self.max_attempts, retryable=is_unconfirmed_write
+                    )
+                except Exception as e:
+                    self._finish(request_id, QUOTE_FAILED, f"{name}: {e}")
+                    self._update(request_id, status=JOB_FAILED, error=f"{name}: {e}", finished_at=time.time())
+                    return
+
+            self._finish(request_id, QUOTE_DONE)
+            self._update(
+                request_id, status=JOB_DONE, step=None, folder_link=quote.get("folder_link"),
+                upload_report=quote.get("upload_report"), finished_at=time.time()
+            )
+        except Exception as e:
+            # Fuera de los pasos (SQLite ocupada, payload corrupto): el trabajo no
+            # puede quedar en cola para siempre. Sin lease no se toca el log.
+            submission_logger.error("Submission %s failed: %s", request_id, e)
+            if claimed:
+                try:
+                    self._finish(request_id, QUOTE_FAILED, str(e))
+                except Exception as log_error:
+                    submission_logger.error("Could not mark %s as failed: %s", request_id, log_error)
+            self._update(request_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
+
+    def recover(self):
+        # Retoma las cotizaciones que quedaron a medias (reinicio, caída o fallo).
+        recovered = [self._enqueue(request_id) for request_id in self.log.incomplete()]
+        return [request_id for request_id in recovered if request_id]
+
+def _recover_forever(queue, interval):
+    while True:
+        try:
+            queue.recover()
+        except Exception:
+            pass
+        time.sleep(interval)
+
+@st.cache_resource
+def get_submission_queue():
+    queue = SubmissionQueue()
+    threading.Thread(
+        target=_recover_forever, args=(queue, RECOVERY_INTERVAL),
+        name="quote-submission-recovery", daemon=True
+    ).start()
+    return queue
+
+#------------------------ UI --------------------------
+def show_submission_status():
+    pending = st.session_state.get("pending_requests", [])
+    if not pending:
+        return
+
+    queue = get_submission_queue()
+    finished = [request_id for request_id in pending if (queue.status(request_id) or {}).get("status") in (JOB_DONE, JOB_FAILED, None)]
+    for request_id in finished:
+        job = queue.status(request_id)
+        if job is None:
+            continue
+        if job["status"] == JOB_DONE:
+            report = job.get("upload_report") or {}
+            files = report.get("files", [])
+            copied = sum(1 for file in files if file.get("copied"))
+            reused = f", {copied} reused from earlier quotes" if copied else ""
+            uploaded = f" ({len(files)} files uploaded in {report['seconds']:.1f}s{reused})" if files else ""
+            skipped = report.get("skipped", [])
+            if skipped:
+                uploaded += f" ({', '.join(skipped)} already in the folder)"
+            st.success(f"✅ Quotation {request_id} saved{uploaded}.")
+        else:
+            st.error(f"⚠️ Quotation {request_id} could not be saved ({job['error']}).")
+    st.session_state["pending_requests"] = [request_id for request_id in pending if request_id not in finished]
+
+    if st.session_state["pending_requests"]:
+        submission_progress()
+
+@st.fragment(run_every=2)
+def submission_progress():
+    queue = get_submission_queue()
+    pending = st.session_state.get("pending_requests", [])
+    for request_id in pending:
+        job = queue.status(request_id) or {}
+        step = job.get("step") or "queued"
+        st.info(f"⏳ Quotation {request_id}: {step}...")
+
+    if any((queue.status(request_id) or {}).get("status") in (JOB_DONE, JOB_FAILED, None) for request_id in pending):
+        st.rerun()
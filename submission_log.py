@@ -0,0 +1,133 @@
+import json
+import sqlite3
+import time
+from collections import namedtuple
+
+SUBMISSION_LOG_DB = "submission_log.sqlite3"
+
+QUOTE_PENDING = "pending"
+QUOTE_DONE = "done"
+QUOTE_FAILED = "failed"
+STEP_PENDING = "pending"
+STEP_DONE = "done"
+
+# Una cotización retomada más de estas veces se deja como fallida para revisión manual.
+MAX_REPLAYS = 5
+
+StepEntry = namedtuple("StepEntry", ["status", "attempts", "data"])
+
+class SubmissionLog:
+    # Write-ahead log de las cotizaciones: el payload completo se guarda antes
+    # de tocar Drive o Sheets y cada efecto (carpeta, tiempo, cliente, fila,
+    # archivos) queda registrado con su request_id. Un paso terminado nunca se
+    # repite; uno con intentos previos sabe que pudo haberse aplicado a medias.
+    def __init__(self, path=SUBMISSION_LOG_DB):
+        self.path = path
+        self._execute("PRAGMA journal_mode=WAL")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS quotes ("
+            "request_id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL, replays INTEGER NOT NULL DEFAULT 0, "
+            "lease_owner TEXT, lease_until REAL NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, finished_at REAL)"
+        )
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS steps ("
+            "request_id TEXT NOT NULL, step TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "data TEXT, updated_at REAL NOT NULL, PRIMARY KEY (request_id, step))"
+        )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    #------------------------ QUOTES --------------------------
+    def record_quote(self, request_id, payload):
+        self._execute(
+            "INSERT OR IGNORE INTO quotes (request_id, payload, status, created_at) VALUES (?, ?, ?, ?)",
+            (request_id, json.dumps(payload, ensure_ascii=False), QUOTE_PENDING, time.time())
+        )
+
+    def load_quote(self, request_id):
+        row = self._execute("SELECT payload FROM quotes WHERE request_id = ?", (request_id,))
+        return json.loads(row[0]) if row else None
+
+    def claim(self, request_id, owner, lease_seconds):
+        # Solo un worker (de cualquier proceso) ejecuta una cotización a la vez.
+        # Un lease vigente no se vuelve a tomar, tampoco desde el mismo proceso.
+        now = time.time()
+        row = self._execute(
+            "UPDATE quotes SET lease_owner = ?, lease_until = ? "
+            "WHERE request_id = ? AND status != ? AND (lease_owner IS NULL OR lease_until < ?) "
+            "RETURNING request_id",
+            (owner, now + lease_seconds, request_id, QUOTE_DONE, now)
+        )
+        return row is not None
+
+    def renew(self, request_id, owner, lease_seconds):
+        # Extiende el lease entre pasos; falla si venció y otro worker lo tomó.
+        row = self._execute(
+            "UPDATE quotes SET lease_until = ? WHERE request_id = ? AND lease_owner = ? RETURNING request_id",
+            (time.time() + lease_seconds, request_id, owner)
+        )
+        return row is not None
+
+    def release(self, request_id, owner):
+        self._execute(
+            "UPDATE quotes SET lease_owner = NULL, lease_until = 0 WHERE request_id = ? AND lease_owner = ?",
+            (request_id, owner)
+        )
+
+    def finish_quote(self, request_id, status, error=None):
+        # Devuelve cuántas veces se retomó la cotización (None si no existe).
+        row = self._execute(
+            "UPDATE quotes SET status = ?, error = ?, finished_at = ?, lease_owner = NULL, lease_until = 0 WHERE request_id = ? "
+            "RETURNING replays",
+            (status, error, time.time(), request_id)
+        )
+        return row[0] if row else None
+
+    def incomplete(self, max_replays=MAX_REPLAYS):
+        # Cotizaciones sin terminar (o fallidas) cuyo lease ya venció: el proceso
+        # que las tenía se cayó o se reinició.
+        return [
+            row[0] for row in self._query(
+                "SELECT request_id FROM quotes WHERE status != ? AND replays < ? AND lease_until < ? ORDER BY created_at",
+                (QUOTE_DONE, max_replays, time.time())
+            )
+        ]
+
+    def mark_replay(self, request_id):
+        self._execute("UPDATE quotes SET replays = replays + 1, status = ? WHERE request_id = ?", (QUOTE_PENDING, request_id))
+
+    #------------------------ STEPS --------------------------
+    def begin_step(self, request_id, step):
+        self._execute(
+            "INSERT OR IGNORE INTO steps (request_id, step, status, updated_at) VALUES (?, ?, ?, ?)",
+            (request_id, step, STEP_PENDING, time.time())
+        )
+        row = self._execute(
+            "UPDATE steps SET attempts = attempts + CASE WHEN status = ? THEN 0 ELSE 1 END, updated_at = ? "
+            "WHERE request_id = ? AND step = ? RETURNING status, attempts, data",
+            (STEP_DONE, time.time(), request_id, step)
+        )
+        return StepEntry(row[0], row[1], json.loads(row[2]) if row[2] else {})
+
+    def complete_step(self, request_id, step, data=None):
+        self._execute(
+            "UPDATE steps SET status = ?, data = ?, updated_at = ? WHERE request_id = ? AND step = ?",
+            (STEP_DONE, json.dumps(data or {}, ensure_ascii=False, default=str), time.time(), request_id, step)
+        )
+
+SUBMISSION_LOG = SubmissionLog()
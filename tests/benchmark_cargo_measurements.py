@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Se ejecuta como script desde la raíz o desde tests/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cargo_measurements import (
+    WEIGHT_UNITS, LENGTH_UNITS, PACKAGING_TYPES, WEIGHT_FACTORS, LENGTH_FACTORS, VOLUMETRIC_DIVISORS,
+    CM3_PER_CBM, PACKAGE_DTYPE, packages_to_array, measure_packages, cargo_totals
+)
+
+def random_packages(size, seed=0):
+    rng = np.random.default_rng(seed)
+    array = np.zeros(size, dtype=PACKAGE_DTYPE)
+    array["packaging"] = rng.integers(0, len(PACKAGING_TYPES), size)
+    array["quantity"] = rng.integers(1, 50, size)
+    array["weight"] = rng.uniform(1, 800, size)
+    array["weight_unit"] = rng.integers(0, len(WEIGHT_UNITS), size)
+    array["length"] = rng.uniform(10, 240, size)
+    array["width"] = rng.uniform(10, 120, size)
+    array["height"] = rng.uniform(10, 160, size)
+    array["length_unit"] = 0
+    return array
+
+def loop_measure(packages, transport_type):
+    # Bucle por línea con la forma del que tenía dimensions(), pero con los
+    # divisores de VOLUMETRIC_DIVISORS (aéreo 6000), no con el 166.6 fijo de
+    # entonces: mide el costo del bucle frente a la versión vectorizada.
+    weight_conversion = dict(zip(WEIGHT_UNITS, WEIGHT_FACTORS.tolist()))
+    length_conversion = dict(zip(LENGTH_UNITS, LENGTH_FACTORS.tolist()))
+    factor = CM3_PER_CBM / VOLUMETRIC_DIVISORS.get(transport_type, VOLUMETRIC_DIVISORS["Maritime"])
+    total_weight = total_volume = 0.0
+    for package in packages:
+        package_weight = package["weight_lcl"] * weight_conversion[package["weight_unit"]] * package["quantity"]
+        scale = length_conversion[package["length_unit"]]
+        volume = package["length"] * scale * package["width"] * scale * package["height"] * scale / CM3_PER_CBM * package["quantity"]
+        package["total_weight"] = package_weight
+        package["volume"] = volume
+        package["kilovolume"] = volume * factor
+        total_weight += package_weight
+        total_volume += volume
+    return total_weight, total_volume
+
+def benchmark(sizes=(1000, 10000, 100000), transport_type="Air", repeat=5):
+    for size in sizes:
+        array = random_packages(size)
+        packages = [
+            {
+                "type_packaging": PACKAGING_TYPES[row["packaging"]], "quantity": int(row["quantity"]),
+                "weight_lcl": float(row["weight"]), "weight_unit": WEIGHT_UNITS[row["weight_unit"]],
+                "length": float(row["length"]), "width": float(row["width"]), "height": float(row["height"]),
+                "length_unit": LENGTH_UNITS[row["length_unit"]], "volume": 0.0, "kilovolume": 0.0,
+            }
+            for row in array
+        ]
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            loop_weight, loop_volume = loop_measure(packages, transport_type)
+        loop_ms = (time.perf_counter() - started) / repeat * 1000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            totals = cargo_totals(array, measure_packages(array, transport_type))
+        vector_ms = (time.perf_counter() - started) / repeat * 1000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            packages_to_array(packages)
+        convert_ms = (time.perf_counter() - started) / repeat * 1000
+
+        assert np.isclose(loop_weight, totals.gross_weight_kg) and np.isclose(loop_volume, totals.cbm)
+        print(f"{size:>7} lines: loop {loop_ms:8.2f} ms | vectorized {vector_ms:6.2f} ms | dicts -> array {convert_ms:7.2f} ms")
+
+if __name__ == "__main__":
+    # Benchmark: python tests/benchmark_cargo_measurements.py [líneas ...]
+    benchmark(tuple(int(size) for size in sys.argv[1:]) or (1000, 10000, 100000))
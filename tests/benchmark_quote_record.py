@@ -0,0 +1,293 @@
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+# Se ejecuta como script desde la raíz o desde tests/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quote_record import (
+    QuoteRecordBuilder, all_quotes_columns, CONTAINER_CHARACTERISTICS, REEFER_CONTAINERS,
+    REEFER_GROUND_SERVICES, SUMMARIZED_FIELDS, MERGED_FIELDS
+)
+
+def legacy_record(services, request_id, time, commercial, client, client_reference):
+    # Agregación por bucle + DataFrame que hacía handle_finalize_quotation, para comparar.
+
+    grouped_record = {
+        "time": time, "request_id": request_id, "commercial": commercial, "client": client,
+        "client_reference": client_reference, "service": set(), "routes_info": set(), "type_container": set(),
+        "container_characteristics": set(), "imo": set(), "info_flatrack": set(), "info_pallets_str": set(),
+        "reefer_details": [], "additional_costs": [], "ground_routes": [], "addresses_ground": [],
+        "country_origin": "", "country_destination": "", "pickup_address": "", "delivery_address": "",
+        "zip_code_origin": "", "zip_code_destination": "",
+    }
+    all_details = {}
+
+    for service in services:
+        details = service["details"]
+        grouped_record["service"].add(service["service"])
+
+        if "type_container" in details:
+            if isinstance(details["type_container"], list):
+                grouped_record["type_container"].update(details["type_container"])
+            else:
+                grouped_record["type_container"].add(details["type_container"])
+
+        characteristics = []
+        if details.get("reinforced", False):
+            characteristics.append("Reinforced")
+        if details.get("food_grade", False):
+            characteristics.append("Food Grade")
+        if details.get("isotank", False):
+            characteristics.append("Isotank")
+        if details.get("flexitank", False):
+            characteristics.append("Flexitank")
+        if characteristics:
+            grouped_record["container_characteristics"].add("\n".join(characteristics))
+
+        imo_info = "Sí, IMO Type: {imo_type}, UN Code: {un_code}".format(
+            imo_type=details.get("imo_type", "N/A"),
+            un_code=details.get("un_code", "N/A")
+        ) if details.get("imo_cargo", False) else "No"
+        grouped_record["imo"].add(imo_info)
+
+        if "routes" in details:
+            routes = details["routes"]
+            if len(routes) == 1:
+                grouped_record["country_origin"] = routes[0]["country_origin"]
+                grouped_record["country_destination"] = routes[0]["country_destination"]
+                grouped_record["routes_info"].add(f"Route 1: {routes[0]['country_origin']} ({routes[0]['port_origin']}) → {routes[0]['country_destination']} ({routes[0]['port_destination']})")
+            else:
+                for i, r in enumerate(routes):
+                    grouped_record["routes_info"].add(
+                        f"Route {i + 1}: {r['country_origin']} ({r['port_origin']}) → {r['country_destination']} ({r['port_destination']})"
+                    )
+
+        if "packages" in details:
+            pallets_info = details.get("packages", [])
+            transport_type = details.get("transport_type", "")
+            unique_pallets = set()
+            total_weight_all = 0
+            for p in pallets_info:
+                weight_unit = p.get("weight_unit", "KG")
+                length_unit = p.get("length_unit", "CM")
+                total_weight_all += p.get("total_weight", 0)
+                if transport_type == "Air":
+                    volume_value = p.get("kilovolume", 0)
+                    volume_label = "KVM"
+                else:
+                    volume_value = p.get("volume", 0)
+                    volume_label = "CBM"
+                unique_pallets.add(
+                    f"{p['quantity']} {p['type_packaging']}, "
+                    f"Unit Weight: {p['weight_lcl']:.2f} {weight_unit}, Total Weight: {p['total_weight']:.2f} KG,"
+                    f"Volume: {volume_value:.2f} {volume_label}, "
+                    f"Dimensions: {p['length']:.2f} {length_unit} x {p['width']:.2f} {length_unit} x {p['height']:.2f} {length_unit}"
+                )
+            if unique_pallets:
+                grouped_record["info_pallets_str"].add("\n".join(sorted(unique_pallets)))
+            grouped_record["info_pallets_str"].add(f"Total weight of all packages: {total_weight_all:.2f} KG")
+
+        if "dimensions_flatrack" in details:
+            flatrack_info = details.get("dimensions_flatrack", [])
+            if any(any(v > 0 for v in f.values() if isinstance(v, (int, float))) for f in flatrack_info):
+                grouped_record["info_flatrack"].add("\n".join(
+                    f"Weight: {f['weight']:.2f} {f.get('weight_unit', 'KG')}, "
+                    f"Dimensions: {f['length']:.2f} {f.get('length_unit', 'CM')} x "
+                    f"{f['width']:.2f} {f.get('length_unit', 'CM')} x {f['height']:.2f} {f.get('length_unit', 'CM')}"
+                    for f in flatrack_info
+                ))
+            else:
+                grouped_record["info_flatrack"].add("")
+
+        if service.get("service", "").strip().lower() == "international freight":
+            grouped_record["pickup_address"] = details.get("pickup_address", "N/A")
+            grouped_record["delivery_address"] = details.get("delivery_address", "N/A")
+            grouped_record["zip_code_origin"] = details.get("zip_code_origin", "N/A")
+            grouped_record["zip_code_destination"] = details.get("zip_code_destination", "N/A")
+
+        if service.get("service", "").strip().lower() == "ground transportation":
+            ground_routes = details.get("ground_routes", [])
+            if ground_routes:
+                ground_routes_list = []
+                addresses_list = []
+                first_route = ground_routes[0]
+                grouped_record["country_origin"] = (first_route.get("country_origin") or "").strip()
+                grouped_record["country_destination"] = (first_route.get("country_destination") or "").strip()
+                for idx, route in enumerate(ground_routes, start=1):
+                    country_origin = (route.get("country_origin") or "").strip()
+                    city_origin = (route.get("city_origin") or "").strip()
+                    pickup_address = (route.get("pickup_address") or "").strip()
+                    zip_code_origin = (route.get("zip_code_origin") or "").strip()
+                    country_destination = (route.get("country_destination") or "").strip()
+                    city_destination = (route.get("city_destination") or "").strip()
+                    delivery_address = (route.get("delivery_address") or "").strip()
+                    zip_code_destination = (route.get("zip_code_destination") or "").strip()
+                    if city_origin and country_origin and city_destination and country_destination:
+                        ground_routes_list.append(f"Route {idx}: {city_origin} ({country_origin}) → {city_destination} ({country_destination})")
+                    if pickup_address and zip_code_origin and delivery_address and zip_code_destination:
+                        addresses_list.append(f"Address {idx}: {pickup_address} ({zip_code_origin}) → {delivery_address} ({zip_code_destination})")
+                grouped_record["ground_routes"] = "\n".join(ground_routes_list) if ground_routes_list else ""
+                grouped_record["addresses"] = "\n".join(addresses_list) if addresses_list else ""
+            else:
+                grouped_record["ground_routes"] = ""
+                grouped_record["addresses"] = ""
+                grouped_record["country_origin"] = ""
+                grouped_record["country_destination"] = ""
+        else:
+            grouped_record["ground_routes"] = ""
+            grouped_record["addresses"] = ""
+
+        reefer_details = []
+        container_type = details.get("type_container", [])
+        ground_service = details.get("ground_service", "")
+        is_reefer_container = any(ct in REEFER_CONTAINERS for ct in container_type)
+        if not is_reefer_container and ground_service not in REEFER_GROUND_SERVICES:
+            grouped_record["reefer_details"] = "No reefer details"
+        else:
+            if details.get("drayage_reefer", False):
+                reefer_details.append("Drayage Reefer Required")
+            if details.get("pickup_thermo_king", False):
+                reefer_details.append("Thermo King Pickup Required")
+            if details.get("reefer_cont_type"):
+                reefer_details.append(f"Reefer Container Type: {details['reefer_cont_type']}")
+            if details.get("temperature_control", False):
+                reefer_details.append("Temperature Control Required")
+            if details.get("temperature"):
+                reefer_details.append(f"Temperature Range: {details['temperature']}°C")
+            grouped_record["reefer_details"] = "\n".join(reefer_details) if reefer_details else "No reefer details"
+
+        additional_costs = []
+        if details.get("destination_cost", False):
+            additional_costs.append("Destination Cost Required")
+        if details.get("customs_origin", False):
+            additional_costs.append("Customs at Origin Required")
+        if details.get("insurance_required", False):
+            additional_costs.append("Insurance Required")
+        grouped_record["additional_costs"] = "\n".join(additional_costs) if additional_costs else "No additional costs"
+
+        for key, value in details.items():
+            if key in SUMMARIZED_FIELDS:
+                continue
+            if value is None or value == "" or (isinstance(value, (int, float)) and value == 0):
+                continue
+            if isinstance(value, bool):
+                value = "Sí" if value else "No"
+            if key in all_details:
+                all_details[key].add(str(value))
+            else:
+                all_details[key] = {str(value)}
+
+    for key in MERGED_FIELDS:
+        grouped_record[key] = "\n".join(sorted(grouped_record[key])) if grouped_record[key] else ""
+    for key, value_set in all_details.items():
+        grouped_record[key] = "\n".join(sorted(value_set))
+
+    return pd.DataFrame([grouped_record]).reindex(columns=all_quotes_columns, fill_value="")
+
+def random_services(size, seed=0):
+    # Borradores sintéticos con la forma que guarda app.py: flete (FCL/LCL/aéreo), terrestre y aduana.
+    rng = random.Random(seed)
+    countries = ["Colombia", "United States", "Mexico", "Spain", "China"]
+    services = []
+    for _ in range(size):
+        kind = rng.choice(["fcl", "lcl", "air", "ground", "customs"])
+        details = {
+            "commodity": rng.choice(["Flores", "Café", "Textiles"]),
+            "hs_code": rng.choice(["0603", "0901", ""]),
+            "incoterm": rng.choice(["FOB", "EXW", "CIF"]),
+            "cargo_value": rng.choice([0, 1500, 25000]),
+            "destination_cost": rng.random() < 0.5,
+            "customs_origin": rng.random() < 0.5,
+            "insurance_required": rng.random() < 0.3,
+            "final_comments": rng.choice(["", "Urgente"]),
+        }
+        if kind == "customs":
+            services.append({"service": "Customs Brokerage", "details": details})
+            continue
+        if kind == "ground":
+            details["ground_service"] = rng.choice(["Mula", "Mula Refrigerada", "Drayage Reefer 40 STD"])
+            details["temperature"] = rng.choice(["", "-18"])
+            details["ground_routes"] = [
+                {
+                    "country_origin": rng.choice(countries), "city_origin": rng.choice(["Bogotá", " Medellín ", ""]),
+                    "pickup_address": rng.choice(["Calle 1", ""]), "zip_code_origin": "110111",
+                    "country_destination": rng.choice(countries), "city_destination": "Cali",
+                    "delivery_address": "Carrera 2", "zip_code_destination": rng.choice(["760001", None]),
+                }
+                for _ in range(rng.randint(0, 3))
+            ]
+            services.append({"service": "Ground Transportation", "details": details})
+            continue
+
+        details["routes"] = [
+            {
+                "country_origin": rng.choice(countries), "port_origin": "Buenaventura",
+                "country_destination": rng.choice(countries), "port_destination": "Miami",
+            }
+            for _ in range(rng.randint(1, 3))
+        ]
+        details["pickup_address"] = rng.choice(["", "Zona Franca"])
+        if kind == "fcl":
+            details["transport_type"] = "Maritime"
+            details["lcl_fcl_mode"] = "FCL"
+            details["type_container"] = rng.sample(["20' Dry Standard", "40' High Cube", "Reefer 40'", "Flat Rack 40'"], rng.randint(1, 2))
+            for field, _ in CONTAINER_CHARACTERISTICS:
+                details[field] = rng.random() < 0.3
+            details["imo_cargo"] = rng.random() < 0.3
+            details["imo_type"] = "3"
+            details["un_code"] = "UN1263"
+            details["drayage_reefer"] = rng.random() < 0.5
+            details["temperature_control"] = rng.random() < 0.5
+            details["dimensions_flatrack"] = [
+                {"weight": rng.choice([0.0, 1200.0]), "length": 600.0, "width": 240.0, "height": 200.0}
+            ]
+        else:
+            details["transport_type"] = "Air" if kind == "air" else "Maritime"
+            details["lcl_fcl_mode"] = "LCL" if kind == "lcl" else ""
+            details["stackable"] = rng.random() < 0.5
+            details["packages"] = []
+            for _ in range(rng.randint(1, 4)):
+                quantity = rng.randint(1, 20)
+                weight = round(rng.uniform(1, 500), 2)
+                length, width, height = (round(rng.uniform(10, 200), 1) for _ in range(3))
+                volume = length * width * height / 1000000 * quantity
+                details["packages"].append({
+                    "type_packaging": rng.choice(["Pallet", "Box", "Bag"]), "quantity": quantity,
+                    "weight_lcl": weight, "weight_unit": "KG", "total_weight": weight * quantity,
+                    "length": length, "width": width, "height": height, "length_unit": "CM",
+                    "volume": volume, "kilovolume": volume * 1000000 / 6000,
+                })
+        services.append({"service": "International Freight", "details": details})
+    return services
+
+def benchmark(sizes=(1, 5, 20), samples=500, repeat=3):
+    header = {"request_id": "Q-000001", "time": "2025-01-01 10:00:00", "commercial": "Sales",
+              "client": "ACME", "client_reference": "REF-1"}
+    builder = QuoteRecordBuilder()
+    for size in sizes:
+        drafts = [random_services(size, seed=seed) for seed in range(samples)]
+        for services in drafts:
+            legacy_row = legacy_record(services, **header).iloc[0].tolist()
+            assert builder.build_row(services, **header) == legacy_row
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for services in drafts:
+                legacy_record(services, **header)
+        legacy_us = (time.perf_counter() - started) / (repeat * samples) * 1000000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for services in drafts:
+                builder.build_row(services, **header)
+        builder_us = (time.perf_counter() - started) / (repeat * samples) * 1000000
+
+        print(f"{size:>3} services: loop + DataFrame {legacy_us:8.1f} µs | builder {builder_us:7.1f} µs")
+
+if __name__ == "__main__":
+    # Benchmark: python tests/benchmark_quote_record.py [servicios por cotización ...]
+    benchmark(tuple(int(size) for size in sys.argv[1:]) or (1, 5, 20))
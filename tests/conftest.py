@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+# utils lee st.secrets al importarse; las pruebas no tocan Google.
+TEST_SECRETS = {
+    "general": {
+        "sheet_id": "test-quotes",
+        "drive_id": "test-drive",
+        "time_sheet_id": "test-time",
+        "parent_folder": "test-parent",
+    },
+    "google_sheets_credentials": {},
+    "google_drive_credentials": {},
+}
+
+st.secrets = Secrets()
+st.secrets._secrets = TEST_SECRETS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Las SQLite que los módulos crean al importarse (blobs, log de envíos) no van al repo.
+os.chdir(tempfile.mkdtemp(prefix="quotation-tests-"))
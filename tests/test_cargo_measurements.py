@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from benchmark_cargo_measurements import loop_measure, random_packages
+from cargo_measurements import (
+    LENGTH_UNITS, PACKAGING_TYPES, VOLUMETRIC_DIVISORS, WEIGHT_UNITS, apply_measures, cargo_totals,
+    measure_packages, packages_to_array
+)
+
+def package(**fields):
+    base = {
+        "type_packaging": "Pallet", "quantity": 1, "weight_lcl": 0.0, "weight_unit": "KG",
+        "length": 0.0, "width": 0.0, "height": 0.0, "length_unit": "CM", "volume": 0.0, "kilovolume": 0.0,
+    }
+    base.update(fields)
+    return base
+
+def measure(packages, transport_type=None):
+    array = packages_to_array(packages)
+    measures = measure_packages(array, transport_type)
+    return measures, cargo_totals(array, measures)
+
+@pytest.mark.parametrize("length, length_unit", [
+    (100.0, "CM"),
+    (1.0, "M"),
+    (1000.0, "MM"),
+    (100 / 2.54, "Inches"),
+])
+def test_lengths_are_converted_to_cbm(length, length_unit):
+    measures, _ = measure([package(length=length, width=length, height=length, length_unit=length_unit, quantity=3)])
+    assert measures.cbm[0] == pytest.approx(3.0)
+
+@pytest.mark.parametrize("weight, weight_unit, expected_kg", [
+    (10.0, "KG", 10.0),
+    (0.5, "Ton", 500.0),
+    (10.0, "Lbs", 4.53592),
+])
+def test_weights_are_converted_to_kg(weight, weight_unit, expected_kg):
+    measures, totals = measure([package(weight_lcl=weight, weight_unit=weight_unit, quantity=2)])
+    assert measures.unit_weight_kg[0] == pytest.approx(expected_kg)
+    assert measures.gross_weight_kg[0] == pytest.approx(expected_kg * 2)
+    assert totals.gross_weight_kg == pytest.approx(expected_kg * 2)
+
+@pytest.mark.parametrize("transport_type", ["Air", "Maritime", "Ground"])
+def test_chargeable_weight_is_max_of_gross_and_volumetric(transport_type):
+    volumetric_per_cbm = 1000000 / VOLUMETRIC_DIVISORS[transport_type]
+    light = package(weight_lcl=1.0, length=100.0, width=100.0, height=100.0)
+    heavy = package(weight_lcl=5000.0, length=100.0, width=100.0, height=100.0)
+
+    measures, totals = measure([light, heavy], transport_type)
+
+    assert measures.volumetric_weight_kg.tolist() == pytest.approx([volumetric_per_cbm, volumetric_per_cbm])
+    assert measures.chargeable_weight_kg.tolist() == pytest.approx([volumetric_per_cbm, 5000.0])
+    # El total compara los totales del embarque, no suma los máximos por línea.
+    assert totals.chargeable_weight_kg == pytest.approx(max(5001.0, 2 * volumetric_per_cbm))
+
+def test_unknown_transport_type_uses_maritime_divisor():
+    measures, _ = measure([package(length=100.0, width=100.0, height=100.0)], "Courier")
+    assert measures.volumetric_weight_kg[0] == pytest.approx(1000.0)
+
+def test_manual_volume_is_used_without_dimensions():
+    packages = [package(volume=2.5, weight_lcl=10.0), package(volume=9.0, length=100.0, width=100.0, height=50.0)]
+    measures, totals = measure(packages, "Maritime")
+    assert measures.cbm.tolist() == pytest.approx([2.5, 0.5])
+    assert totals.cbm == pytest.approx(3.0)
+
+def test_manual_kilovolume_is_used_for_air_without_dimensions():
+    packages = [package(kilovolume=40.0, weight_lcl=10.0), package(kilovolume=999.0, length=100.0, width=100.0, height=100.0)]
+    measures, _ = measure(packages, "Air")
+    assert measures.volumetric_weight_kg.tolist() == pytest.approx([40.0, 1000000 / 6000])
+
+    apply_measures(packages, measures, "Air")
+    assert [row["kilovolume"] for row in packages] == pytest.approx([40.0, 1000000 / 6000])
+
+@pytest.mark.parametrize("field, value", [
+    ("weight_unit", "Stone"),
+    ("length_unit", "Feet"),
+    ("type_packaging", "Crate"),
+])
+def test_unknown_units_are_rejected(field, value):
+    with pytest.raises(ValueError, match=value):
+        packages_to_array([package(), package(**{field: value})])
+
+def test_empty_input():
+    array = packages_to_array([])
+    measures = measure_packages(array, "Air")
+    totals = cargo_totals(array, measures)
+    assert len(array) == 0 and measures.cbm.shape == (0,)
+    assert totals == (0, 0.0, 0.0, 0.0, 0.0)
+
+def test_vectorized_matches_per_package_loop():
+    array = random_packages(500, seed=3)
+    packages = [
+        package(type_packaging=PACKAGING_TYPES[row["packaging"]], quantity=int(row["quantity"]),
+                weight_lcl=float(row["weight"]), weight_unit=WEIGHT_UNITS[row["weight_unit"]],
+                length=float(row["length"]), width=float(row["width"]), height=float(row["height"]),
+                length_unit=LENGTH_UNITS[row["length_unit"]])
+        for row in array
+    ]
+    assert np.array_equal(packages_to_array(packages), array)
+
+    loop_weight, loop_volume = loop_measure(packages, "Air")
+    totals = cargo_totals(array, measure_packages(array, "Air"))
+    assert totals.gross_weight_kg == pytest.approx(loop_weight)
+    assert totals.cbm == pytest.approx(loop_volume)
@@ -0,0 +1,73 @@
+import os
+import threading
+
+from client_directory import ClientDirectory, client_key, load_csv_names
+
+def directory_for(rows):
+    # La primera fila de la hoja es el encabezado.
+    sheet = ["Cliente"] + list(rows)
+    return ClientDirectory(lambda after: sheet[after:]), sheet
+
+def test_every_sheet_row_is_an_option():
+    rows = load_csv_names(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "customers.csv"))[1:]
+    directory, _ = directory_for(rows)
+    assert list(directory.sync(force=True)) == [row.strip() for row in rows if row.strip()]
+
+def test_legal_forms_and_single_letters_are_distinct_clients():
+    directory, _ = directory_for([
+        "COLOMBIAN ROOTS COMPANY LLC", "COLOMBIAN ROOTS COMPANY SAS", "NATURE TRADING", "NATURE TRADING S.A.S.",
+        "Grupo A", "Grupo S",
+    ])
+    assert len(directory.sync(force=True)) == 6
+    assert directory.lookup("Grupo S") == "Grupo S"
+    assert directory.lookup("grupo a") == "Grupo A"
+    assert directory.lookup("Grupo C") is None
+    assert directory.lookup("Colombian Roots Company") is None
+    assert directory.lookup("nature trading s.a.s.") == "NATURE TRADING S.A.S."
+
+def test_suffixes_only_drive_the_duplicate_warning():
+    assert client_key("NATURE TRADING S.A.S.") == client_key("Nature Trading") == "nature trading"
+    assert client_key("Grupo A") != client_key("Grupo S")
+    assert client_key("Alimentos de Colombia") == "alimentos de colombia"
+
+    directory, _ = directory_for(["NATURE TRADING S.A.S.", "360 LOGISICTS GROUP LIMITED"])
+    directory.sync(force=True)
+    assert [match.name for match in directory.similar("Nature Trading LTDA")] == ["NATURE TRADING S.A.S."]
+    assert [match.name for match in directory.similar("360 Logistics Group Ltd")] == ["360 LOGISICTS GROUP LIMITED"]
+    assert directory.similar("Nuevo Cliente XYZ") == []
+
+def test_added_client_is_not_duplicated_by_the_next_sync():
+    directory, sheet = directory_for(["ACME"])
+    directory.sync(force=True)
+    assert directory.add("Globex")
+    assert not directory.add("globex")
+    sheet.append("Globex")
+    sheet.append("Initech")
+    assert directory.sync(force=True) == ("ACME", "Globex", "Initech")
+
+def test_readers_never_see_a_partial_index():
+    rows = [f"Client {number}" for number in range(300)]
+    directory, sheet = directory_for(rows)
+    directory.sync(force=True)
+    directory.full_sync_interval = 0
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                assert directory.lookup("Client 150") == "Client 150"
+                assert directory.similar("Client 150")[0].name == "Client 150"
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for _ in range(20):
+        directory.sync(force=True)
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert errors == []
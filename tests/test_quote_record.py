@@ -0,0 +1,145 @@
+import pytest
+
+from benchmark_quote_record import legacy_record, random_services
+from quote_record import QuoteRecordBuilder, all_quotes_columns
+
+HEADER = {
+    "request_id": "Q-000042", "time": "2025-03-01 09:30:00", "commercial": "Laura",
+    "client": "ACME SAS", "client_reference": "PO-77",
+}
+
+FCL = {
+    "service": "International Freight",
+    "details": {
+        "transport_type": "Maritime", "lcl_fcl_mode": "FCL", "incoterm": "FOB", "commodity": "Flores",
+        "routes": [{"country_origin": "Colombia", "port_origin": "Cartagena", "country_destination": "Spain", "port_destination": "Valencia"}],
+        "type_container": ["Reefer 40'", "20' Dry Standard"], "reinforced": True, "food_grade": True,
+        "imo_cargo": True, "imo_type": "3", "un_code": "UN1263",
+        "drayage_reefer": True, "temperature_control": True, "temperature": "-18",
+        "dimensions_flatrack": [{"weight": 0.0, "length": 0.0, "width": 0.0, "height": 0.0}],
+        "pickup_address": "Zona Franca", "zip_code_origin": "130001",
+        "destination_cost": True, "insurance_required": True, "cargo_value": 25000,
+    },
+}
+
+LCL = {
+    "service": "International Freight",
+    "details": {
+        "transport_type": "Air", "incoterm": "EXW", "commodity": "Café", "stackable": True,
+        "routes": [
+            {"country_origin": "Colombia", "port_origin": "BOG", "country_destination": "United States", "port_destination": "MIA"},
+            {"country_origin": "United States", "port_origin": "MIA", "country_destination": "Mexico", "port_destination": "MEX"},
+        ],
+        "packages": [
+            {"type_packaging": "Pallet", "quantity": 2, "weight_lcl": 100.0, "weight_unit": "KG", "total_weight": 200.0,
+             "length": 120.0, "width": 100.0, "height": 50.0, "length_unit": "CM", "volume": 1.2, "kilovolume": 200.0},
+            {"type_packaging": "Box", "quantity": 1, "weight_lcl": 10.0, "weight_unit": "KG", "total_weight": 10.0,
+             "length": 50.0, "width": 40.0, "height": 30.0, "length_unit": "CM", "volume": 0.06, "kilovolume": 10.0},
+        ],
+    },
+}
+
+GROUND = {
+    "service": "Ground Transportation",
+    "details": {
+        "ground_service": "Mula Refrigerada", "pickup_thermo_king": True, "commodity": "Flores",
+        "ground_routes": [
+            {"country_origin": " Colombia ", "city_origin": "Bogotá", "pickup_address": "Calle 1", "zip_code_origin": "110111",
+             "country_destination": "Colombia", "city_destination": "Cartagena", "delivery_address": "Muelle 4", "zip_code_destination": "130001"},
+            {"country_origin": "Colombia", "city_origin": "", "pickup_address": "Calle 2", "zip_code_origin": None,
+             "country_destination": "Ecuador", "city_destination": "Quito", "delivery_address": "", "zip_code_destination": ""},
+        ],
+    },
+}
+
+CUSTOMS = {
+    "service": "Customs Brokerage",
+    "details": {"hs_code": "0603", "customs_origin": True, "cargo_value": 0, "final_comments": ""},
+}
+
+def build(services):
+    return QuoteRecordBuilder().build(services, **HEADER)
+
+def non_empty(record):
+    return {column: value for column, value in record.items() if value != ""}
+
+def test_fcl_record():
+    assert non_empty(build([FCL])) == {
+        **HEADER,
+        "service": "International Freight",
+        "incoterm": "FOB",
+        "commodity": "Flores",
+        "transport_type": "Maritime",
+        "routes_info": "Route 1: Colombia (Cartagena) → Spain (Valencia)",
+        "country_origin": "Colombia",
+        "country_destination": "Spain",
+        "pickup_address": "Zona Franca",
+        "zip_code_origin": "130001",
+        "delivery_address": "N/A",
+        "zip_code_destination": "N/A",
+        "type_container": "20' Dry Standard\nReefer 40'",
+        "container_characteristics": "Reinforced\nFood Grade",
+        "imo": "Sí, IMO Type: 3, UN Code: UN1263",
+        "reefer_details": "Drayage Reefer Required\nTemperature Control Required\nTemperature Range: -18°C",
+        "additional_costs": "Destination Cost Required\nInsurance Required",
+        "cargo_value": "25000",
+        "lcl_fcl_mode": "FCL",
+    }
+
+def test_air_record():
+    record = build([LCL])
+    assert record["routes_info"] == (
+        "Route 1: Colombia (BOG) → United States (MIA)\n"
+        "Route 2: United States (MIA) → Mexico (MEX)"
+    )
+    # Con varias rutas no se fija un país de origen/destino.
+    assert record["country_origin"] == record["country_destination"] == ""
+    assert record["info_pallets_str"] == (
+        "1 Box, Unit Weight: 10.00 KG, Total Weight: 10.00 KG,Volume: 10.00 KVM, Dimensions: 50.00 CM x 40.00 CM x 30.00 CM\n"
+        "2 Pallet, Unit Weight: 100.00 KG, Total Weight: 200.00 KG,Volume: 200.00 KVM, Dimensions: 120.00 CM x 100.00 CM x 50.00 CM\n"
+        "Total weight of all packages: 210.00 KG"
+    )
+    assert record["stackable"] == "Sí"
+    assert record["reefer_details"] == "No reefer details"
+    assert record["additional_costs"] == "No additional costs"
+
+def test_ground_record():
+    record = build([GROUND])
+    assert record["country_origin"] == "Colombia"
+    assert record["country_destination"] == "Colombia"
+    assert record["ground_routes"] == "Route 1: Bogotá (Colombia) → Cartagena (Colombia)"
+    assert record["addresses"] == "Address 1: Calle 1 (110111) → Muelle 4 (130001)"
+    assert record["ground_service"] == "Mula Refrigerada"
+    assert record["reefer_details"] == "Thermo King Pickup Required"
+    assert record["pickup_address"] == ""
+
+def test_customs_only_record():
+    assert non_empty(build([CUSTOMS])) == {
+        **HEADER,
+        "service": "Customs Brokerage",
+        "hs_code": "0603",
+        "imo": "No",
+        "reefer_details": "No reefer details",
+        "additional_costs": "Customs at Origin Required",
+    }
+
+@pytest.mark.parametrize("services", [[FCL], [LCL], [GROUND], [CUSTOMS], [FCL, GROUND, CUSTOMS], [GROUND, LCL]])
+def test_row_follows_column_order(services):
+    builder = QuoteRecordBuilder()
+    record = builder.build(services, **HEADER)
+    row = builder.build_row(services, **HEADER)
+    assert list(record) == all_quotes_columns
+    assert row == [record[column] for column in all_quotes_columns]
+    assert all(isinstance(value, str) for value in row)
+
+@pytest.mark.parametrize("services", [[FCL], [LCL], [GROUND], [CUSTOMS], [FCL, GROUND, CUSTOMS], [GROUND, LCL]])
+def test_matches_legacy_dataframe(services):
+    legacy = legacy_record(services, **HEADER)
+    assert list(legacy.columns) == all_quotes_columns
+    assert QuoteRecordBuilder().build_row(services, **HEADER) == legacy.iloc[0].tolist()
+
+def test_matches_legacy_dataframe_on_random_drafts():
+    builder = QuoteRecordBuilder()
+    for seed in range(200):
+        services = random_services(seed % 6 + 1, seed=seed)
+        assert builder.build_row(services, **HEADER) == legacy_record(services, **HEADER).iloc[0].tolist()
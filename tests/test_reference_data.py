@@ -0,0 +1,37 @@
+import os
+import time
+
+from reference_data import STALE_TEMP_AGE, build_snapshot, file_hash, read_snapshot, snapshot_path
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Country,Port\n")
+        f.writelines(f"{country},{port}\n" for country, port in rows)
+
+def test_snapshot_round_trip(tmp_path):
+    csv_path = str(tmp_path / "ports.csv")
+    write_csv(csv_path, [("Colombia", "Cartagena"), ("Spain", "Valencia"), ("Colombia", "Buenaventura")])
+    catalog = read_snapshot(build_snapshot(csv_path, snapshot_dir=str(tmp_path / "snapshots")))
+    assert catalog.rows == 3
+    assert catalog.columns["Country"].categories == ("Colombia", "Spain")
+    assert catalog.columns["Country"].codes.tolist() == [0, 1, 0]
+
+def test_build_removes_old_snapshots_and_abandoned_temp_files(tmp_path):
+    csv_path = str(tmp_path / "ports.csv")
+    snapshot_dir = tmp_path / "snapshots"
+    snapshot_dir.mkdir()
+    write_csv(csv_path, [("Colombia", "Cartagena")])
+    path = snapshot_path(csv_path, file_hash(csv_path), str(snapshot_dir))
+
+    old_snapshot = snapshot_dir / "ports.0000000000000000.arrow"
+    abandoned = snapshot_dir / "ports.0000000000000000.arrow.123.tmp"
+    in_progress = snapshot_dir / f"{os.path.basename(path)}.456.tmp"
+    other_catalog = snapshot_dir / "cities.0000000000000000.arrow.123.tmp"
+    for file in (old_snapshot, abandoned, in_progress, other_catalog):
+        file.write_bytes(b"")
+    old = time.time() - STALE_TEMP_AGE - 60
+    for file in (abandoned, other_catalog):
+        os.utime(file, (old, old))
+
+    assert build_snapshot(csv_path, snapshot_dir=str(snapshot_dir)) == path
+    assert sorted(os.listdir(snapshot_dir)) == sorted([os.path.basename(path), in_progress.name, other_catalog.name])
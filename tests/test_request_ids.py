@@ -0,0 +1,55 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from request_ids import RequestIdAllocator, format_request_id
+
+THREADS = 8
+PROCESSES = 4
+PER_WORKER = 25
+
+def allocate_in_threads(path, threads, per_thread):
+    allocator = RequestIdAllocator(path)
+    allocated = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            request_id = allocator.allocate()
+            with lock:
+                allocated.append(request_id)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return allocated
+
+def assert_unique_and_contiguous(allocated, start=1):
+    assert len(allocated) == len(set(allocated))
+    assert sorted(allocated) == [format_request_id(number) for number in range(start, start + len(allocated))]
+
+def test_threads_allocate_unique_contiguous_ids(tmp_path):
+    allocated = allocate_in_threads(str(tmp_path / "ids.sqlite3"), THREADS, PER_WORKER)
+    assert_unique_and_contiguous(allocated)
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_and_threads_allocate_unique_contiguous_ids(tmp_path):
+    path = str(tmp_path / "ids.sqlite3")
+    # Cada proceso abre su propio allocator sobre la misma base, como dos instancias de la app.
+    with multiprocessing.get_context("fork").Pool(PROCESSES) as pool:
+        results = pool.starmap(allocate_in_threads, [(path, THREADS // 2, PER_WORKER)] * PROCESSES)
+    allocated = [request_id for result in results for request_id in result]
+    assert len(allocated) == PROCESSES * THREADS // 2 * PER_WORKER
+    assert_unique_and_contiguous(allocated)
+
+def test_seed_only_moves_forward(tmp_path):
+    allocator = RequestIdAllocator(str(tmp_path / "ids.sqlite3"))
+    allocator.seed(41)
+    allocator.seed(7)
+    allocated = allocate_in_threads(allocator.path, THREADS, 5)
+    assert_unique_and_contiguous(allocated, start=42)
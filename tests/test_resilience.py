@@ -0,0 +1,92 @@
+import socket
+import time
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import resilience
+from resilience import QuotaExceededError, ResiliencePolicy, UnconfirmedWriteError, is_unconfirmed_write, safe_to_resend
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.reason = "error"
+
+def http_error(status):
+    return HttpError(FakeResponse(status), b"{}")
+
+def failing(*errors):
+    calls = []
+
+    def operation():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return operation, calls
+
+def policy():
+    return ResiliencePolicy("test", max_attempts=5, base_delay=0, failure_threshold=100, requests_per_minute=6000)
+
+@pytest.mark.parametrize("error", [TimeoutError("read timed out"), ConnectionResetError(), http_error(503)])
+def test_write_is_not_resent_after_an_ambiguous_error(error):
+    operation, calls = failing(error)
+    with pytest.raises(UnconfirmedWriteError) as raised:
+        policy().call(operation, write=True, fallback=lambda: "skipped")
+    assert len(calls) == 1
+    assert raised.value.__cause__ is error
+
+@pytest.mark.parametrize("error", [http_error(429), ConnectionRefusedError(), socket.gaierror()])
+def test_write_is_resent_when_it_never_reached_the_server(error):
+    operation, calls = failing(error, error)
+    assert policy().call(operation, write=True) == "ok"
+    assert len(calls) == 3
+
+def test_reads_keep_retrying_transient_errors():
+    operation, calls = failing(TimeoutError(), http_error(503))
+    assert policy().call(operation) == "ok"
+    assert len(calls) == 3
+
+def test_not_sent_error_is_found_in_the_cause_chain():
+    try:
+        try:
+            raise ConnectionRefusedError()
+        except ConnectionRefusedError as e:
+            raise OSError("connection failed") from e
+    except OSError as e:
+        assert safe_to_resend(e)
+    assert not safe_to_resend(http_error(500))
+
+def test_unconfirmed_write_is_found_through_wrappers():
+    try:
+        try:
+            raise UnconfirmedWriteError("lost response")
+        except UnconfirmedWriteError as e:
+            raise RuntimeError("Failed to create folder") from e
+    except RuntimeError as e:
+        assert is_unconfirmed_write(e)
+    assert not is_unconfirmed_write(RuntimeError("Parent folder not found"))
+
+def exhausted_policy():
+    # 60/min: cada petición libera cupo en 1 s.
+    policy = ResiliencePolicy("test", base_delay=0, requests_per_minute=60)
+    assert policy.budget.acquire(60, timeout=0)
+    return policy
+
+def test_session_thread_degrades_instead_of_waiting_for_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "is_interactive", lambda: True)
+    policy = exhausted_policy()
+    started = time.monotonic()
+    assert policy.call(lambda: "ok", fallback=lambda: "cached") == "cached"
+    with pytest.raises(QuotaExceededError):
+        policy.call(lambda: "ok")
+    assert time.monotonic() - started < 0.5
+    assert not policy.degraded
+
+def test_background_worker_waits_for_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "is_interactive", lambda: False)
+    policy = exhausted_policy()
+    started = time.monotonic()
+    assert policy.call(lambda: "ok", fallback=lambda: "cached") == "ok"
+    assert time.monotonic() - started >= 0.5
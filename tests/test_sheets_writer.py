@@ -0,0 +1,42 @@
+import uuid
+
+import pytest
+
+from google_clients import GOOGLE_CLIENTS
+from google_emulator import start_emulator
+from utils import append_rows_to_sheets
+
+HEADER = ["REQUEST_ID", "CLIENT"]
+
+@pytest.fixture
+def emulator():
+    emulator = start_emulator()
+    GOOGLE_CLIENTS.use_endpoint(emulator.url)
+    yield emulator
+    emulator.stop()
+
+@pytest.fixture
+def spreadsheet_id():
+    # load_sheet_ids se cachea por hoja: cada prueba usa una nueva.
+    return f"sheet-{uuid.uuid4().hex}"
+
+def rows(emulator, spreadsheet_id, tab):
+    return emulator.state.sheet(spreadsheet_id, tab)["rows"]
+
+def test_new_tab_gets_the_header(emulator, spreadsheet_id):
+    append_rows_to_sheets(spreadsheet_id, {"FCL": [["Q0001", "ACME"]]}, HEADER)
+    assert rows(emulator, spreadsheet_id, "FCL") == [HEADER, ["Q0001", "ACME"]]
+
+def test_tab_created_by_a_failed_attempt_still_gets_the_header(emulator, spreadsheet_id):
+    # El addSheet de un intento anterior se aplicó pero la fila no.
+    emulator.state.add_sheet(spreadsheet_id, "FCL")
+    append_rows_to_sheets(spreadsheet_id, {"FCL": [["Q0001", "ACME"]]}, HEADER)
+    assert rows(emulator, spreadsheet_id, "FCL") == [HEADER, ["Q0001", "ACME"]]
+
+def test_existing_header_is_not_repeated(emulator, spreadsheet_id):
+    emulator.state.add_sheet(spreadsheet_id, "FCL", rows=[HEADER, ["Q0001", "ACME"]])
+    emulator.state.add_sheet(spreadsheet_id, "LCL")
+    append_rows_to_sheets(spreadsheet_id, {"FCL": [["Q0002", "Globex"]], "LCL": [["Q0002", "Globex"]]}, HEADER)
+    append_rows_to_sheets(spreadsheet_id, {"LCL": [["Q0003", "Initech"]]}, HEADER)
+    assert rows(emulator, spreadsheet_id, "FCL") == [HEADER, ["Q0001", "ACME"], ["Q0002", "Globex"]]
+    assert rows(emulator, spreadsheet_id, "LCL") == [HEADER, ["Q0002", "Globex"], ["Q0003", "Initech"]]
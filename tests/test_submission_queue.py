@@ -0,0 +1,161 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import submission
+from resilience import UnconfirmedWriteError
+from submission import JOB_DONE, SubmissionQueue
+from submission_log import MAX_REPLAYS, QUOTE_DONE, SubmissionLog
+
+def wait_for(queue, request_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.status(request_id)
+        if job is None or job["finished_at"]:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"{request_id} did not finish")
+
+@pytest.fixture
+def log(tmp_path):
+    return SubmissionLog(str(tmp_path / "submissions.sqlite3"))
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def step(quote, replay=False):
+        calls.append((quote["request_id"], replay))
+        time.sleep(0.01)
+    monkeypatch.setattr(submission, "SUBMISSION_STEPS", [("only", step, ())])
+    return calls
+
+def test_claim_refuses_a_live_lease_even_for_the_same_owner(log):
+    log.record_quote("Q0001", {"request_id": "Q0001"})
+    assert log.claim("Q0001", "worker-a", 60)
+    assert not log.claim("Q0001", "worker-a", 60)
+    assert not log.claim("Q0001", "worker-b", 60)
+    assert log.renew("Q0001", "worker-a", 60)
+    assert not log.renew("Q0001", "worker-b", 60)
+
+def test_expired_lease_can_be_claimed_by_another_worker(log):
+    log.record_quote("Q0001", {"request_id": "Q0001"})
+    assert log.claim("Q0001", "worker-a", -1)
+    assert log.claim("Q0001", "worker-b", 60)
+    assert not log.renew("Q0001", "worker-a", 60)
+
+def test_lost_claim_drops_the_job(log, calls):
+    log.record_quote("Q0001", {"request_id": "Q0001"})
+    log.claim("Q0001", "other-process", 60)
+
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001"})
+    queue._executor.shutdown(wait=True)
+
+    assert queue.status("Q0001") is None
+    assert calls == []
+
+def test_recover_never_enqueues_a_quote_that_is_being_submitted(log, calls):
+    queue = SubmissionQueue(log=log)
+    request_ids = [f"Q{number:04d}" for number in range(1, 31)]
+    stop = threading.Event()
+
+    def recover_forever():
+        while not stop.is_set():
+            queue.recover()
+
+    recovery = threading.Thread(target=recover_forever)
+    recovery.start()
+    for request_id in request_ids:
+        queue.submit({"request_id": request_id})
+    for request_id in request_ids:
+        assert wait_for(queue, request_id)["status"] == JOB_DONE
+    stop.set()
+    recovery.join()
+
+    assert sorted(request_id for request_id, _ in calls) == request_ids
+    assert all(log._execute("SELECT status FROM quotes WHERE request_id = ?", (request_id,))[0] == QUOTE_DONE for request_id in request_ids)
+
+def test_unconfirmed_write_is_retried_as_a_replay(log, monkeypatch):
+    calls = []
+
+    def step(quote, replay=False):
+        calls.append(replay)
+        if len(calls) == 1:
+            raise RuntimeError("Failed to save") from UnconfirmedWriteError("lost response")
+    monkeypatch.setattr(submission, "SUBMISSION_STEPS", [("sheets", step, ())])
+
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001"})
+    assert wait_for(queue, "Q0001")["status"] == JOB_DONE
+    assert calls == [False, True]
+
+def test_other_errors_fail_the_quote_without_retrying(log, monkeypatch):
+    calls = []
+
+    def step(quote, replay=False):
+        calls.append(replay)
+        raise RuntimeError("Parent folder not found")
+    monkeypatch.setattr(submission, "SUBMISSION_STEPS", [("folder", step, ())])
+
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001"})
+    job = wait_for(queue, "Q0001")
+    assert job["error"] == "folder: Parent folder not found"
+    assert calls == [False]
+    # El worker de recuperación la retoma como replay.
+    assert queue.recover() == ["Q0001"]
+    assert wait_for(queue, "Q0001") and calls == [False, True]
+
+def test_corrupt_payload_fails_the_job_and_the_quote(log, calls):
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001"})
+    queue._executor.shutdown(wait=True)
+    log._execute("UPDATE quotes SET payload = '{', status = 'failed', replays = 0 WHERE request_id = 'Q0001'")
+
+    queue = SubmissionQueue(log=log)
+    assert queue.recover() == ["Q0001"]
+    job = wait_for(queue, "Q0001")
+    assert job["status"] == "failed" and "Expecting" in job["error"]
+    assert log._execute("SELECT status, lease_owner FROM quotes WHERE request_id = 'Q0001'") == ("failed", None)
+
+def test_log_errors_before_the_claim_fail_the_job(log, calls, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(log, "claim", locked)
+
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001"})
+    job = wait_for(queue, "Q0001")
+    assert job["status"] == "failed" and job["error"] == "database is locked"
+    assert calls == []
+    # Sin lease no se marcó como fallida: recover() la retoma.
+    assert log._execute("SELECT status FROM quotes WHERE request_id = 'Q0001'") == ("pending",)
+
+@pytest.mark.parametrize("replays, removed", [(0, False), (MAX_REPLAYS - 1, False), (MAX_REPLAYS, True)])
+def test_staged_attachments_are_removed_once_the_quote_fails_for_good(log, monkeypatch, replays, removed):
+    def step(quote, replay=False):
+        raise RuntimeError("Parent folder not found")
+    monkeypatch.setattr(submission, "SUBMISSION_STEPS", [("folder", step, ())])
+    upload_dir = os.path.join(submission.PENDING_UPLOADS_DIR, "Q0001")
+    os.makedirs(upload_dir, exist_ok=True)
+    log.record_quote("Q0001", {"request_id": "Q0001", "upload_dir": upload_dir})
+    log._execute("UPDATE quotes SET replays = ? WHERE request_id = 'Q0001'", (replays,))
+
+    queue = SubmissionQueue(log=log)
+    queue._enqueue("Q0001", {"request_id": "Q0001", "upload_dir": upload_dir})
+    assert wait_for(queue, "Q0001")["status"] == "failed"
+    assert os.path.exists(upload_dir) != removed
+    shutil.rmtree(upload_dir, ignore_errors=True)
+
+def test_staged_attachments_are_removed_when_the_quote_is_done(log, calls):
+    upload_dir = os.path.join(submission.PENDING_UPLOADS_DIR, "Q0001")
+    os.makedirs(upload_dir, exist_ok=True)
+    queue = SubmissionQueue(log=log)
+    queue.submit({"request_id": "Q0001", "upload_dir": upload_dir})
+    assert wait_for(queue, "Q0001")["status"] == JOB_DONE
+    assert not os.path.exists(upload_dir)
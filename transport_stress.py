@@ -0,0 +1,149 @@
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote
+
+from google_clients import GoogleClients, anonymous_credentials
+
+# Prueba de concurrencia de los transportes de google_clients contra un servidor
+# local HTTP/1.1 (keep-alive) que responde como values.get de Sheets. Cada
+# respuesta repite el rango pedido: si un hilo recibe la respuesta de otro, se
+# cuenta como resultado incorrecto.
+SESSIONS = 20
+CALLS_PER_SESSION = 50
+SERVER_DELAY = 0.002
+# Un httplib2 compartido puede quedarse esperando una respuesta que leyó otro
+# hilo: las llamadas que no terminan antes del plazo se cuentan como bloqueadas.
+CLIENT_TIMEOUT = 5
+PHASE_DEADLINE = 120
+
+class _ValuesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Encabezados y cuerpo van en escrituras separadas: sin TCP_NODELAY, Nagle +
+    # delayed ACK agregan ~40 ms a cada respuesta sobre una conexión reutilizada.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        value_range = unquote(urlparse(self.path).path.rsplit("/values/", 1)[-1])
+        body = json.dumps({"range": value_range, "majorDimension": "ROWS", "values": [[value_range]]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            # El cliente (un httplib2 compartido) ya cerró la conexión.
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+def start_server(delay=SERVER_DELAY):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ValuesHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _registry(server):
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+    return GoogleClients(secrets={}, endpoints={"sheets": endpoint}, credentials_factory=anonymous_credentials)
+
+def _variants(registry):
+    # nombre -> (servicio compartido por los hilos, transporte nuevo por llamada o None)
+    credentials = registry.sheets_credentials
+    shared = registry.build("sheets", "v4", http=registry.authorized_http(credentials, timeout=CLIENT_TIMEOUT))
+    pooled = registry.build("sheets", "v4", http=registry.pooled_http(credentials))
+    return {
+        # Transporte nuevo en cada llamada, sin keep-alive: lo que da un transporte
+        # por hilo con Streamlit, que ejecuta cada rerun en un hilo nuevo.
+        "new per call": (shared, lambda: registry.authorized_http(credentials, timeout=CLIENT_TIMEOUT)),
+        # Igual, con colecciones cacheadas: aísla el efecto del keep-alive.
+        "new per call + cached": (registry.sheets, lambda: registry.authorized_http(credentials, timeout=CLIENT_TIMEOUT)),
+        # PooledHttp, con las colecciones construidas en cada llamada.
+        "pooled": (pooled, None),
+        # GOOGLE_CLIENTS.sheets: PooledHttp + colecciones cacheadas.
+        "pooled + cached": (registry.sheets, None),
+        # Un único httplib2 para todos los hilos (los antiguos globales de utils).
+        # Va al final: sus hilos bloqueados siguen vivos después del plazo.
+        "shared httplib2": (shared, None),
+    }
+
+def run_phase(service, new_http, sessions, calls, deadline):
+    latencies, counts = [], {"wrong": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session(session_id):
+        barrier.wait()
+        for call in range(calls):
+            value_range = f"S{session_id}!A{call}"
+            started = time.perf_counter()
+            try:
+                request = service.spreadsheets().values().get(spreadsheetId="stress", range=value_range)
+                response = request.execute(http=new_http()) if new_http else request.execute()
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not isinstance(response, dict) or response.get("values") != [[value_range]]:
+                    counts["wrong"] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, deadline - (time.perf_counter() - started)))
+    wall = time.perf_counter() - started
+
+    with lock:
+        done = sorted(latencies)
+        wrong, errors = counts["wrong"], counts["errors"]
+    return {
+        "ok": len(done) - wrong,
+        "wrong": wrong,
+        "errors": errors,
+        "stuck": sessions * calls - len(done) - errors,
+        "median_ms": statistics.median(done) * 1000 if done else 0.0,
+        "p95_ms": done[int(len(done) * 0.95)] * 1000 if done else 0.0,
+        "wall_s": wall,
+    }
+
+def run(sessions=SESSIONS, calls=CALLS_PER_SESSION, delay=SERVER_DELAY, deadline=PHASE_DEADLINE):
+    server = start_server(delay)
+    registry = _registry(server)
+    results = {}
+    for name, (service, new_http) in _variants(registry).items():
+        connections_before = server.connections
+        results[name] = run_phase(service, new_http, sessions, calls, deadline)
+        results[name]["connections"] = server.connections - connections_before
+    server.shutdown()
+    return results
+
+if __name__ == "__main__":
+    # python transport_stress.py [sesiones] [llamadas por sesión]
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else CALLS_PER_SESSION
+    print(f"{sessions} sessions x {calls} calls, {SERVER_DELAY * 1000:.0f} ms server time")
+    for name, result in run(sessions, calls).items():
+        print(
+            f"{name:>21}: ok {result['ok']:5} | wrong {result['wrong']:4} | errors {result['errors']:4} | "
+            f"stuck {result['stuck']:4} | connections {result['connections']:5} | "
+            f"median {result['median_ms']:7.2f} ms | p95 {result['p95_ms']:7.2f} ms | wall {result['wall_s']:5.2f} s"
+        )
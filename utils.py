@@ -1,8 +1,5 @@
 import streamlit as st
-from google.oauth2.service_account import Credentials
-import gspread
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import csv
 import pytz
@@ -11,48 +8,153 @@ import json
 import os
 import pandas as pd
 import re
+import time
+import numbers
+import mimetypes
+import threading
+import shutil
+import copy
+import hashlib
+import functools
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from googleapiclient.errors import HttpError
+from google_clients import GOOGLE_CLIENTS
+from resilience import SHEETS_POLICY, DRIVE_POLICY, CircuitOpenError, QuotaExceededError, is_unconfirmed_write
+from blob_index import BLOB_INDEX
+from reference_data import (
+    file_hash, PORTS_FILE, CITIES_FILE, EMPTY_LOCATION_INDEX,
+    load_ports_index, load_cities_index, country_position, locations_for
+)
+from quote_record import all_quotes_columns
+from location_search import load_ports_search_index, load_cities_search_index, search, format_match
+from cargo_measurements import WEIGHT_UNITS, LENGTH_UNITS, PACKAGING_TYPES, packages_to_array, measure_packages, apply_measures
+from client_directory import ClientDirectory
+from packing_list import import_packing_list, array_to_frame, grid_to_packages, packages_to_frame
 
-SERVICES_FILE = "services.json"
 TEMP_DIR = "temp_uploads"
 
-all_quotes_columns =[
-    "request_id", "time", "commercial", "service", "client", "client_reference", "incoterm", "commodity", "hs_code", "transport_type", "modality", "routes_info", "ground_routes", "country_origin", "country_destination", "pickup_address", "zip_code_origin", "delivery_address", "zip_code_destination", "addresses",
-    "type_container", "info_flatrack", "container_characteristics", "imo", "ground_service", "reefer_details", "additional_costs", "cargo_value", "weight", "positioning", "pickup_city", "lcl_fcl_mode",
-    "info_pallets_str", "lcl_description", "stackable", "final_comments",
-]
-
 sheet_id = st.secrets["general"]["sheet_id"]
 DRIVE_ID = st.secrets["general"]["drive_id"]
 time_sheet_id = st.secrets["general"]["time_sheet_id"]
 PARENT_FOLDER_ID = st.secrets["general"]["parent_folder"]
 
-sheets_creds= Credentials.from_service_account_info(
-    st.secrets["google_sheets_credentials"],
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-)
+# Los clientes de Google (Sheets, Drive, gspread) se construyen al primer uso en GOOGLE_CLIENTS.
 
-sheets_service = build('sheets', 'v4', credentials=sheets_creds)
+#------------------------ SESSION STORAGE --------------------------
+# Cada sesión de Streamlit tiene su propia carpeta temp_uploads/<session_id>/
+# para adjuntos; el borrador de servicios vive solo en session_state.
+SESSION_MAX_AGE = 24 * 3600
 
-drive_creds = Credentials.from_service_account_info(
-    st.secrets["google_drive_credentials"],
-    scopes=["https://www.googleapis.com/auth/drive"]
-)
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+def session_dir(session_id=None):
+    return os.path.join(TEMP_DIR, session_id or current_session_id())
+
+def session_upload_dir(session_id=None):
+    return os.path.join(session_dir(session_id), "uploads")
+
+# La limpieza corre como mucho una vez por intervalo en todo el proceso.
+PURGE_INTERVAL = 3600
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+def last_activity(path):
+    # Reescribir un adjunto no cambia el mtime de la carpeta de la sesión:
+    # cuenta el archivo más reciente de todo el árbol.
+    newest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                # Se borró mientras se recorría.
+                continue
+    return newest
+
+def purge_stale_sessions(max_age=SESSION_MAX_AGE, interval=PURGE_INTERVAL):
+    # Streamlit no avisa cuando una sesión termina: se borran las carpetas sin uso.
+    global _last_purge
+    with _purge_lock:
+        now = time.time()
+        if now - _last_purge < interval:
+            return
+        _last_purge = now
 
-drive_service = build('drive', 'v3', credentials=drive_creds)
-client_gcp = gspread.authorize(sheets_creds)
+    if not os.path.exists(TEMP_DIR):
+        return
+    for name in os.listdir(TEMP_DIR):
+        path = os.path.join(TEMP_DIR, name)
+        if os.path.isdir(path) and now - last_activity(path) > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+
+#------------------------ FRAGMENTS --------------------------
+# Secciones del formulario que se vuelven a ejecutar solas (st.fragment): un
+# cambio dentro de la sección no reejecuta todo app.py. Cada ejecución se
+# registra en el log y en session_state["fragment_timings"] (ms).
+timing_logger = get_logger("quotation.timing")
+
+def timed_fragment(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                st.session_state.setdefault("fragment_timings", {})[name] = elapsed
+                timing_logger.info("fragment %s rendered in %.1f ms (session %s)", name, elapsed, current_session_id())
+        return st.fragment(run)
+    return decorator
+
+#------------------------ ATTACHMENTS --------------------------
+# Cada adjunto se escribe una sola vez por sesión: el file_uploader devuelve el
+# mismo archivo en cada rerun, así que se recuerda su ruta por file_id. Se copia
+# por bloques calculando el SHA-256 y, si el contenido ya estaba guardado (el
+# mismo PDF en dos campos), se reutiliza la ruta existente.
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+def _upload_key(file, temp_dir):
+    file_id = getattr(file, "file_id", None) or f"{file.name}:{file.size}"
+    return f"{temp_dir}|{file_id}"
+
+def save_file_locally(file, temp_dir=None):
+    temp_dir = temp_dir or session_upload_dir()
+    saved_uploads = st.session_state.setdefault("saved_uploads", {})
+    upload_key = _upload_key(file, temp_dir)
+
+    saved_path = saved_uploads.get(upload_key)
+    if saved_path and os.path.exists(saved_path):
+        return saved_path
 
-def save_file_locally(file, temp_dir=TEMP_DIR):
     try:
         os.makedirs(temp_dir, exist_ok=True)
 
         temp_file_path = os.path.join(temp_dir, file.name)
+        partial_path = f"{temp_file_path}.part"
+        digest = hashlib.sha256()
+
+        file.seek(0)
+        with open(partial_path, "wb") as temp_file:
+            for chunk in iter(lambda: file.read(ATTACHMENT_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                temp_file.write(chunk)
+        file.seek(0)
+
+        saved_hashes = st.session_state.setdefault("attachment_hashes", {})
+        content_hash = digest.hexdigest()
+        duplicate_path = saved_hashes.get(content_hash)
+        if duplicate_path and duplicate_path != temp_file_path and os.path.exists(duplicate_path):
+            os.remove(partial_path)
+            temp_file_path = duplicate_path
+        else:
+            os.replace(partial_path, temp_file_path)
+            saved_hashes[content_hash] = temp_file_path
 
-        with open(temp_file_path, "wb") as temp_file:
-            temp_file.write(file.getbuffer())  
-
+        saved_uploads[upload_key] = temp_file_path
         return temp_file_path
 
     except Exception as e:
@@ -106,6 +208,153 @@ def cargo(service):
         "weight": weight
     }
 
+#------------------------ PAGINATION --------------------------
+# Los editores de paquetes y rutas solo crean widgets para la página visible;
+# las filas fuera de la página quedan guardadas en session_state.
+ROWS_PER_PAGE = 10
+
+def last_page(total, page_size=ROWS_PER_PAGE):
+    return max(1, -(-total // page_size))
+
+def show_last_page(key, total, page_size=ROWS_PER_PAGE):
+    st.session_state[f"{key}_page"] = last_page(total, page_size)
+
+def paginate(key, total, page_size=ROWS_PER_PAGE):
+    pages = last_page(total, page_size)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    if pages == 1:
+        return range(total)
+
+    col1, col2 = st.columns([0.2, 0.8])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col2:
+        st.write("")
+        st.caption(f"Showing {start + 1}–{end} of {total}")
+    return range(start, end)
+
+#------------------------ PACKING LIST --------------------------
+# Con muchas líneas (o un packing list importado) los paquetes se editan en una
+# sola tabla en lugar de un grupo de widgets por paquete.
+PACKAGE_GRID_THRESHOLD = 20
+
+def import_packing_list_packages(transport_type):
+    uploaded = st.session_state.get("packing_list_file")
+    if not uploaded:
+        st.session_state["packing_list_report"] = {"error": "Upload a packing list first."}
+        return
+    try:
+        result = import_packing_list(
+            uploaded,
+            default_weight_unit=st.session_state.get("packing_list_weight_unit", "KG"),
+            default_length_unit=st.session_state.get("packing_list_length_unit", "CM"),
+        )
+    except ValueError as e:
+        st.session_state["packing_list_report"] = {"error": str(e)}
+        return
+
+    reset_package_grid()
+    frame = array_to_frame(result.array)
+    st.session_state["package_grid_frame"] = frame
+    st.session_state["package_grid_applied"] = "{}"
+    _apply_package_grid(frame, transport_type)
+    st.session_state["packing_list_report"] = {"rows": result.rows, "imported": len(result.array), "errors": result.errors}
+    st.session_state["package_table_view"] = True
+
+def packing_list_importer(transport_type):
+    # Popover y no expander: dimensions() siempre se dibuja dentro de un expander
+    # de app.py y Streamlit no permite anidarlos.
+    with st.popover("Import packing list (CSV/XLSX)"):
+        st.file_uploader(
+            "Packing list", type=["csv", "xlsx"], key="packing_list_file",
+            help="Columns: type_packaging, quantity, weight_lcl, length, width, height and optionally weight_unit, length_unit, volume."
+        )
+        col1, col2, col3 = st.columns([0.3, 0.3, 0.4])
+        with col1:
+            st.selectbox("Default weight unit", WEIGHT_UNITS, key="packing_list_weight_unit")
+        with col2:
+            st.selectbox("Default length unit", LENGTH_UNITS, key="packing_list_length_unit")
+        with col3:
+            st.button("Import packages", on_click=import_packing_list_packages, args=(transport_type,), key="import_packing_list")
+
+        report = st.session_state.get("packing_list_report")
+        if report and report.get("error"):
+            st.error(f"⚠️ {report['error']}")
+        elif report:
+            st.success(f"{report['imported']} of {report['rows']} lines imported.")
+            if len(report["errors"]):
+                st.warning("Some lines were skipped:")
+                st.dataframe(report["errors"], hide_index=True)
+
+def reset_package_grid():
+    st.session_state.pop("package_grid_frame", None)
+    st.session_state["package_grid_version"] = st.session_state.get("package_grid_version", 0) + 1
+
+def _apply_package_grid(frame, transport_type):
+    # Las líneas incompletas siguen en la tabla y en los paquetes (la validación
+    # del servicio las señala); solo se excluyen de los totales.
+    packages, totals, errors = grid_to_packages(frame, transport_type)
+    st.session_state.packages = packages
+    st.session_state["package_grid_errors"] = errors
+    st.session_state["package_grid_totals"] = totals
+
+def package_grid(transport_type):
+    # La tabla base queda fija en session_state; el editor guarda solo los
+    # cambios y los paquetes se recalculan únicamente cuando esos cambios son nuevos.
+    if "package_grid_frame" not in st.session_state:
+        frame = packages_to_frame(st.session_state.packages, transport_type)
+        st.session_state["package_grid_frame"] = frame
+        _apply_package_grid(frame, transport_type)
+        st.session_state["package_grid_applied"] = "{}"
+    editor_key = f"package_grid_{st.session_state.get('package_grid_version', 0)}"
+
+    edited = st.data_editor(
+        st.session_state["package_grid_frame"],
+        key=editor_key,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "type_packaging": st.column_config.SelectboxColumn("Packaging Type*", options=PACKAGING_TYPES, default="Pallet", required=True),
+            "quantity": st.column_config.NumberColumn("Quantity*", min_value=0, step=1, default=1, required=True),
+            "weight_lcl": st.column_config.NumberColumn("Weight per Unit*", min_value=0.0, step=0.01, default=0.0),
+            "weight_unit": st.column_config.SelectboxColumn("Weight Unit", options=WEIGHT_UNITS, default="KG", required=True),
+            "length": st.column_config.NumberColumn("Length", min_value=0.0, step=0.01, default=0.0),
+            "width": st.column_config.NumberColumn("Width", min_value=0.0, step=0.01, default=0.0),
+            "height": st.column_config.NumberColumn("Height", min_value=0.0, step=0.01, default=0.0),
+            "length_unit": st.column_config.SelectboxColumn("Length Unit", options=LENGTH_UNITS, default="CM", required=True),
+            "volume": st.column_config.NumberColumn("Volume (CBM)", min_value=0.0, step=0.01, default=0.0,
+                                                    help="Only used for lines without dimensions."),
+            "kilovolume": st.column_config.NumberColumn("Kilovolume (KVM)", min_value=0.0, step=0.01, default=0.0,
+                                                        help="Only used for lines without dimensions."),
+        },
+    )
+
+    changes = {name: value for name, value in st.session_state.get(editor_key, {}).items() if value}
+    signature = json.dumps(changes, sort_keys=True, default=str)
+    if signature != st.session_state.get("package_grid_applied"):
+        _apply_package_grid(edited, transport_type)
+        st.session_state["package_grid_applied"] = signature
+
+    errors = st.session_state.get("package_grid_errors")
+    if errors is not None and len(errors):
+        lines = errors["row"].nunique()
+        st.warning(f"{lines} line(s) are incomplete and are not counted in the totals: " +
+                   "; ".join(f"line {row}: {error}" for row, error in errors.head(5).itertuples(index=False)))
+
+    totals = st.session_state.get("package_grid_totals")
+    if totals and st.session_state.packages:
+        volume_label = f"{totals.volumetric_weight_kg:,.2f} KVM" if transport_type == "Air" else f"{totals.cbm:,.2f} CBM"
+        st.caption(
+            f"{len(st.session_state.packages)} lines · {totals.quantity:,} packages · {totals.gross_weight_kg:,.2f} KG · "
+            f"{volume_label} · chargeable {totals.chargeable_weight_kg:,.2f} KG"
+        )
+
 def dimensions():
     temp_details = st.session_state.get("temp_details", {})
     transport_type = st.session_state["temp_details"].get("transport_type", None)
@@ -116,6 +365,7 @@ def dimensions():
         st.session_state["total_weight"] = 0.0
 
     def add_package():
+        show_last_page("packages", len(st.session_state.packages) + 1)
         st.session_state.packages.append({
             "type_packaging": "Pallet",
             "quantity": 0,
@@ -137,24 +387,26 @@ def dimensions():
     def copy_package(index):
         if 0 <= index < len(st.session_state.packages):
             copied_package = st.session_state.packages[index].copy()
+            show_last_page("packages", len(st.session_state.packages) + 1)
             st.session_state.packages.append(copied_package)
         else:
             st.error("Invalid index. Cannot copy package.")
 
-    weight_conversion = {
-        "KG": 1,
-        "Ton": 1000,
-        "Lbs": 0.453592
-    }
-    
-    length_conversion = {
-        "CM": 1,
-        "M": 100,
-        "MM": 0.1,
-        "Inches": 2.54
-    }
-
-    for i in range(len(st.session_state.packages)):
+    packing_list_importer(transport_type)
+    table_view = st.toggle(
+        "Table view", key="package_table_view",
+        value=len(st.session_state.packages) > PACKAGE_GRID_THRESHOLD
+    )
+    if table_view:
+        package_grid(transport_type)
+        return {"packages": st.session_state.packages}
+    if "package_grid_frame" in st.session_state:
+        reset_package_grid()
+
+    # Primero los datos de cada paquete; el volumen calculado y los botones se
+    # dibujan después en sus columnas, con todos los paquetes medidos.
+    rows = {}
+    for i in paginate("packages", len(st.session_state.packages)):
         st.markdown(f"**Package {i + 1}**")
 
         col1, col2, col3, col4 = st.columns(4)
@@ -212,51 +464,46 @@ def dimensions():
                 step=0.01, min_value=0.0
             )
 
-        # Conversión de valores a CM y KG
-        weight_kg = st.session_state.packages[i]["weight_lcl"] * weight_conversion[st.session_state.packages[i]["weight_unit"]]
-        total_weight = weight_kg * st.session_state.packages[i]["quantity"]
-        st.session_state.packages[i]["total_weight"] = total_weight
-
-        length_cm = st.session_state.packages[i]["length"] * length_conversion[st.session_state.packages[i]["length_unit"]]
-        width_cm = st.session_state.packages[i]["width"] * length_conversion[st.session_state.packages[i]["length_unit"]]
-        height_cm = st.session_state.packages[i]["height"] * length_conversion[st.session_state.packages[i]["length_unit"]]
-
-        total_volume = 0
-        if length_cm > 0 and width_cm > 0 and height_cm > 0:
-            unit_volume = (length_cm * width_cm * height_cm) / 1000000  # Convertir a m³
-            total_volume = unit_volume * st.session_state.packages[i]["quantity"]
-            st.session_state.packages[i]["volume"] = total_volume
-
-        with col9:
-            if transport_type == "Air":
-                calculated_kvm = total_volume * 166.6 if total_volume > 0 else 0 
-
-                if total_volume > 0:
-                    st.session_state.packages[i]["kilovolume"] = calculated_kvm
-                    st.number_input(
+        # Sin dimensiones el volumen (o los KVM en aéreo) se escribe a mano.
+        package = st.session_state.packages[i]
+        if not (package["length"] > 0 and package["width"] > 0 and package["height"] > 0):
+            with col9:
+                if transport_type == "Air":
+                    package["kilovolume"] = st.number_input(
                         "Kilovolume (KVM)*",
                         key=f"kilovolume_{i}",
-                        value=calculated_kvm,
+                        value=float(package.get("kilovolume", 0.0)),
                         step=0.01,
-                        min_value=0.0,
-                        disabled=True
+                        min_value=0.0
                     )
-
                 else:
-                    st.session_state.packages[i]["kilovolume"] = st.number_input(
-                        "Kilovolume (KVM)*",
-                        key=f"kilovolume_{i}",
-                        value=st.session_state.packages[i].get("kilovolume", 0.0),
-                        step=0.01,
-                        min_value=0.0
+                    package["volume"] = st.number_input(
+                        "Volume (CBM)*", key=f"volume_{i}",
+                        value=float(package.get("volume", 0.0)),
+                        step=0.01, min_value=0.0
+                    )
+        rows[i] = (col9, col10, col11)
+
+    # Pesos, CBM y KVM de todos los paquetes en una sola pasada de cargo_measurements,
+    # la misma que usa la tabla.
+    array = packages_to_array(st.session_state.packages)
+    measures = measure_packages(array, transport_type)
+    apply_measures(st.session_state.packages, measures, transport_type)
+
+    for i, (col9, col10, col11) in rows.items():
+        package = st.session_state.packages[i]
+        if package["length"] > 0 and package["width"] > 0 and package["height"] > 0:
+            with col9:
+                if transport_type == "Air":
+                    st.number_input(
+                        "Kilovolume (KVM)*", key=f"kilovolume_{i}", value=package["kilovolume"],
+                        step=0.01, min_value=0.0, disabled=True
+                    )
+                else:
+                    st.number_input(
+                        "Volume (CBM)*", key=f"volume_{i}", value=package["volume"],
+                        step=0.01, min_value=0.0, disabled=True
                     )
-
-            else:
-                st.session_state.packages[i]["volume"] = st.number_input(
-                    "Volume (CBM)*", key=f"volume_{i}", 
-                    value=float(st.session_state.packages[i].get("volume", 0.0)), 
-                    step=0.01, min_value=0.0
-                )
 
         with col10:
             st.button("Copy", on_click=lambda i=i: copy_package(i), key=f"copy_{i}")
@@ -502,87 +749,115 @@ def initialize_routes():
         st.session_state["routes"] = [{"country_origin": "", "port_origin": "", "country_destination": "", "port_destination": ""}]
 
 def add_route():
+    show_last_page("routes", len(st.session_state["routes"]) + 1)
     st.session_state["routes"].append({"country_origin": "", "port_origin": "", "country_destination": "", "port_destination": ""})
 
 def handle_remove_route(index):
     if 0 <= index < len(st.session_state["routes"]):
         del st.session_state["routes"][index]
 
+def location_search_box(search_index, key, on_pick, label="🔎 Search"):
+    def handle_pick():
+        label_picked = st.session_state.get(f"{key}_match", "")
+        match = matches_by_label.get(label_picked)
+        if match:
+            on_pick(match.country, match.name)
+        st.session_state[key] = ""
+        st.session_state.pop(f"{key}_match", None)
+
+    query = st.text_input(label, key=key, placeholder="Port, city, UN/LOCODE or country")
+    if not query:
+        return
+
+    matches = search(search_index, query, limit=8)
+    if not matches:
+        st.caption("No matches found.")
+        return
+
+    matches_by_label = {format_match(match): match for match in matches}
+    st.selectbox("Matches", [""] + list(matches_by_label), key=f"{key}_match", on_change=handle_pick)
+
+def pick_route_location(index, side, country, location):
+    st.session_state["routes"][index][f"country_{side}"] = country
+    st.session_state["routes"][index][f"port_{side}"] = location
+    # Se eliminan los valores de los widgets para que tomen el nuevo `index`.
+    st.session_state.pop(f"country_{side}_{index}", None)
+    st.session_state.pop(f"port_{side}_{index}", None)
+
 def handle_routes(transport_type):
     initialize_routes()
     
     if transport_type == "Air":
-        if "cities_csv" not in st.session_state or st.session_state["cities_csv"] is None:
-            try:
-                st.session_state["cities_csv"] = load_csv("cities_world.csv")
-            except Exception as e:
-                st.error(f"⚠️ Error cargando cities_world.csv: {e}")
-                return
-        csv_data = st.session_state["cities_csv"]
-        csv_data = st.session_state.get("cities_csv", {})
-        route_options = csv_data.get("Country", pd.Series()).dropna().astype(str).unique().tolist()
+        try:
+            location_index = load_cities_index()
+            search_index = load_cities_search_index()
+        except Exception as e:
+            st.error(f"⚠️ Error cargando {CITIES_FILE}: {e}")
+            return
 
     elif transport_type == "Maritime":
-        if "ports_csv" not in st.session_state or st.session_state["ports_csv"] is None:
-            try:
-                st.session_state["ports_csv"] = load_csv("output_port_world.csv")
-            except Exception as e:
-                st.error(f"⚠️ Error cargando output_port_world.csv: {e}")
-                return
-        csv_data = st.session_state["ports_csv"]
-        csv_data = st.session_state.get("ports_csv", {})
-        route_options = csv_data.get("country", pd.Series()).dropna().astype(str).unique().tolist()
+        try:
+            location_index = load_ports_index()
+            search_index = load_ports_search_index()
+        except Exception as e:
+            st.error(f"⚠️ Error cargando {PORTS_FILE}: {e}")
+            return
     else:
-        route_options = []
+        location_index = EMPTY_LOCATION_INDEX
+        search_index = None
 
-    for i in range(len(st.session_state["routes"])):
+    for i in paginate("routes", len(st.session_state["routes"])):
         route = st.session_state["routes"][i]
         st.markdown(f"### Route {i+1}")
         cols = st.columns([0.45, 0.45, 0.1])
 
         with cols[0]: 
+            if search_index:
+                location_search_box(search_index, f"search_origin_{i}",
+                                    lambda country, location, i=i: pick_route_location(i, "origin", country, location),
+                                    label="🔎 Search origin")
             col1, col2 = st.columns(2)
             with col1:
                 country_origin = st.selectbox(
                     "Country of Origin*",
-                    options=[""] + route_options,
+                    options=location_index.country_options,
                     key=f"country_origin_{i}",
-                    index=(route_options.index(route["country_origin"]) + 1) if route["country_origin"] in route_options else 0,
+                    index=country_position(location_index, route["country_origin"]),
                 )
                 st.session_state["routes"][i]["country_origin"] = country_origin
             
             with col2:
-                filtered_ports = csv_data[csv_data["Country"] == country_origin]["City"].dropna().unique().tolist() if transport_type == "Air" and country_origin else []
-                if transport_type == "Maritime" and country_origin:
-                    filtered_ports = csv_data[csv_data["country"] == country_origin]["port name"].dropna().unique().tolist()
+                port_options, port_positions = locations_for(location_index, country_origin)
                 port_origin = st.selectbox(
                     "Port of Origin*",
-                    options=[""] + filtered_ports,
+                    options=port_options,
                     key=f"port_origin_{i}",
-                    index=(filtered_ports.index(route["port_origin"]) + 1) if route["port_origin"] in filtered_ports else 0,
+                    index=port_positions.get(route["port_origin"], 0),
                 )
                 st.session_state["routes"][i]["port_origin"] = port_origin
         
         with cols[1]: 
+            if search_index:
+                location_search_box(search_index, f"search_destination_{i}",
+                                    lambda country, location, i=i: pick_route_location(i, "destination", country, location),
+                                    label="🔎 Search destination")
             col1, col2 = st.columns(2)
             with col1:
                 country_destination = st.selectbox(
                     "Country of Destination*",
-                    options=[""] + route_options,
+                    options=location_index.country_options,
                     key=f"country_destination_{i}",
-                    index=(route_options.index(route["country_destination"]) + 1) if route["country_destination"] in route_options else 0,
+                    index=country_position(location_index, route["country_destination"]),
                 )
                 st.session_state["routes"][i]["country_destination"] = country_destination
             
             with col2:
-                filtered_ports = csv_data[csv_data["Country"] == country_destination]["City"].dropna().unique().tolist() if transport_type == "Air" and country_destination else []
-                if transport_type == "Maritime" and country_destination:
-                    filtered_ports = csv_data[csv_data["country"] == country_destination]["port name"].dropna().unique().tolist()
+                port_options, port_positions = locations_for(location_index, country_destination)
                 port_destination = st.selectbox(
                     "Port of Destination*",
-                    options=[""] + filtered_ports,
+                    options=port_options,
                     key=f"port_destination_{i}",
-                    index=(filtered_ports.index(route["port_destination"]) + 1) if route["port_destination"] in filtered_ports else 0,
+                    index=port_positions.get(route["port_destination"], 0),
                 )
                 st.session_state["routes"][i]["port_destination"] = port_destination
             
@@ -701,6 +976,7 @@ def initialize_ground_routes():
         }]
 
 def add_ground_route():
+    show_last_page("ground_routes", len(st.session_state["ground_routes"]) + 1)
     st.session_state["ground_routes"].append({
         "country_origin": "", "city_origin": "", "pickup_address": "", "zip_code_origin": "",
         "country_destination": "", "city_destination": "", "delivery_address": "", "zip_code_destination": ""
@@ -710,68 +986,76 @@ def remove_ground_route(index):
     if 0 <= index < len(st.session_state["ground_routes"]):
         del st.session_state["ground_routes"][index]
 
+def pick_ground_location(index, side, country, city):
+    st.session_state["ground_routes"][index][f"country_{side}"] = country
+    st.session_state["ground_routes"][index][f"city_{side}"] = city
+    st.session_state.pop(f"country_{side}_{index}", None)
+    st.session_state.pop(f"city_{side}_{index}", None)
+
 def ground_transport():
     initialize_ground_routes()
     temp_details = st.session_state.get("temp_details", {})
-    data = st.session_state.get("cities_csv", [])
-    countries = data["Country"].dropna().unique().tolist()
-    routes = [] 
-
-    for i, route in enumerate(st.session_state["ground_routes"]):
+    location_index = load_cities_index()
+    search_index = load_cities_search_index()
+    for i in paginate("ground_routes", len(st.session_state["ground_routes"])):
+        route = st.session_state["ground_routes"][i]
         st.markdown(f"### Route {i+1}")
 
+        col1, col2 = st.columns(2)
+        with col1:
+            location_search_box(search_index, f"ground_search_origin_{i}",
+                                lambda country, city, i=i: pick_ground_location(i, "origin", country, city),
+                                label="🔎 Search origin city")
+        with col2:
+            location_search_box(search_index, f"ground_search_destination_{i}",
+                                lambda country, city, i=i: pick_ground_location(i, "destination", country, city),
+                                label="🔎 Search destination city")
+
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             country_origin = st.selectbox(
-                f"Country of Origin*", options=[""] + countries, key=f"country_origin_{i}",
-                index=(countries.index(temp_details.get("country_origin", "")) + 1)
-                if temp_details.get("country_origin", "") in countries else 0,
+                f"Country of Origin*", options=location_index.country_options, key=f"country_origin_{i}",
+                index=country_position(location_index, route.get("country_origin") or temp_details.get("country_origin", "")),
             )
 
-        filtered_cities = []
-        if country_origin:
-            filtered_cities = (data[data["Country"] == country_origin]["City"].dropna().unique().tolist())
+        city_options, city_positions = locations_for(location_index, country_origin)
 
         with col2:
             city_origin = st.selectbox(
-                f"City of Origin*", options=[""] + filtered_cities, key=f"city_origin_{i}",
-                index=(filtered_cities.index(temp_details.get("city_origin", "")) + 1)
-                if temp_details.get("city_origin", "") in filtered_cities else 0,
+                f"City of Origin*", options=city_options, key=f"city_origin_{i}",
+                index=city_positions.get(route.get("city_origin") or temp_details.get("city_origin", ""), 0),
             )
         with col3:
             pickup_address = st.text_input(
-                f"Pickup Address*", key=f"pickup_address_{i}", value=temp_details.get("pickup_address", ""))
+                f"Pickup Address*", key=f"pickup_address_{i}", value=route.get("pickup_address") or temp_details.get("pickup_address", ""))
         with col4:
             zip_code_origin = st.text_input(
-                f"Zip Code Origin*", key=f"zip_code_origin_{i}", value=temp_details.get("zip_code_origin", ""))
+                f"Zip Code Origin*", key=f"zip_code_origin_{i}", value=route.get("zip_code_origin") or temp_details.get("zip_code_origin", ""))
 
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             country_destination = st.selectbox(
-                f"Country of Destination*", options=[""] + countries, key=f"country_destination_{i}",
-                index=(countries.index(temp_details.get("country_destination", "")) + 1)
-                if temp_details.get("country_destination", "") in countries else 0,
+                f"Country of Destination*", options=location_index.country_options, key=f"country_destination_{i}",
+                index=country_position(location_index, route.get("country_destination") or temp_details.get("country_destination", "")),
             )
 
-        filtered_cities_destination = []
-        if country_destination:
-            filtered_cities_destination = (data[data["Country"] == country_destination]["City"].dropna().unique().tolist())
+        city_options_destination, city_positions_destination = locations_for(location_index, country_destination)
 
         with col2:
             city_destination = st.selectbox(
-                f"City of Destination*", options=[""] + filtered_cities_destination, key=f"city_destination_{i}",
-                index=(filtered_cities_destination.index(temp_details.get("city_destination", "")) + 1)
-                if temp_details.get("city_destination", "") in filtered_cities_destination else 0,
+                f"City of Destination*", options=city_options_destination, key=f"city_destination_{i}",
+                index=city_positions_destination.get(route.get("city_destination") or temp_details.get("city_destination", ""), 0),
             )
 
         with col3:
             delivery_address = st.text_input(
-                f"Delivery Address*", key=f"delivery_address_{i}", value=temp_details.get("delivery_address", ""))
+                f"Delivery Address*", key=f"delivery_address_{i}", value=route.get("delivery_address") or temp_details.get("delivery_address", ""))
         with col4:
             zip_code_destination = st.text_input(
-                f"Zip Code Destination*", key=f"zip_code_destination_{i}", value=temp_details.get("zip_code_destination", ""))
+                f"Zip Code Destination*", key=f"zip_code_destination_{i}", value=route.get("zip_code_destination") or temp_details.get("zip_code_destination", ""))
 
-        routes.append({
+        # Las rutas fuera de la página visible conservan los valores guardados aquí.
+        route.update({
             "country_origin": country_origin,
             "city_origin": city_origin,
             "pickup_address": pickup_address,
@@ -785,6 +1069,7 @@ def ground_transport():
         st.button(f"❌ Remove Route {i+1}", on_click=lambda idx=i: remove_ground_route(idx), key=f"remove_route_{i}")
 
     st.button("➕ Add another route", on_click=add_ground_route)
+    routes = [dict(route) for route in st.session_state["ground_routes"]]
 
     commodity = st.text_input("Commodity*", key="commodity", value=temp_details.get("commodity", ""))
     hs_code = st.text_input("HS Code", key="hs_code", value=temp_details.get("hs_code", ""))
@@ -891,21 +1176,18 @@ def lcl_questions(transport_type):
 
 def customs_questions(service, customs=False):
     temp_details = st.session_state.get("temp_details", {})
-    data = st.session_state.get("cities_csv", [])
-    countries = data["Country"].dropna().unique().tolist()
     customs_data = {}
     if not customs:
+        location_index = load_cities_index()
         col1, col2 = st.columns(2)
         with col1:
-            country_origin = st.selectbox("Country of Origin*", options=[""] + countries, key="country_origin",
-                index=(countries.index(temp_details.get("country_origin", "")) + 1)
-                if temp_details.get("country_origin", "") in countries else 0,
+            country_origin = st.selectbox("Country of Origin*", options=location_index.country_options, key="country_origin",
+                index=country_position(location_index, temp_details.get("country_origin", "")),
             )
         with col2:
             country_destination = st.selectbox(
-            "Country of Destination", options=[""] + countries, key="country_destination",
-            index=(countries.index(temp_details.get("country_destination", "")) + 1)
-            if temp_details.get("country_destination", "") in countries else 0,
+            "Country of Destination", options=location_index.country_options, key="country_destination",
+            index=country_position(location_index, temp_details.get("country_destination", "")),
         )
         commodity = st.text_input("Commodity*", key="commodity", value=temp_details.get("commodity", ""))
         hs_code = st.text_input("HS Code*", key="hs_code", value=temp_details.get("hs_code", ""))
@@ -1215,285 +1497,476 @@ def handle_add_service():
 def change_page(new_page):
     st.session_state["page"] = new_page
 
-def save_to_google_sheets(dataframe, sheet_id, max_attempts=5):
-
-    pattern = r"(?i)(colombia|united states)"
-
-    def check_routes(row):
-        routes = str(row["routes_info"]).split("\n")
-        pickup_match = False
-        delivery_match = False
-
-        for route in routes:
-            parts = route.split("→")
-            origin = parts[0].strip() if len(parts) >= 1 else ""
-            destination = parts[-1].strip() if len(parts) >= 2 else ""
-
-            if row["pickup_address"] and re.search(pattern, origin):
-                pickup_match = True
-            if row["delivery_address"] and re.search(pattern, destination):
-                delivery_match = True
-
-        return pickup_match or delivery_match
-
-    contains_routes_match = dataframe.apply(check_routes, axis=1).any()
-
-    temp_service = dataframe["service"].astype(str).str.replace("\n", ", ")
-    is_ground = temp_service.str.contains(r"\bGround Transportation\b", na=False, regex=True)
-    contains_ground = is_ground.any()
-
-    attempts = 0
-    while attempts < max_attempts:
-        try:
-            if contains_routes_match:
-                save_data_to_google_sheets(dataframe, sheet_id, "Ground Quotations")
-                save_data_to_google_sheets(dataframe, sheet_id, "All Quotes")  # CAMBIAR A All Quotes si es necesario
-            elif contains_ground:
-                save_data_to_google_sheets(dataframe, sheet_id, "Ground Quotations")
-                if temp_service.str.contains(",").any():
-                    save_data_to_google_sheets(dataframe, sheet_id, "All Quotes")  # CAMBIAR A All Quotes si es necesario
-            else:
-                save_data_to_google_sheets(dataframe, sheet_id, "All Quotes")  # CAMBIAR A All Quotes si es necesario
-            return
-
-        except Exception as e:
-            attempts += 1
-            st.error(f"Intento {attempts}/{max_attempts}: Error al guardar en Google Sheets: {e}")
-            if attempts == max_attempts:
-                st.error("Se alcanzó el máximo de intentos. No se pudo guardar la cotización.")
-                raise e
-
-def save_data_to_google_sheets(dataframe, sheet_id, sheet_name, max_attempts=5):
-    attempts = 0
-    while attempts < max_attempts:
-        try:
-            sheet = client_gcp.open_by_key(sheet_id)
-
-            try:
-                worksheet = sheet.worksheet(sheet_name)
-                if worksheet.row_count == 0:
-                    worksheet.append_row([col.upper() for col in dataframe.columns])
-
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = sheet.add_worksheet(title=sheet_name, rows="10000", cols="50")
-                worksheet.append_row([col.upper() for col in dataframe.columns])
+QUOTE_ROUTE_PATTERN = re.compile(r"(?i)(colombia|united states)")
+
+def quote_tabs(record):
+    # Pestañas de destino de una cotización, según sus servicios y rutas.
+    routes_match = False
+    for route in str(record.get("routes_info", "")).split("\n"):
+        parts = route.split("→")
+        origin = parts[0].strip() if len(parts) >= 1 else ""
+        destination = parts[-1].strip() if len(parts) >= 2 else ""
+
+        if record.get("pickup_address") and QUOTE_ROUTE_PATTERN.search(origin):
+            routes_match = True
+        if record.get("delivery_address") and QUOTE_ROUTE_PATTERN.search(destination):
+            routes_match = True
+
+    services = str(record.get("service", "")).replace("\n", ", ")
+    if routes_match:
+        return ["Ground Quotations", "All Quotes"]
+    if re.search(r"\bGround Transportation\b", services):
+        return ["Ground Quotations", "All Quotes"] if "," in services else ["Ground Quotations"]
+    return ["All Quotes"]
+
+def cell_has_request_id(cell, request_id):
+    # La columna A guarda el ID o la fórmula =HYPERLINK("..."; "Q0001").
+    return cell == request_id or f'"{request_id}")' in cell
+
+def request_ids_in_tabs(spreadsheet_id, tabs):
+    sheet_ids = load_sheet_ids(spreadsheet_id)
+    tabs = [tab for tab in tabs if tab in sheet_ids]
+    if not tabs:
+        return {}
+    response = SHEETS_POLICY.call(lambda: GOOGLE_CLIENTS.sheets.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=[f"'{tab}'!A:A" for tab in tabs],
+        majorDimension="COLUMNS",
+        valueRenderOption="FORMULA"
+    ).execute())
+    return {
+        tab: [str(cell) for column in value_range.get("values", []) for cell in column]
+        for tab, value_range in zip(tabs, response.get("valueRanges", []))
+    }
 
-            dataframe.columns = dataframe.columns.str.upper()
-            new_data = dataframe.fillna("").values.tolist()
-            worksheet.append_rows(new_data, table_range="A2")
+def save_quote_row(record, request_id, sheet_id, replay=False):
+    # Envía solo la fila de esta cotización. En un reintento (`replay`) el intento
+    # anterior pudo haber llegado a la hoja aunque se perdiera la respuesta, así
+    # que antes se revisa la columna A para no duplicarla.
+    tabs = quote_tabs(record)
+    if replay:
+        existing = request_ids_in_tabs(sheet_id, tabs)
+        tabs = [tab for tab in tabs if not any(cell_has_request_id(cell, request_id) for cell in existing.get(tab, []))]
+    if not tabs:
+        return
 
-            return
+    header = [column.upper() for column in all_quotes_columns]
+    append_rows_to_sheets(sheet_id, {tab: [[record.get(column, "") for column in all_quotes_columns]] for tab in tabs}, header)
+
+#------------------------ GOOGLE SHEETS BATCH WRITER --------------------------
+# Sin spinner: también la llama el worker de envío, que no tiene sesión donde dibujarlo.
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_sheet_ids(spreadsheet_id):
+    response = SHEETS_POLICY.call(lambda: GOOGLE_CLIENTS.sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields="sheets.properties(sheetId,title)"
+    ).execute())
+    return {sheet["properties"]["title"]: sheet["properties"]["sheetId"] for sheet in response.get("sheets", [])}
+
+def to_row_data(values):
+    cells = []
+    for value in values:
+        if isinstance(value, bool):
+            cells.append({"userEnteredValue": {"boolValue": value}})
+        elif isinstance(value, numbers.Number):
+            cells.append({"userEnteredValue": {"numberValue": float(value)}})
+        else:
+            cells.append({"userEnteredValue": {"stringValue": str(value)}})
+    return {"values": cells}
+
+def create_missing_tabs(spreadsheet_id, tabs):
+    sheet_ids = load_sheet_ids(spreadsheet_id)
+    missing = [tab for tab in tabs if tab not in sheet_ids]
+    if not missing:
+        return sheet_ids
+    # Una pestaña borrada y creada de nuevo vuelve a necesitar encabezado.
+    _tabs_with_header.difference_update((spreadsheet_id, tab) for tab in missing)
+
+    requests = [
+        {"addSheet": {"properties": {"title": tab, "gridProperties": {"rowCount": 10000, "columnCount": 50}}}}
+        for tab in missing
+    ]
+    try:
+        SHEETS_POLICY.call(lambda: GOOGLE_CLIENTS.sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": requests}
+        ).execute(), write=True)
+    finally:
+        # Aunque falle, la pestaña pudo crearse: el próximo intento la vuelve a buscar.
+        load_sheet_ids.clear()
+    return load_sheet_ids(spreadsheet_id)
+
+# (spreadsheet_id, pestaña) que ya tienen encabezado: no se vuelve a revisar A1.
+_tabs_with_header = set()
+
+def tabs_without_header(spreadsheet_id, tabs):
+    # Se revisa la celda A1 y no quién creó la pestaña: si un intento anterior la
+    # creó pero su fila falló, el reintento todavía debe escribir el encabezado.
+    tabs = [tab for tab in tabs if (spreadsheet_id, tab) not in _tabs_with_header]
+    if not tabs:
+        return set()
+    response = SHEETS_POLICY.call(lambda: GOOGLE_CLIENTS.sheets.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=[f"'{tab}'!A1" for tab in tabs]
+    ).execute())
+    missing = set()
+    for tab, value_range in zip(tabs, response.get("valueRanges", [])):
+        if value_range.get("values"):
+            _tabs_with_header.add((spreadsheet_id, tab))
+        else:
+            missing.add(tab)
+    return missing
+
+def append_rows_to_sheets(spreadsheet_id, rows_by_tab, header=None):
+    sheet_ids = create_missing_tabs(spreadsheet_id, list(rows_by_tab))
+    headerless = tabs_without_header(spreadsheet_id, list(rows_by_tab)) if header else set()
+
+    requests = []
+    for tab, rows in rows_by_tab.items():
+        row_data = [to_row_data(row) for row in rows]
+        if tab in headerless:
+            row_data.insert(0, to_row_data(header))
+        requests.append({
+            "appendCells": {
+                "sheetId": sheet_ids[tab],
+                "rows": row_data,
+                "fields": "userEnteredValue"
+            }
+        })
 
-        except Exception as e:
-            attempts += 1
-            st.error(f"Intento {attempts}/{max_attempts}: Error al guardar en Google Sheets ({sheet_name}): {e}")
-            if attempts == max_attempts:
-                st.error(f"Se alcanzó el máximo de intentos. No se pudo guardar la cotización en {sheet_name}.")
-                raise e
+    # Un solo batchUpdate para todas las pestañas: se aplica completo o no se aplica.
+    try:
+        response = SHEETS_POLICY.call(lambda: GOOGLE_CLIENTS.sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": requests}
+        ).execute(), write=True)
+        _tabs_with_header.update((spreadsheet_id, tab) for tab in headerless)
+        return response
+    except HttpError:
+        # Una pestaña renombrada o eliminada deja ids viejos en caché.
+        load_sheet_ids.clear()
+        raise
+
+#------------------------ WORKER ERRORS --------------------------
+# Estas funciones corren en el worker de envío, sin ScriptRunContext: st.error
+# no llega a ninguna sesión. Los errores se registran en el log y se propagan
+# para que queden en el estado del trabajo que consulta la UI.
+submission_logger = get_logger("quotation.submission")
 
 def validate_shared_drive_folder(parent_folder_id):
     try:
-        folder = drive_service.files().get(
+        folder = DRIVE_POLICY.call(lambda: GOOGLE_CLIENTS.drive.files().get(
             fileId=parent_folder_id,
             fields='id',
             supportsAllDrives=True
-        ).execute()
-        return folder is not None
+        ).execute())
     except Exception as e:
-        st.error(f"Parent folder not found or inaccessible: {e}")
-        return False
+        submission_logger.error("Parent folder %s not found or inaccessible: %s", parent_folder_id, e)
+        raise RuntimeError(f"Parent folder not found or inaccessible: {e}") from e
+    return folder is not None
 
 def get_folder_id(folder_name, parent_folder_id):
+    query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and '{parent_folder_id}' in parents and trashed = false"
     try:
-        query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and '{parent_folder_id}' in parents and trashed = false"
-        response = drive_service.files().list(
+        response = DRIVE_POLICY.call(lambda: GOOGLE_CLIENTS.drive.files().list(
             q=query,
             spaces='drive',
             fields='files(id, name)',
             supportsAllDrives=True
-        ).execute()
-        files = response.get('files', [])
-        if files:
-            return files[0]['id']
-        return None
+        ).execute())
     except Exception as e:
-        st.error(f"Failed to search for folder: {e}")
-        return None
+        submission_logger.error("Failed to search for folder %s: %s", folder_name, e)
+        raise RuntimeError(f"Failed to search for folder: {e}") from e
+    files = response.get('files', [])
+    if files:
+        return files[0]['id']
+    return None
 
 def create_folder(folder_name, parent_folder_id):
     existing_folder_id = get_folder_id(folder_name, parent_folder_id)
     if existing_folder_id:
-        st.info(f"Folder '{folder_name}' already exists with ID: {existing_folder_id}")
+        submission_logger.info("Folder '%s' already exists with ID: %s", folder_name, existing_folder_id)
         return existing_folder_id
 
+    file_metadata = {
+        'name': folder_name,
+        'mimeType': 'application/vnd.google-apps.folder',
+        'parents': [parent_folder_id]
+    }
     try:
-        file_metadata = {
-            'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [parent_folder_id]
-        }
-        folder = drive_service.files().create(
+        folder = DRIVE_POLICY.call(lambda: GOOGLE_CLIENTS.drive.files().create(
             body=file_metadata,
             fields='id',
             supportsAllDrives=True
-        ).execute()
-        
-        folder_id = folder.get('id')
-
-        return folder_id
-    
+        ).execute(), write=True)
     except Exception as e:
-        st.error(f"Failed to create folder: {e}")
-        return None, None
+        submission_logger.error("Failed to create folder %s: %s", folder_name, e)
+        raise RuntimeError(f"Failed to create folder: {e}") from e
+    return folder.get('id')
 
 def log_time(start_time, end_time, duration, request_id):
     sheet_name = "Duration Time Quotation" #Cambiar a Duration Time Quotation
-    try:
-        sheet = client_gcp.open_by_key(time_sheet_id)
+    start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
+    end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def append_time_row():
+        import gspread
+        sheet = GOOGLE_CLIENTS.gspread.open_by_key(time_sheet_id)
         try:
             worksheet = sheet.worksheet(sheet_name)
-            start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-            end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-            worksheet.append_row([request_id, start_time_str, end_time_str, duration])
-        
         except gspread.exceptions.WorksheetNotFound:
             worksheet = sheet.add_worksheet(title=sheet_name, rows="1000", cols="20")
             worksheet.append_row(["request_id","Start Time", "End Time", "Duration (seconds)"])
-            start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-            end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-            worksheet.append_row([request_id, start_time_str, end_time_str, duration])
+        worksheet.append_row([request_id, start_time_str, end_time_str, duration])
+        return True
+
+    def skip_time_row():
+        submission_logger.warning("Google Sheets no disponible: no se registró la duración de %s.", request_id)
+        return False
 
+    try:
+        return SHEETS_POLICY.call(append_time_row, cost=3, fallback=skip_time_row, write=True)
     except Exception as e:
-        st.error(f"Failed to save data to Google Sheets: {e}")
+        submission_logger.error("Failed to save the duration of %s to Google Sheets: %s", request_id, e)
+        raise RuntimeError(f"Failed to save data to Google Sheets: {e}") from e
 
+# El borrador vive solo en session_state: una recarga abre una sesión nueva
+# (otro session_id) y empieza con el borrador vacío.
 def load_services():
-    if os.path.exists(SERVICES_FILE):
-        with open(SERVICES_FILE, "r") as file:
-            return json.load(file)
-    return []
+    return copy.deepcopy(st.session_state.get("draft_services", []))
 
 def save_services(services):
-    with open(SERVICES_FILE, "w") as file:
-        json.dump(services, file, indent=4)
+    st.session_state["draft_services"] = copy.deepcopy(services)
 
 def reset_json():
-    if os.path.exists(SERVICES_FILE):
-        os.remove(SERVICES_FILE)
-    with open(SERVICES_FILE, "w") as file:
-        json.dump([], file)
-
-if not os.path.exists(TEMP_DIR):
-    os.makedirs(TEMP_DIR)
-
-def handle_file_uploads(file_uploader_key, label="Attach Files*", temp_dir=TEMP_DIR):
+    st.session_state["draft_services"] = []
+
+def clear_temp_directory(temp_dir=None):
+    for root, _, files in os.walk(temp_dir or session_upload_dir()):
+        for file_name in files:
+            os.remove(os.path.join(root, file_name))
+
+def discard_file_locally(upload_key):
+    # Adjuntos con el mismo contenido comparten un archivo (save_file_locally):
+    # solo se borra cuando ningún otro upload de la sesión lo usa.
+    saved_uploads = st.session_state.setdefault("saved_uploads", {})
+    file_path = saved_uploads.pop(upload_key, None)
+    if not file_path or file_path in saved_uploads.values():
+        return
+    saved_hashes = st.session_state.setdefault("attachment_hashes", {})
+    for content_hash in [content_hash for content_hash, path in saved_hashes.items() if path == file_path]:
+        del saved_hashes[content_hash]
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def handle_file_uploads(file_uploader_key, label="Attach Files*", temp_dir=None):
+    temp_dir = temp_dir or session_upload_dir()
     os.makedirs(temp_dir, exist_ok=True)
 
-    if file_uploader_key not in st.session_state:
-        st.session_state[file_uploader_key] = {}
+    # nombre del archivo -> clave en saved_uploads. No se guarda bajo la key del
+    # widget: Streamlit no permite asignar el valor de un file_uploader.
+    upload_keys = st.session_state.setdefault(f"{file_uploader_key}_saved", {})
 
     uploaded_files = st.file_uploader(label, accept_multiple_files=True, key=file_uploader_key)
 
     if uploaded_files:
         for uploaded_file in uploaded_files:
-            if uploaded_file.name not in st.session_state[file_uploader_key]:
-                file_path = save_file_locally(uploaded_file, temp_dir=temp_dir)
-                if file_path:
-                    st.session_state[file_uploader_key][uploaded_file.name] = file_path
+            if uploaded_file.name not in upload_keys:
+                if save_file_locally(uploaded_file, temp_dir=temp_dir):
+                    upload_keys[uploaded_file.name] = _upload_key(uploaded_file, temp_dir)
 
     current_uploaded_files = set(
         [file.name for file in uploaded_files] if uploaded_files else []
     )
-    session_uploaded_files = set(st.session_state[file_uploader_key].keys())
-
-    files_to_remove = session_uploaded_files - current_uploaded_files
+    files_to_remove = set(upload_keys) - current_uploaded_files
     for file_name in files_to_remove:
-        file_path = st.session_state[file_uploader_key].pop(file_name, None)
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
+        discard_file_locally(upload_keys.pop(file_name))
+
+    saved_uploads = st.session_state.get("saved_uploads", {})
+    # Dos nombres con el mismo contenido devuelven una sola ruta.
+    return list(dict.fromkeys(saved_uploads[upload_key] for upload_key in upload_keys.values() if upload_key in saved_uploads))
+
+#------------------------ GOOGLE DRIVE UPLOADS --------------------------
+# Archivos hasta 5 MB se suben en una sola petición multipart; los más grandes
+# con una sesión resumable por bloques (múltiplos de 256 KB).
+MULTIPART_UPLOAD_LIMIT = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+
+def copy_drive_file(source_id, file_name, folder_id):
+    # Copia del lado del servidor: no se transfieren bytes desde la app.
+    copied = DRIVE_POLICY.call(lambda: GOOGLE_CLIENTS.drive.files().copy(
+        fileId=source_id,
+        body={'name': file_name, 'parents': [folder_id]},
+        fields='id',
+        supportsAllDrives=True
+    ).execute(), write=True)
+    return copied["id"]
+
+def upload_file_to_google_drive(file_path, folder_id):
+    started = time.perf_counter()
+    file_name = os.path.basename(file_path)
+    size = os.path.getsize(file_path)
+    mimetype = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    file_metadata = {'name': file_name, 'parents': [folder_id]}
+    content_hash = file_hash(file_path)
+
+    source_id = BLOB_INDEX.lookup(content_hash)
+    if source_id:
+        try:
+            copy_drive_file(source_id, file_name, folder_id)
+            seconds = time.perf_counter() - started
+            return {"name": file_name, "bytes": 0, "seconds": seconds, "mb_per_s": 0.0, "resumable": False, "copied": True}
+        except HttpError as e:
+            # El original fue borrado o ya no es accesible: se sube de nuevo.
+            if e.resp.status not in (403, 404):
+                raise
+            BLOB_INDEX.forget(content_hash, source_id)
+
+    from googleapiclient.http import MediaIoBaseUpload
+    with open(file_path, "rb") as file:
+        resumable = size > MULTIPART_UPLOAD_LIMIT
+        media = MediaIoBaseUpload(file, mimetype=mimetype, chunksize=UPLOAD_CHUNK_SIZE, resumable=resumable)
+        request = GOOGLE_CLIENTS.drive.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id',
+            supportsAllDrives=True
+        )
+        if resumable:
+            # Tras un error, next_chunk() pregunta al servidor cuántos bytes recibió
+            # antes de seguir (y devuelve el archivo si ya se completó): reintentar
+            # un bloque retoma la sesión, no crea otro archivo.
+            response = None
+            while response is None:
+                _, response = DRIVE_POLICY.call(lambda: request.next_chunk())
+        else:
+            response = DRIVE_POLICY.call(request.execute, write=True)
 
-    return list(st.session_state[file_uploader_key].values())
+    BLOB_INDEX.record(content_hash, response["id"], file_name, size)
 
-def upload_all_files_to_google_drive(folder_id, drive_service):
-    try:
-        file_list = drive_service.files().list(q=f"'{folder_id}' in parents", fields="files(name)").execute()
-        existing_files = {file['name'] for file in file_list.get('files', [])}
-
-        for root, _, files in os.walk(TEMP_DIR):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-                
-                if file_name not in existing_files: 
-                    with open(file_path, "rb") as file:
-                        file_metadata = {'name': file_name, 'parents': [folder_id]}
-                        media = MediaFileUpload(file_path, resumable=True)
-
-                        drive_service.files().create(
-                            body=file_metadata,
-                            media_body=media,
-                            fields='id',
-                            supportsAllDrives=True
-                        ).execute()
-
-                        #st.success(f"Uploaded file: {file_name}")
-
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        st.error(f"Error al eliminar {file_name}: {e}")
+    seconds = time.perf_counter() - started
+    return {
+        "name": file_name,
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_s": size / 1024 / 1024 / seconds if seconds else 0.0,
+        "resumable": resumable,
+        "copied": False,
+    }
 
-                else:
-                    st.warning(f"El archivo {file_name} ya existe en Google Drive. No se subirá de nuevo.")
+def list_folder_file_names(folder_id, drive_service):
+    names = set()
+    page_token = None
+    while True:
+        response = DRIVE_POLICY.call(lambda: drive_service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields="nextPageToken, files(name)",
+            pageSize=1000,
+            pageToken=page_token,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        ).execute())
+        names.update(file['name'] for file in response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return names
+
+def upload_all_files_to_google_drive(folder_id, drive_service, source_dir=None, max_workers=UPLOAD_WORKERS):
+    source_dir = source_dir or session_upload_dir()
+    started = time.perf_counter()
+    report = {"files": [], "errors": [], "skipped": [], "seconds": 0.0}
+    existing_files = list_folder_file_names(folder_id, drive_service)
+
+    pending = []
+    for root, _, files in os.walk(source_dir):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            if file_name not in existing_files:
+                pending.append(file_path)
+            else:
+                submission_logger.info("El archivo %s ya existe en Google Drive. No se subirá de nuevo.", file_name)
+                report["skipped"].append(file_name)
+                os.remove(file_path)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload") as executor:
+        futures = {executor.submit(upload_file_to_google_drive, file_path, folder_id): file_path for file_path in pending}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                report["files"].append(future.result())
+            except Exception as e:
+                report["errors"].append({"name": os.path.basename(file_path), "error": str(e), "unconfirmed": is_unconfirmed_write(e)})
+                submission_logger.error("Error al subir %s a Google Drive: %s", os.path.basename(file_path), e)
+                continue
 
-    except Exception as e:
-        st.error(f"Error al subir archivos a Google Drive: {e}")
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                submission_logger.warning("Error al eliminar %s: %s", os.path.basename(file_path), e)
+
+    report["seconds"] = time.perf_counter() - started
+    return report
 
 def load_existing_ids_from_sheets():
+    import gspread
     sheet_name = "Duration Time Quotation" 
-    while True: 
-        try:
-            sheet = client_gcp.open_by_key(time_sheet_id)
-
-            worksheet_list = [ws.title for ws in sheet.worksheets()]
-            if sheet_name not in worksheet_list:
-                return set()
-
-            worksheet = sheet.worksheet(sheet_name)
-            existing_ids = worksheet.col_values(1)
-            return set(existing_ids[1:]) 
 
-        except gspread.exceptions.SpreadsheetNotFound:
-            st.error("The spreadsheet with the provided ID was not found. Retrying...")
+    def read_ids():
+        sheet = GOOGLE_CLIENTS.gspread.open_by_key(time_sheet_id)
 
-        except gspread.exceptions.WorksheetNotFound:
-            st.error(f"The worksheet '{sheet_name}' was not found in the spreadsheet. Retrying...")
-
-        except Exception as e:
-            st.error(f"Error while loading IDs from Google Sheets: {e}. Retrying...")
-
-@st.cache_data(ttl=3600)
-def load_clients():
-    sheet_name = "clientes"
-    
-    try:
-        sheet = client_gcp.open_by_key(time_sheet_id)
         worksheet_list = [ws.title for ws in sheet.worksheets()]
-        
         if sheet_name not in worksheet_list:
-            return []
+            return set()
 
         worksheet = sheet.worksheet(sheet_name)
-        clientes = worksheet.col_values(1)
-
-        return clientes[1:]
+        existing_ids = worksheet.col_values(1)
+        return set(existing_ids[1:]) 
 
+    # También lo llaman el worker de envío y la conciliación de IDs en segundo plano.
+    try:
+        return SHEETS_POLICY.call(read_ids, cost=4)
     except gspread.exceptions.SpreadsheetNotFound:
-        st.error("No se encontró la hoja de cálculo con el ID proporcionado.")
-    except gspread.exceptions.WorksheetNotFound:
-        st.error(f"No se encontró la pestaña '{sheet_name}' en la hoja de cálculo.")
+        submission_logger.error("The spreadsheet with the provided ID was not found.")
+        raise
+    except Exception as e:
+        submission_logger.error("Error while loading IDs from Google Sheets: %s", e)
+        raise
+
+CLIENTS_SHEET = "clientes"
+
+def fetch_client_rows(after):
+    # Una sola lectura de valores: solo las filas posteriores a `after`.
+    def read_rows():
+        try:
+            response = GOOGLE_CLIENTS.sheets.spreadsheets().values().get(
+                spreadsheetId=time_sheet_id,
+                range=f"'{CLIENTS_SHEET}'!A{after + 1}:A",
+                majorDimension="COLUMNS"
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == 400 and CLIENTS_SHEET not in load_sheet_ids(time_sheet_id):
+                return []
+            raise
+        columns = response.get("values", [])
+        return columns[0] if columns else []
+
+    return SHEETS_POLICY.call(read_rows, cost=2)
+
+@st.cache_resource(show_spinner=False)
+def client_directory():
+    return ClientDirectory(fetch_client_rows)
+
+def load_clients():
+    directory = client_directory()
+    try:
+        return list(directory.sync())
+    except (CircuitOpenError, QuotaExceededError):
+        # Modo degradado: se sigue con la última lista conocida, si la hay.
+        if directory.names:
+            return list(directory.names)
+        raise
     except Exception as e:
         st.error(f"Error al cargar los clientes desde Google Sheets: {e}")
-    
-    return []
+    return list(directory.names)
 
 def go_back():
     navigation_flow = [
@@ -1509,8 +1982,8 @@ def go_back():
         if current_index > 0: 
             st.session_state["page"] = navigation_flow[current_index - 1]
 
-def load_shared_values_from_services():
-    services = load_services()
+def load_shared_values_from_services(services=None):
+    services = load_services() if services is None else services
     shared_values = {}
 
     priority_fields = ["country_origin", "country_destination"]
@@ -1544,14 +2017,14 @@ def load_shared_values_from_services():
     return shared_values
 
 def prefill_temp_details():
-    shared_values = load_shared_values_from_services()
+    services = load_services()
+    shared_values = load_shared_values_from_services(services)
     temp_details = st.session_state.get("temp_details", {})
 
     for key, value in shared_values.items():
         if key not in temp_details or not temp_details[key]:  
             temp_details[key] = value
 
-    services = load_services()
     for service in services:
         details = service.get("details", {})
 